@@ -7,6 +7,8 @@ from .models import (
 from django.contrib.auth.models import Group, Permission
 from django.contrib.auth.admin import GroupAdmin
 from .models import *
+from .execution_queue import executer_maintenant
+from .planificateur import signaler_configurations
 from django.utils.html import format_html
 from io import BytesIO
 from django import forms
@@ -505,7 +507,10 @@ def custom_get_app_list(self, request, app_label=None):
         'Script': 'Gestion des Scripts',
         'ConfigurationTest': 'Configuration des Tests',
         'ExecutionTest': 'Exécution des Tests',
-        'ExecutionResult': 'Résultats des Tests',            
+        'ExecutionResult': 'Résultats des Tests',
+        'DeclenchementCoalesce': 'Déclenchements coalescés',
+        'AgentExecution': "Agents d'exécution",
+        'BailPlanificateur': "Bail du planificateur",
     }
     
     for model_name, custom_name in testing_monitoring_custom.items():
@@ -752,14 +757,14 @@ class ConfigurationTestAdmin(admin.ModelAdmin):
     list_filter = ('societe', 'projet', 'is_active', 'periodicite', 'date_activation', 'date_desactivation')
     search_fields = ('nom', 'societe__nom', 'projet__nom')
     filter_horizontal = ('scripts', 'emails_notification')
-    actions = ['activer_configurations', 'desactiver_configurations']
+    actions = ['activer_configurations', 'desactiver_configurations', 'executer_maintenant']
     actions_on_top = True
     autocomplete_fields = ['projet', 'societe']
-    readonly_fields = ['date_creation', 'date_modification']
+    readonly_fields = ['date_creation', 'date_modification', 'next_run_at', 'expected_at']
 
     fieldsets = (
         ("Informations générales", {
-            'fields': ('societe', 'nom', 'projet', 'is_active', 'periodicite', 'date_activation', 'date_desactivation')
+            'fields': ('societe', 'nom', 'projet', 'is_active', 'periodicite', 'scripts_paralleles', 'politique_chevauchement', 'politique_reprise', 'date_activation', 'date_desactivation')
         }),
         ("Sélection des scripts", {
             'fields': ('scripts',)
@@ -768,7 +773,7 @@ class ConfigurationTestAdmin(admin.ModelAdmin):
             'fields': ('emails_notification',),
         }),
         ("Dates", {
-            'fields': ('date_creation', 'date_modification'),
+            'fields': ('date_creation', 'date_modification', 'next_run_at', 'expected_at'),
             'classes': ('collapse',)
         }),
     )
@@ -790,14 +795,26 @@ class ConfigurationTestAdmin(admin.ModelAdmin):
     afficher_scripts_lies.short_description = "Scripts liés"
 
     def activer_configurations(self, request, queryset):
-        updated = queryset.update(is_active=True, date_activation=timezone.now())
+        # update() ne touche pas date_modification : les planificateurs la relisent
+        maintenant = timezone.now()
+        updated = queryset.update(is_active=True, date_activation=maintenant, date_modification=maintenant)
+        ConfigurationTest.recalculer_echeances(queryset, maintenant)
+        signaler_configurations(queryset.values_list('id', flat=True))
         self.message_user(request, f"{updated} configuration(s) activée(s).")
     activer_configurations.short_description = "✅ Activer les configurations sélectionnées"
 
     def desactiver_configurations(self, request, queryset):
-        updated = queryset.update(is_active=False, date_desactivation=timezone.now())
+        maintenant = timezone.now()
+        updated = queryset.update(is_active=False, date_desactivation=maintenant, date_modification=maintenant)
+        ConfigurationTest.recalculer_echeances(queryset, maintenant)
+        signaler_configurations(queryset.values_list('id', flat=True))
         self.message_user(request, f"{updated} configuration(s) désactivée(s).")
     desactiver_configurations.short_description = "❌ Désactiver les configurations sélectionnées"
+
+    def executer_maintenant(self, request, queryset):
+        executions = [executer_maintenant(configuration) for configuration in queryset]
+        self.message_user(request, f"{len(executions)} exécution(s) mise(s) en file prioritaire.")
+    executer_maintenant.short_description = "▶️ Exécuter maintenant (file prioritaire)"
     
     def changelist_view(self, request, extra_context=None):
         extra_context = extra_context or {}
@@ -934,10 +951,10 @@ class StartedAtListFilter(SimpleListFilter):
 @admin.register(ExecutionTest)
 class ExecutionTestAdmin(admin.ModelAdmin):
     change_list_template = "admin/executiontestadmin.html"
-    list_display = ('configuration','projet', 'statut', 'started_at', 'ended_at', 'lien_log_excel')
-    list_filter = (ProjetFilter, 'statut', StartedAtListFilter)
-    readonly_fields = ('rapport', 'log_fichier')
-    actions = ['exporter_excel']
+    list_display = ('configuration','projet', 'statut', 'statut_effectif', 'immediate', 'priorite', 'started_at', 'ended_at', 'lien_log_excel')
+    list_filter = (ProjetFilter, 'statut', 'immediate', 'priorite', StartedAtListFilter)
+    readonly_fields = ('rapport', 'resume', 'log_fichier', 'dernier_battement', 'reprises', 'parent', 'statut_effectif')
+    actions = ['exporter_excel', 'relancer_echecs']
 
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
@@ -1029,6 +1046,19 @@ class ExecutionTestAdmin(admin.ModelAdmin):
 
     exporter_excel.short_description = "📤 Exporter les logs en Excel"
 
+    def relancer_echecs(self, request, queryset):
+        relancees = 0
+        for execution in queryset:
+            try:
+                execution.relancer_echecs()
+                relancees += 1
+            except ValueError as e:
+                self.message_user(request, f"{execution} : {e}", messages.WARNING)
+        if relancees:
+            self.message_user(request, f"{relancees} relance(s) des scripts en échec mise(s) en file.")
+
+    relancer_echecs.short_description = "🔁 Relancer les scripts en échec"
+
 # Début
 
 from django.utils.translation import gettext_lazy as _
@@ -1075,16 +1105,31 @@ class ExecutionStartedAtPeriodFilter(SimpleListFilter):
 # Fin 
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import ExecutionResult
+from .models import ExecutionResult, EtapeResultat
+
+
+class EtapeResultatInline(admin.TabularInline):
+    model = EtapeResultat
+    extra = 0
+    can_delete = False
+    fields = ('ordre', 'type', 'nom', 'statut', 'duree', 'message')
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 
 @admin.register(ExecutionResult)
 class ExecutionResultAdmin(admin.ModelAdmin):
+    inlines = [EtapeResultatInline]
     list_display = (
         'script',
         'configuration',
         'started_at',
         'statut',
         'resultat_interprete',
+        'cpu_utilisateur',
+        'rss_max_ko',
         'voir_log',
     )
     list_filter = ('statut', 'script', 'execution__configuration__projet',ExecutionStartedAtPeriodFilter)
@@ -1110,6 +1155,47 @@ class ExecutionResultAdmin(admin.ModelAdmin):
     voir_log.short_description = "Log"
 
 
+@admin.register(DeclenchementCoalesce)
+class DeclenchementCoalesceAdmin(admin.ModelAdmin):
+    list_display = ('configuration', 'date_prevue', 'politique', 'action', 'execution')
+    list_filter = ('action', 'politique', 'configuration__projet')
+    search_fields = ('configuration__nom',)
+    date_hierarchy = 'date_prevue'
+    readonly_fields = ('configuration', 'date_prevue', 'politique', 'action', 'execution')
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(AgentExecution)
+class AgentExecutionAdmin(admin.ModelAdmin):
+    list_display = ('nom', 'hote', 'pid', 'en_ligne', 'concurrence', 'executions_en_cours', 'dernier_battement', 'demarre_le')
+    search_fields = ('nom', 'hote')
+    readonly_fields = ('nom', 'hote', 'pid', 'concurrence', 'executions_en_cours', 'demarre_le', 'dernier_battement', 'arrete_le')
+
+    def en_ligne(self, obj):
+        return obj.en_ligne
+    en_ligne.boolean = True
+    en_ligne.short_description = "En ligne"
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(BailPlanificateur)
+class BailPlanificateurAdmin(admin.ModelAdmin):
+    list_display = ('nom', 'titulaire', 'actif', 'acquis_le', 'expire_le')
+    readonly_fields = ('nom', 'titulaire', 'acquis_le', 'expire_le')
+
+    def actif(self, obj):
+        return obj.actif
+    actif.boolean = True
+    actif.short_description = "Actif"
+
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(EmailNotification)
 class EmailNotificationAdmin(admin.ModelAdmin):
     # MODIFIÉ : Affiche le nom complet, puis l'email
@@ -1331,7 +1417,7 @@ class DashboardAdmin(admin.ModelAdmin):
                 execution_tests.values("configuration__scripts__nom")
                 .annotate(
                     total=Count("id"),
-                    erreurs=Count("id", filter=Q(statut__in=["error", "échec", "fail", "failure"])),
+                    erreurs=Count("id", filter=Q(statut__in=["error", "timeout", "échec", "fail", "failure"])),
                 )
                 .order_by("-erreurs")
             )
@@ -1472,7 +1558,7 @@ class VueGlobaleAdmin(admin.ModelAdmin):
 
         total_resultats = resultats_filter.count()
         resultats_done = resultats_filter.filter(statut='done').count()
-        resultats_error = resultats_filter.filter(statut='error').count()
+        resultats_error = resultats_filter.filter(statut__in=['error', 'timeout']).count()
         resultats_pending = resultats_filter.filter(statut='pending').count()
         resultats_running = resultats_filter.filter(statut='running').count()
 
@@ -1719,7 +1805,7 @@ class SecteurActiviteAdmin(admin.ModelAdmin):
 @admin.register(Societe)
 class SocieteAdmin(admin.ModelAdmin):
     # --- MODIFIÉ : Suppression de 'num_siret' ---
-    list_display = ('nom', 'secteur_activite', 'admin', 'display_projets', 'nombre_projets')
+    list_display = ('nom', 'secteur_activite', 'admin', 'display_projets', 'nombre_projets', 'poids_execution', 'executions_max')
     # --- FIN DE LA MODIFICATION ---
 
     filter_horizontal = ('employes', 'projets')
@@ -1745,6 +1831,12 @@ class SocieteAdmin(admin.ModelAdmin):
             return qs
         return qs.filter(admin=request.user)
 
+    def get_readonly_fields(self, request, obj=None):
+        # Le partage de la capacité d'exécution est réglé par les superutilisateurs
+        if request.user.is_superuser:
+            return super().get_readonly_fields(request, obj)
+        return ('poids_execution', 'executions_max')
+
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         if db_field.name == "admin" and not request.user.is_superuser:
             kwargs["queryset"] = db_field.remote_field.model.objects.filter(pk=request.user.pk)
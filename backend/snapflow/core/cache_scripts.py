@@ -0,0 +1,65 @@
+# core/cache_scripts.py
+"""
+Cache local des scripts de test pour les agents d'exécution distants.
+
+Un agent installé sur une autre machine n'a pas accès au MEDIA_ROOT du
+serveur : il télécharge chaque script par son empreinte SHA-256
+(Script.empreinte) via /api/agents/scripts/<empreinte>/ et le conserve dans
+`<dossier>/<empreinte>/<nom du fichier>`. Un script modifié a une nouvelle
+empreinte, donc un nouveau fichier : le cache n'a jamais à être invalidé.
+
+Ce module ne dépend pas de Django.
+"""
+import hashlib
+import os
+import threading
+
+import requests
+
+
+class ScriptIndisponible(Exception):
+    """Script introuvable sur le serveur, ou contenu différent de son empreinte."""
+
+
+class CacheScripts:
+    def __init__(self, serveur, jeton, dossier, timeout=30):
+        self.serveur = serveur.rstrip("/")
+        self.jeton = jeton
+        self.dossier = dossier
+        self.timeout = timeout
+        self._verrou = threading.Lock()
+
+    def chemin(self, script):
+        """Fichier local d'un script (objet avec `empreinte` et `fichier.name`), téléchargé au besoin."""
+        if not script.empreinte:
+            raise ScriptIndisponible(f"Le script '{script.nom}' n'a pas d'empreinte")
+        chemin = os.path.join(
+            self.dossier, script.empreinte, os.path.basename(script.fichier.name)
+        )
+        if os.path.exists(chemin):
+            return chemin
+
+        # Plusieurs exécutions de l'agent peuvent demander le même script
+        with self._verrou:
+            if not os.path.exists(chemin):
+                contenu = self.telecharger(script.empreinte)
+                os.makedirs(os.path.dirname(chemin), exist_ok=True)
+                temporaire = f"{chemin}.{os.getpid()}.tmp"
+                with open(temporaire, "wb") as f:
+                    f.write(contenu)
+                os.replace(temporaire, chemin)
+        return chemin
+
+    def telecharger(self, empreinte):
+        try:
+            reponse = requests.get(
+                f"{self.serveur}/api/agents/scripts/{empreinte}/",
+                headers={"Authorization": f"Agent {self.jeton}"},
+                timeout=self.timeout,
+            )
+            reponse.raise_for_status()
+        except requests.RequestException as e:
+            raise ScriptIndisponible(f"Téléchargement du script {empreinte} impossible : {e}")
+        if hashlib.sha256(reponse.content).hexdigest() != empreinte:
+            raise ScriptIndisponible(f"Contenu reçu différent de l'empreinte {empreinte}")
+        return reponse.content
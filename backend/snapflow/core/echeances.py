@@ -0,0 +1,150 @@
+# core/echeances.py
+"""
+Prochaines exécutions d'une configuration périodique, en temps constant.
+
+Les occurrences d'une configuration sont base + k × période, avec base =
+last_execution, à défaut date_activation, à défaut maintenant. Le rang k
+de l'occurrence cherchée se calcule par une division entière au lieu
+d'avancer d'une période à la fois : une configuration '2min' inactive
+depuis des semaines ne coûte plus des dizaines de milliers d'itérations.
+
+prochaines_executions_lot() fait le même calcul pour toute une liste de
+configurations à la fois, sur des tableaux NumPy d'instants exprimés en
+microsecondes depuis l'epoch (entiers : les comparaisons < et <= restent
+exactes), ou en Python pur si NumPy n'est pas installé.
+
+echeance_planifiee() donne l'échéance retenue par le planificateur, sans
+report à la période suivante (ConfigurationTest.next_run_at).
+
+Ce module ne dépend pas de Django.
+"""
+from datetime import datetime, timedelta
+
+try:
+    import numpy as np
+except ImportError:  # calcul en Python pur, même résultat
+    np = None
+
+UNE_MICROSECONDE = timedelta(microseconds=1)
+
+# Périodicités de ConfigurationTest
+PERIODICITES = {
+    "2min": timedelta(minutes=2),
+    "2h": timedelta(hours=2),
+    "6h": timedelta(hours=6),
+    "1j": timedelta(days=1),
+    "1s": timedelta(weeks=1),
+    "1m": timedelta(days=30),
+}
+
+
+def echeance_planifiee(last_execution, periodicite, date_activation=None, date_desactivation=None,
+                       is_active=True, *, maintenant):
+    """
+    Instant où une configuration devient due pour le planificateur
+    (jobs.traiter_configurations) : last_execution + périodicité, pas avant
+    la date d'activation, tout de suite (`maintenant`) si elle n'a jamais
+    été exécutée. None si elle ne le deviendra pas (inactive, périodicité
+    inconnue, désactivée d'ici là). Matérialisé dans
+    ConfigurationTest.next_run_at.
+
+    Contrairement à prochaine_execution(), une échéance dépassée n'est pas
+    reportée à la période suivante : le déclenchement en retard (ou
+    'non_executed' au-delà de deux périodes) reste au planificateur.
+    """
+    periode = PERIODICITES.get(periodicite)
+    if not is_active or not periode:
+        return None
+    echeance = last_execution + periode if last_execution else maintenant
+    if date_activation and date_activation > echeance:
+        echeance = date_activation
+    if date_desactivation and echeance >= date_desactivation:
+        return None
+    return echeance
+
+
+def rang_suivant(base, periode, maintenant, strict=False):
+    """
+    Plus petit k ≥ 1 tel que base + k × période ≥ maintenant (> maintenant
+    si `strict`), comme `t = base + période ; while t < maintenant: t += période`.
+    """
+    ecart = maintenant - base
+    if strict:
+        return max(1, ecart // periode + 1)
+    # Division entière arrondie au-dessus
+    return max(1, -((-ecart) // periode))
+
+
+def prochaine_execution(is_active, periode, maintenant, last_execution=None,
+                        date_activation=None, date_desactivation=None):
+    """Voir ConfigurationTest.get_next_execution_time()."""
+    if not is_active:
+        return None
+    if date_activation and maintenant < date_activation:
+        return date_activation
+    base = last_execution or date_activation or maintenant
+    prochaine = base + rang_suivant(base, periode, maintenant) * periode
+    if date_desactivation and prochaine > date_desactivation:
+        return None
+    return prochaine
+
+
+def executions_dans(is_active, periode, maintenant, limite, last_execution=None,
+                    date_activation=None, date_desactivation=None):
+    """Voir ConfigurationTest.get_next_executions_within()."""
+    if not is_active:
+        return []
+    base = last_execution or date_activation or maintenant
+    # Première occurrence base + k × période (k ≥ 0) strictement après maintenant
+    prochaine = base if base > maintenant else base + rang_suivant(base, periode, maintenant, strict=True) * periode
+    if date_desactivation and date_desactivation < limite:
+        limite = date_desactivation
+    if prochaine > limite:
+        return []
+    nombre = (limite - prochaine) // periode + 1
+    return [prochaine + i * periode for i in range(nombre)]
+
+
+def prochaines_executions_lot(lignes, maintenant):
+    """
+    prochaine_execution() pour une liste de configurations : `lignes` est
+    une suite de (id, is_active, période, last_execution, date_activation,
+    date_desactivation). Retourne {id: prochaine exécution ou None}.
+    """
+    lignes = list(lignes)
+    if np is None or not lignes:
+        return {
+            config_id: prochaine_execution(actif, periode, maintenant, last, activation, desactivation)
+            for config_id, actif, periode, last, activation, desactivation in lignes
+        }
+
+    # Instants en microsecondes depuis l'epoch, dans le fuseau de `maintenant`
+    origine = datetime(1970, 1, 1, tzinfo=maintenant.tzinfo)
+
+    def instants(valeurs):
+        presents = np.fromiter((v is not None for v in valeurs), dtype=bool, count=len(valeurs))
+        tableau = np.fromiter(
+            ((v - origine) // UNE_MICROSECONDE if v is not None else 0 for v in valeurs),
+            dtype=np.int64, count=len(valeurs),
+        )
+        return tableau, presents
+
+    ids, actifs, periodes, derniers, activations, desactivations = zip(*lignes)
+    actifs = np.fromiter((bool(a) for a in actifs), dtype=bool, count=len(lignes))
+    periode = np.fromiter((p // UNE_MICROSECONDE for p in periodes), dtype=np.int64, count=len(lignes))
+    derniere, a_derniere = instants(derniers)
+    activation, a_activation = instants(activations)
+    desactivation, a_desactivation = instants(desactivations)
+    instant = (maintenant - origine) // UNE_MICROSECONDE
+
+    base = np.where(a_derniere, derniere, np.where(a_activation, activation, instant))
+    rang = np.maximum(1, -((base - instant) // periode))
+    prochaine = base + rang * periode
+    avant_activation = a_activation & (instant < activation)
+    prochaine = np.where(avant_activation, activation, prochaine)
+    valides = actifs & ~(~avant_activation & a_desactivation & (prochaine > desactivation))
+
+    return {
+        config_id: origine + timedelta(microseconds=int(valeur)) if valide else None
+        for config_id, valeur, valide in zip(ids, prochaine.tolist(), valides.tolist())
+    }
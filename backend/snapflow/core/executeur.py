@@ -0,0 +1,411 @@
+# core/executeur.py
+"""
+Exécution des scripts de test dans des sous-processus.
+
+Ce module ne dépend pas de Django : il ne fait que lancer les scripts et
+renvoyer leurs sorties. L'enregistrement en base (ExecutionResult, tickets
+Redmine, e-mails) reste dans core/runner.py.
+
+Les sorties ne sont jamais chargées en entier en mémoire : chaque ligne est
+horodatée et écrite dans le fichier de log du script dès sa réception
+(compressé si son nom se termine par .gz, voir core/journaux.py), et
+seules les dernières lignes sont conservées pour le rapport.
+
+Les scripts peuvent aussi rapporter étapes, vérifications et statut final
+en lignes JSON sur un canal dédié (voir core/snapflow_resultats.py) ; les
+marqueurs d'erreur dans stdout ne servent plus qu'à défaut de statut final.
+
+Chaque script est le chef d'un groupe de processus : à l'expiration de son
+délai, le groupe entier (script et navigateurs lancés par lui) est tué.
+"""
+import json
+import math
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from .hote_scripts import (
+    VARIABLE_RESULTATS,
+    HoteIndisponible,
+    ProcessusHeberge,
+    RelevePicMemoire,
+    abaisser_priorite,
+    appliquer_limites,
+    attendre_fin,
+    mesure_usage,
+)
+from .journaux import ouvrir_journal
+
+TIMEOUT_SCRIPT = 300  # secondes
+DELAI_FIN_LECTURE = 5  # secondes laissées aux pipes pour se fermer après la fin du script
+LIGNES_EXTRAIT = 200  # lignes conservées en mémoire par flux
+TAILLE_LECTURE = 64 * 1024  # une ligne plus longue est lue en plusieurs morceaux
+ETAPES_MAX = 1000  # messages d'étape conservés par script
+LIGNES_ERREUR = 5  # premières lignes d'erreur conservées par script
+
+# Une sortie contenant l'un de ces marqueurs signale un échec du script
+MARQUEURS_ERREUR = ("ERREURS_FORMULAIRES", "❌")
+
+
+class JournalScript:
+    """
+    Reçoit les sorties d'un script ligne par ligne : les écrit horodatées
+    dans le fichier de log, conserve un extrait de taille fixe (dernières
+    lignes) et les premières lignes d'erreur (stderr ou marqueur dans
+    stdout), et détecte les marqueurs d'erreur au fil de l'eau.
+    """
+
+    def __init__(self, chemin_log=None, lignes_extrait=LIGNES_EXTRAIT):
+        self.chemin_log = chemin_log
+        self.extraits = {
+            "stdout": deque(maxlen=lignes_extrait),
+            "stderr": deque(maxlen=lignes_extrait),
+        }
+        self.nb_lignes = {"stdout": 0, "stderr": 0}
+        self.erreur_detectee = False
+        self.premieres_erreurs = []
+        self.etapes = []
+        self.statut_final = None
+        self._reste = ""
+        self._verrou = threading.Lock()
+        self._fichier = None
+        if chemin_log:
+            self._fichier = ouvrir_journal(chemin_log)
+
+    def lire(self, flux, nom):
+        """Consomme un pipe jusqu'à sa fermeture (appelé dans un thread par flux)."""
+        for brut in iter(lambda: flux.readline(TAILLE_LECTURE), b""):
+            self.recevoir(nom, brut)
+        flux.close()
+
+    def recevoir(self, nom, brut):
+        """Traite une ligne (ou un morceau de ligne de TAILLE_LECTURE octets au plus) d'un flux."""
+        ligne = brut.decode("utf-8", errors="replace").rstrip("\r\n")
+        if nom == "stdout" and not self.erreur_detectee:
+            # Le reste du morceau précédent couvre un marqueur coupé en deux
+            fenetre = self._reste + ligne
+            if any(marqueur in fenetre for marqueur in MARQUEURS_ERREUR):
+                self.erreur_detectee = True
+                self.noter_erreur(ligne)
+            self._reste = "" if brut.endswith(b"\n") else ligne[-len(MARQUEURS_ERREUR[0]):]
+        elif nom == "stderr" and ligne.strip():
+            self.noter_erreur(ligne)
+        self.ajouter(nom, ligne)
+
+    def noter_erreur(self, ligne):
+        with self._verrou:
+            if len(self.premieres_erreurs) < LIGNES_ERREUR:
+                self.premieres_erreurs.append(ligne)
+
+    def lire_resultats(self, flux):
+        """Consomme le canal de résultats : une ligne JSON par message."""
+        for brut in iter(lambda: flux.readline(TAILLE_LECTURE), b""):
+            self.recevoir_resultat(brut)
+        flux.close()
+
+    def recevoir_resultat(self, brut):
+        try:
+            message = json.loads(brut)
+        except ValueError:
+            return  # ligne tronquée ou invalide : ignorée
+        if not isinstance(message, dict):
+            return
+        if message.get("type") == "fin":
+            self.statut_final = message
+        elif len(self.etapes) < ETAPES_MAX:
+            self.etapes.append(message)
+
+    def ajouter(self, nom, ligne):
+        horodatage = datetime.now().strftime("%H:%M:%S.%f")[:-3]
+        prefixe = "" if nom == "stdout" else f"[{nom}] "
+        with self._verrou:
+            self.extraits[nom].append(ligne)
+            self.nb_lignes[nom] += 1
+            if self._fichier:
+                self._fichier.write(f"[{horodatage}] {prefixe}{ligne}\n")
+
+    def extrait(self, nom):
+        """Dernières lignes d'un flux, précédées d'une mention si le flux a été tronqué."""
+        lignes = list(self.extraits[nom])
+        omises = self.nb_lignes[nom] - len(lignes)
+        if omises > 0:
+            renvoi = f" (log complet : {self.chemin_log})" if self.chemin_log else ""
+            lignes.insert(0, f"[... {omises} ligne(s) précédente(s) omise(s){renvoi}]")
+        return "\n".join(lignes) + ("\n" if lignes else "")
+
+    def fermer(self):
+        if self._fichier:
+            self._fichier.close()
+            self._fichier = None
+
+
+def demarrer_processus(chemin, pool_hotes=None, env=None, limites=None, fd_resultats=None):
+    """
+    Démarre un script et retourne (processus, hote). Avec un pool d'hôtes
+    pré-chauffés, le script est exécuté par un fork d'un hôte ; sinon (ou si
+    l'hôte est défaillant) par un nouvel interpréteur. `env` complète les
+    variables d'environnement du processus courant ; `limites` est passé à
+    appliquer_limites() dans le processus du script ; `fd_resultats` est
+    hérité par le script comme canal de résultats.
+    """
+    if pool_hotes is not None:
+        hote = pool_hotes.acquerir()
+        try:
+            return hote.lancer(chemin, env, limites, fd_resultats), hote
+        except HoteIndisponible:
+            pool_hotes.rendre(hote, defaillant=True)
+
+    commande = [sys.executable, chemin]
+    env_complet = {**os.environ, **env} if env else None
+    if fd_resultats is not None:
+        env_complet = {**(env_complet or os.environ), VARIABLE_RESULTATS: str(fd_resultats)}
+    # preexec_fn n'est pas sûr dans un processus à plusieurs threads (worker) :
+    # réservé aux limites setrlimit demandées explicitement, nice est appliqué
+    # après le lancement
+    rlimites = {cle: valeur for cle, valeur in (limites or {}).items() if cle != "nice"}
+    preexec = (lambda: appliquer_limites(rlimites)) if rlimites else None
+    processus = subprocess.Popen(
+        commande,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env=env_complet,
+        start_new_session=True,
+        preexec_fn=preexec,
+        pass_fds=() if fd_resultats is None else (fd_resultats,),
+    )
+    if limites and limites.get("nice"):
+        abaisser_priorite(processus.pid, limites["nice"])
+    processus.releve_memoire = RelevePicMemoire(processus.pid)
+    return processus, None
+
+
+def attendre_processus(proc, timeout=None):
+    """
+    proc.wait(timeout) qui relève en plus, dans proc.usage, la consommation
+    du script terminé (voir mesure_usage()) : temps CPU par os.wait4, pic
+    de mémoire relevé pendant l'attente. Un script exécuté par un hôte est
+    récupéré par l'hôte, qui renvoie sa consommation.
+    """
+    if isinstance(proc, ProcessusHeberge) or proc.returncode is not None:
+        return proc.wait(timeout)
+    releve = getattr(proc, "releve_memoire", None)
+    if not attendre_fin(proc.pid, timeout, releve):
+        raise subprocess.TimeoutExpired(proc.args, timeout)
+    try:
+        _, statut, usage = os.wait4(proc.pid, 0)
+    except ChildProcessError:
+        return proc.wait()  # déjà récupéré ailleurs : consommation inconnue
+    proc.returncode = os.waitstatus_to_exitcode(statut)
+    proc.usage = mesure_usage(usage, releve.pic if releve else None)
+    return proc.returncode
+
+
+def tuer_groupe(proc):
+    """Tue un script et tous les processus de son groupe (navigateur, chromedriver...)."""
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    except PermissionError:
+        proc.kill()
+
+
+def timeout_adaptatif(durees, facteur=3.0, plancher=30, plafond=TIMEOUT_SCRIPT, echantillons_min=5):
+    """
+    Délai d'un script d'après ses durées passées (secondes) : p99 × facteur,
+    borné par [plancher, plafond]. Sans historique suffisant, le plafond.
+    """
+    if len(durees) < echantillons_min:
+        return plafond
+    triees = sorted(durees)
+    p99 = triees[max(0, math.ceil(0.99 * len(triees)) - 1)]
+    return min(plafond, max(plancher, p99 * facteur))
+
+
+def executer_script(
+    chemin,
+    timeout=TIMEOUT_SCRIPT,
+    chemin_log=None,
+    pool_hotes=None,
+    env=None,
+    pool_navigateurs=None,
+    limites=None,
+):
+    """
+    Lance un script et attend sa fin.
+    Retourne un dict avec returncode, stdout/stderr (extraits bornés),
+    exception, durée, erreur_detectee et le chemin du log complet.
+    Avec un pool de navigateurs, le script reçoit une session ouverte qui
+    est rendue au pool à la fin (et recyclée si le script a échoué).
+    """
+    debut = time.monotonic()
+    date_debut = datetime.now()
+    journal = None
+    hote = None
+    proc = None
+    session = None
+    exception = None
+    returncode = None
+    timeout_depasse = False
+    env = dict(env or {})
+    try:
+        journal = JournalScript(chemin_log)
+        if pool_navigateurs is not None:
+            session = acquerir_session(pool_navigateurs, timeout)
+            if session is not None:
+                env.update(session.variables_environnement())
+        lecture_resultats, ecriture_resultats = os.pipe()
+        try:
+            proc, hote = demarrer_processus(chemin, pool_hotes, env, limites, ecriture_resultats)
+        except Exception:
+            os.close(lecture_resultats)
+            raise
+        finally:
+            # Seul le script garde l'extrémité d'écriture
+            os.close(ecriture_resultats)
+        lecteurs = [
+            threading.Thread(target=journal.lire, args=(proc.stdout, "stdout"), daemon=True),
+            threading.Thread(target=journal.lire, args=(proc.stderr, "stderr"), daemon=True),
+            threading.Thread(
+                target=journal.lire_resultats,
+                args=(os.fdopen(lecture_resultats, "rb"),),
+                daemon=True,
+            ),
+        ]
+        for lecteur in lecteurs:
+            lecteur.start()
+        try:
+            returncode = attendre_processus(proc, timeout)
+        except subprocess.TimeoutExpired as e:
+            tuer_groupe(proc)
+            attendre_processus(proc)
+            timeout_depasse = True
+            exception = str(e)
+        limite = time.monotonic() + DELAI_FIN_LECTURE
+        for lecteur in lecteurs:
+            lecteur.join(max(0, limite - time.monotonic()))
+        if any(lecteur.is_alive() for lecteur in lecteurs):
+            # Des processus lancés par le script (navigateur) survivent et
+            # gardent les pipes ouverts : ils sont tués avec leur groupe
+            tuer_groupe(proc)
+            for lecteur in lecteurs:
+                lecteur.join()
+    except Exception as e:
+        exception = str(e)
+    finally:
+        if journal:
+            journal.fermer()
+        if hote is not None:
+            # Un hôte dont le script n'a pas été attendu jusqu'au bout est écarté
+            pool_hotes.rendre(hote, defaillant=proc.returncode is None)
+
+    resultat = construire_resultat(
+        journal, returncode, exception, chemin_log, debut, date_debut, timeout, timeout_depasse,
+        getattr(proc, "usage", None),
+    )
+    if session is not None:
+        pool_navigateurs.liberer(session, echec=statut_depuis_resultat(resultat) != "done")
+    return resultat
+
+
+def construire_resultat(
+    journal, returncode, exception, chemin_log, debut, date_debut, timeout, timeout_depasse, usage=None
+):
+    """
+    Dict de résultat d'un script, identique pour tous les moteurs
+    d'exécution ; `usage` : consommation du script (voir mesure_usage(), ou None).
+    """
+    return {
+        "returncode": returncode,
+        "stdout": journal.extrait("stdout") if journal else "",
+        "stderr": journal.extrait("stderr") if journal else "",
+        "exception": exception,
+        "erreur_detectee": journal.erreur_detectee if journal else False,
+        "premieres_erreurs": list(journal.premieres_erreurs) if journal else [],
+        "etapes": journal.etapes if journal else [],
+        "statut_final": journal.statut_final if journal else None,
+        "log": chemin_log,
+        "duree": time.monotonic() - debut,
+        "timeout": timeout,
+        "timeout_depasse": timeout_depasse,
+        "debut": date_debut,
+        "fin": datetime.now(),
+        "usage": usage,
+    }
+
+
+def acquerir_session(pool_navigateurs, timeout):
+    """Session du pool, ou None si aucun navigateur n'a pu être fourni (le script lancera le sien)."""
+    try:
+        return pool_navigateurs.acquerir(timeout=timeout)
+    except Exception:
+        return None
+
+
+def statut_depuis_resultat(resultat):
+    """
+    Interprète le résultat d'un script : 'done', 'timeout' ou 'error'.
+    Un code de retour non nul est toujours un échec ; sinon le statut final
+    envoyé par le script fait foi, et à défaut une étape en échec ou un
+    marqueur d'erreur dans stdout.
+    """
+    if resultat.get("timeout_depasse"):
+        return "timeout"
+    if resultat["exception"] is not None or resultat["returncode"] != 0:
+        return "error"
+    statut_final = resultat.get("statut_final")
+    if statut_final is not None:
+        return "done" if statut_final.get("statut") == "done" else "error"
+    if any(etape.get("statut") != "done" for etape in resultat.get("etapes", ())):
+        return "error"
+    return "error" if resultat["erreur_detectee"] else "done"
+
+
+def executer_scripts(
+    chemins,
+    concurrence=1,
+    timeout=TIMEOUT_SCRIPT,
+    chemins_log=None,
+    pool_hotes=None,
+    env=None,
+    pool_navigateurs=None,
+    timeouts=None,
+    limites=None,
+):
+    """
+    Exécute une liste de scripts avec au plus `concurrence` sous-processus
+    simultanés. Génère des tuples (index, resultat) au fur et à mesure que
+    les scripts se terminent ; en mode séquentiel (concurrence=1) l'ordre
+    de la liste est conservé. `chemins_log` donne, pour chaque script, le
+    fichier où écrire sa sortie (ou None) ; `timeouts`, son délai (à défaut
+    `timeout` pour tous).
+    """
+    chemins_log = chemins_log or [None] * len(chemins)
+    timeouts = timeouts or [timeout] * len(chemins)
+    options = {
+        "pool_hotes": pool_hotes,
+        "env": env,
+        "pool_navigateurs": pool_navigateurs,
+        "limites": limites,
+    }
+
+    if concurrence <= 1 or len(chemins) <= 1:
+        for index, chemin in enumerate(chemins):
+            yield index, executer_script(chemin, timeouts[index], chemins_log[index], **options)
+        return
+
+    # Chaque script tourne déjà dans son propre processus : des threads
+    # suffisent pour attendre les sous-processus sans bloquer le GIL.
+    with ThreadPoolExecutor(max_workers=concurrence, thread_name_prefix="script") as pool:
+        futures = {
+            pool.submit(executer_script, chemin, timeouts[index], chemins_log[index], **options): index
+            for index, chemin in enumerate(chemins)
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
@@ -0,0 +1,234 @@
+# core/executeur_async.py
+"""
+Moteur d'exécution asyncio des scripts.
+
+Une seule boucle d'événements (un thread) supervise les sous-processus de
+nombreux scripts : leurs pipes sont lus sans bloquer et leurs délais
+appliqués par la boucle, sans thread par script ni par flux. Un sémaphore
+borne le nombre de scripts simultanés, toutes exécutions confondues.
+
+Même contrat que core/executeur.py : mêmes fichiers de log, même canal de
+résultats, même dict de résultat (construire_resultat) et même arrêt du
+groupe de processus. Ce module ne dépend pas de Django. Les scripts sont
+toujours lancés dans un nouvel interpréteur : les hôtes pré-chauffés et le
+pool de navigateurs, dont l'API est bloquante, restent propres au moteur
+'threads'.
+
+Les scripts sont lancés par demarrer_processus(), comme dans le moteur
+'threads', et non par asyncio.create_subprocess_exec() : la fin de chaque
+script est surveillée par la boucle (pidfd), qui relève aussi son pic de
+mémoire, et le script est récupéré par os.wait4(), qui donne sa
+consommation CPU. Le surveillant de processus fils d'asyncio, qui les
+récupère par waitpid(), n'est pas utilisé.
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from .executeur import (
+    DELAI_FIN_LECTURE,
+    TAILLE_LECTURE,
+    TIMEOUT_SCRIPT,
+    JournalScript,
+    attendre_processus,
+    construire_resultat,
+    demarrer_processus,
+    tuer_groupe,
+)
+from .hote_scripts import PAS_RELEVE_MAX, PAS_RELEVE_MIN
+
+
+def surveiller_fin(proc):
+    """
+    Futur résolu par le code de retour du script à sa fin, une fois le
+    processus récupéré par attendre_processus() (consommation dans
+    proc.usage). La fin est signalée à la boucle par un pidfd, et le pic
+    de mémoire relevé par la boucle en attendant ; sans pidfd (noyau
+    antérieur à 5.3), la fin est attendue dans un thread.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        pidfd = os.pidfd_open(proc.pid)
+    except (AttributeError, OSError):
+        return loop.run_in_executor(None, attendre_processus, proc)
+
+    fin = loop.create_future()
+    releve = getattr(proc, "releve_memoire", None)
+    prochain_releve = None
+
+    def relever(pas):
+        nonlocal prochain_releve
+        releve.relever()
+        prochain_releve = loop.call_later(pas, relever, min(pas * 2, PAS_RELEVE_MAX))
+
+    if releve is not None:
+        relever(PAS_RELEVE_MIN)
+
+    def termine():
+        loop.remove_reader(pidfd)
+        os.close(pidfd)
+        if prochain_releve is not None:
+            prochain_releve.cancel()
+        try:
+            # Le script est terminé : os.wait4() ne bloque pas
+            returncode = attendre_processus(proc)
+        except Exception as e:
+            if not fin.done():
+                fin.set_exception(e)
+            return
+        if not fin.done():
+            fin.set_result(returncode)
+
+    loop.add_reader(pidfd, termine)
+    return fin
+
+
+async def lecteur_pipe(pipe, transports):
+    """StreamReader alimenté par la boucle à partir d'un pipe (objet fichier) ; son transport est ajouté à `transports`."""
+    loop = asyncio.get_running_loop()
+    lecteur = asyncio.StreamReader(limit=TAILLE_LECTURE, loop=loop)
+    transport, _ = await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(lecteur, loop=loop), pipe
+    )
+    transports.append(transport)
+    return lecteur
+
+
+async def lignes(flux):
+    """
+    Lignes d'un StreamReader, comme readline(TAILLE_LECTURE) : une ligne plus
+    longue est rendue en morceaux de TAILLE_LECTURE octets.
+    """
+    tampon = bytearray()
+    while True:
+        morceau = await flux.read(TAILLE_LECTURE)
+        tampon += morceau
+        while True:
+            fin = tampon.find(b"\n", 0, TAILLE_LECTURE)
+            if fin != -1:
+                coupe = fin + 1
+            elif len(tampon) >= TAILLE_LECTURE:
+                coupe = TAILLE_LECTURE
+            else:
+                break
+            yield bytes(tampon[:coupe])
+            del tampon[:coupe]
+        if not morceau:
+            if tampon:
+                yield bytes(tampon)
+            return
+
+
+async def lire(flux, recevoir):
+    async for brut in lignes(flux):
+        recevoir(brut)
+
+
+async def executer_script_async(chemin, timeout=TIMEOUT_SCRIPT, chemin_log=None, env=None, limites=None):
+    """Lance un script et attend sa fin ; retourne le même dict que executer_script()."""
+    debut = time.monotonic()
+    date_debut = datetime.now()
+    journal = None
+    proc = None
+    transports = []
+    exception = None
+    returncode = None
+    timeout_depasse = False
+    try:
+        journal = JournalScript(chemin_log)
+        lecture_resultats, ecriture_resultats = os.pipe()
+        try:
+            proc, _ = demarrer_processus(chemin, None, env, limites, ecriture_resultats)
+        except Exception:
+            os.close(lecture_resultats)
+            raise
+        finally:
+            # Seul le script garde l'extrémité d'écriture
+            os.close(ecriture_resultats)
+        fin = surveiller_fin(proc)
+
+        stdout = await lecteur_pipe(proc.stdout, transports)
+        stderr = await lecteur_pipe(proc.stderr, transports)
+        canal_resultats = await lecteur_pipe(os.fdopen(lecture_resultats, "rb", buffering=0), transports)
+        lecteurs = [
+            asyncio.create_task(lire(stdout, lambda brut: journal.recevoir("stdout", brut))),
+            asyncio.create_task(lire(stderr, lambda brut: journal.recevoir("stderr", brut))),
+            asyncio.create_task(lire(canal_resultats, journal.recevoir_resultat)),
+        ]
+        try:
+            returncode = await asyncio.wait_for(asyncio.shield(fin), timeout)
+        except asyncio.TimeoutError:
+            tuer_groupe(proc)
+            returncode = await fin
+            timeout_depasse = True
+            exception = str(subprocess.TimeoutExpired([sys.executable, chemin], timeout))
+
+        _, restants = await asyncio.wait(lecteurs, timeout=DELAI_FIN_LECTURE)
+        if restants:
+            # Des processus lancés par le script (navigateur) survivent et
+            # gardent les pipes ouverts : ils sont tués avec leur groupe
+            tuer_groupe(proc)
+            await asyncio.wait(restants)
+    except Exception as e:
+        exception = str(e)
+    finally:
+        for transport in transports:
+            transport.close()
+        if journal:
+            journal.fermer()
+
+    return construire_resultat(
+        journal, returncode, exception, chemin_log, debut, date_debut, timeout, timeout_depasse,
+        getattr(proc, "usage", None),
+    )
+
+
+async def executer_scripts_async(
+    chemins,
+    concurrence=1,
+    timeout=TIMEOUT_SCRIPT,
+    chemins_log=None,
+    env=None,
+    timeouts=None,
+    limites=None,
+    semaphore=None,
+):
+    """
+    Équivalent asyncio de executer_scripts() : générateur asynchrone de
+    (index, resultat) au fur et à mesure que les scripts se terminent, avec
+    au plus `concurrence` scripts simultanés pour cette liste (ordre
+    conservé en séquentiel). `semaphore`, partagé entre exécutions, borne
+    en plus le nombre total de scripts en cours dans la boucle.
+    """
+    chemins_log = chemins_log or [None] * len(chemins)
+    timeouts = timeouts or [timeout] * len(chemins)
+    places = asyncio.Semaphore(max(1, concurrence))
+
+    async def executer(index):
+        async with places:
+            if semaphore is None:
+                resultat = await executer_script_async(
+                    chemins[index], timeouts[index], chemins_log[index], env, limites
+                )
+            else:
+                async with semaphore:
+                    resultat = await executer_script_async(
+                        chemins[index], timeouts[index], chemins_log[index], env, limites
+                    )
+            return index, resultat
+
+    if concurrence <= 1:
+        for index in range(len(chemins)):
+            yield await executer(index)
+        return
+
+    taches = [asyncio.create_task(executer(index)) for index in range(len(chemins))]
+    try:
+        for prochaine in asyncio.as_completed(taches):
+            yield await prochaine
+    finally:
+        for tache in taches:
+            tache.cancel()
@@ -0,0 +1,644 @@
+# core/execution_queue.py
+"""
+File d'attente des exécutions, stockée en base.
+
+Une ExecutionTest au statut 'pending' est une exécution en file. Les
+processus web et le scheduler se contentent de créer ces lignes ; les
+workers (manage.py run_execution_workers) les réservent de façon atomique
+puis lancent les scripts.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, DateTimeField, DurationField, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils.timezone import now
+
+from .models import ConfigurationTest, DeclenchementCoalesce, ExecutionResult, ExecutionTest, Societe
+
+logger = logging.getLogger(__name__)
+
+
+def get_backend_execution():
+    """'queue' (workers dédiés) ou 'thread' (un thread par exécution, ancien mode)."""
+    return getattr(settings, "SNAPFLOW_EXECUTION_BACKEND", "queue")
+
+
+def get_duree_bail():
+    return timedelta(seconds=getattr(settings, "SNAPFLOW_EXECUTION_LEASE", 600))
+
+
+def identifiant_worker(suffixe=""):
+    """Identifiant unique du processus courant : hôte:pid[:suffixe]."""
+    ident = f"{socket.gethostname()}:{os.getpid()}"
+    return f"{ident}:{suffixe}" if suffixe else ident
+
+
+def mettre_en_file(execution):
+    """
+    Met une exécution 'pending' à disposition des workers.
+    En mode 'thread', l'exécution est lancée immédiatement dans un thread
+    du processus courant.
+    """
+    mettre_en_file_lot([execution.id])
+
+
+def mettre_en_file_lot(execution_ids):
+    """mettre_en_file() pour plusieurs exécutions 'pending' créées ensemble."""
+    if not execution_ids:
+        return
+    if get_backend_execution() == "thread":
+        # Après le commit : les threads doivent voir les exécutions et leurs résultats
+        def lancer():
+            for execution_id in execution_ids:
+                threading.Thread(target=executer_dans_ce_processus, args=(execution_id,)).start()
+
+        transaction.on_commit(lancer)
+        return
+
+    # Les lignes 'pending' constituent déjà les entrées de la file
+    if len(execution_ids) == 1:
+        logger.info(f"📥 Exécution {execution_ids[0]} mise en file")
+    else:
+        logger.info(f"📥 {len(execution_ids)} exécutions mises en file")
+
+
+def executer_dans_ce_processus(execution_id):
+    """
+    Mode 'thread' : réserve l'exécution pour le processus courant et la
+    mène en prolongeant son bail, comme un worker. Si le processus est
+    arrêté (recyclage WSGI, déploiement), le balayage des baux expirés
+    la reprend.
+    """
+    from .runner import lancer_scripts_pour_execution
+
+    worker_id = identifiant_worker("thread")
+    instant = now()
+    reservee = ExecutionTest.objects.filter(pk=execution_id, statut="pending").update(
+        statut="running",
+        claimed_by=worker_id,
+        lease_expires_at=instant + get_duree_bail(),
+        dernier_battement=instant,
+    )
+    if not reservee:
+        return
+
+    arret = threading.Event()
+
+    def battre():
+        try:
+            while not arret.wait(get_duree_bail().total_seconds() / 3):
+                prolonger_baux([execution_id], worker_id)
+        finally:
+            connection.close()
+
+    threading.Thread(target=battre, daemon=True).start()
+    try:
+        lancer_scripts_pour_execution(execution_id)
+    finally:
+        arret.set()
+        try:
+            liberer_execution(execution_id, worker_id)
+        finally:
+            connection.close()
+
+
+def declencher_executions(configurations, date_prevue, oubliees=()):
+    """
+    Crée les exécutions planifiées d'un lot de configurations dues en
+    appliquant leur politique de chevauchement, en une transaction et un
+    nombre de requêtes indépendant de la taille du lot : verrou sur toutes
+    les configurations, lecture groupée des exécutions en vol, bulk_create
+    des exécutions et de leurs résultats (sans passer par save() ni les
+    signaux), last_execution et échéances (next_run_at, expected_at)
+    mis à jour en une requête, mise en file groupée.
+
+    `oubliees` : ids des configurations dont le déclenchement a été oublié
+    (au-delà de deux périodes) ; elles reçoivent une exécution
+    'non_executed' au lieu d'une exécution en file.
+
+    Retourne le bilan {action: nombre de configurations} :
+    - 'cree' : exécution mise en file (dont, avec 'replace', celles qui
+      remplacent une exécution en attente, comptées aussi en 'remplace') ;
+    - 'non_executee' : déclenchement oublié ;
+    - 'ignore' ('skip', exécution en vol) ou 'fusionne' ('queue_one',
+      exécution déjà en attente) : déclenchement absorbé ;
+    - 'deja_traite' : un autre processus a traité ce déclenchement
+      (last_execution a changé entre-temps).
+    Les déclenchements absorbés ou remplacés sont enregistrés dans
+    DeclenchementCoalesce.
+    """
+    bilan = defaultdict(int)
+    if not configurations:
+        return bilan
+    attendues = {config.pk: config for config in configurations}
+    oubliees = set(oubliees)
+
+    with transaction.atomic():
+        # Verrou dans l'ordre des clés : deux lots concurrents ne s'interbloquent pas
+        verrouillees = {
+            config.pk: config
+            for config in ConfigurationTest.objects.select_for_update().filter(pk__in=attendues).order_by("pk")
+        }
+        retenues = []
+        for config_id, configuration in attendues.items():
+            config = verrouillees.get(config_id)
+            if config is None or config.last_execution != configuration.last_execution:
+                bilan["deja_traite"] += 1
+            else:
+                retenues.append(config)
+        if not retenues:
+            return bilan
+
+        en_vol = defaultdict(list)
+        for config_id, execution_id, statut in (
+            ExecutionTest.objects.filter(
+                configuration_id__in=[config.pk for config in retenues], statut__in=["pending", "running"]
+            )
+            .order_by("-id")
+            .values_list("configuration_id", "id", "statut")
+        ):
+            en_vol[config_id].append((execution_id, statut))
+
+        a_creer, non_executees, coalescences, a_remplacer = [], [], [], {}
+        for config in retenues:
+            if config.pk in oubliees:
+                non_executees.append(config)
+                continue
+            executions = en_vol[config.pk]
+            en_attente = [execution_id for execution_id, statut in executions if statut == "pending"]
+            politique = config.politique_chevauchement
+            if politique == "skip" and executions:
+                coalescences.append((config, "ignore", executions[0][0]))
+            elif politique == "queue_one" and en_attente:
+                coalescences.append((config, "fusionne", en_attente[0]))
+            else:
+                if politique == "replace" and en_attente:
+                    a_remplacer[config.pk] = en_attente
+                a_creer.append(config)
+
+        if a_remplacer:
+            candidates = [execution_id for ids in a_remplacer.values() for execution_id in ids]
+            # Seules les exécutions encore en attente (non réservées par un
+            # worker entre-temps) sont remplacées
+            ExecutionTest.objects.filter(pk__in=candidates, statut="pending").update(
+                statut="non_executed",
+                rapport=f"Remplacée par le déclenchement du {date_prevue:%d/%m/%Y %H:%M}",
+            )
+            remplacees = set(
+                ExecutionTest.objects.filter(pk__in=candidates, statut="non_executed").values_list("id", flat=True)
+            )
+            ExecutionResult.objects.filter(execution_id__in=remplacees, statut="pending").update(
+                statut="non_executed"
+            )
+            for config_id, ids in a_remplacer.items():
+                if ids[0] in remplacees:
+                    config = verrouillees[config_id]
+                    coalescences.append((config, "remplace", ids[0]))
+
+        # last_execution et échéances matérialisées (next_run_at, expected_at) en une requête
+        for config in retenues:
+            config.last_execution = date_prevue
+            config.calculer_echeances(date_prevue)
+            attendues[config.pk].last_execution = date_prevue
+        ConfigurationTest.objects.bulk_update(retenues, ["last_execution", "next_run_at", "expected_at"])
+
+        DeclenchementCoalesce.objects.bulk_create([
+            DeclenchementCoalesce(
+                configuration=config,
+                date_prevue=date_prevue,
+                politique=config.politique_chevauchement,
+                action=action,
+                execution_id=execution_id,
+            )
+            for config, action, execution_id in coalescences
+        ])
+        for _, action, _ in coalescences:
+            bilan[action] += 1
+
+        execution_ids = creer_executions_lot(a_creer, non_executees, date_prevue)
+        bilan["cree"] += len(a_creer)
+        bilan["non_executee"] += len(non_executees)
+
+    mettre_en_file_lot(execution_ids)
+    return bilan
+
+
+def creer_executions_lot(en_file, non_executees, date_prevue):
+    """
+    Crée par bulk_create les exécutions planifiées de `en_file` (statut
+    'pending', mêmes priorité, échéance et date de mise en file que
+    preparer_mise_en_file()) et de `non_executees` (statut
+    'non_executed'), ainsi qu'un résultat par script de chacune, comme le
+    signal post_save. Retourne les ids des exécutions 'pending'.
+    """
+    configurations = [*en_file, *non_executees]
+    if not configurations:
+        return []
+    config_ids = [config.pk for config in configurations]
+    maintenant = now()
+
+    liens = ConfigurationTest.scripts.through.objects.filter(configurationtest_id__in=config_ids)
+    scripts = defaultdict(list)
+    priorites = {}
+    for config_id, script_id, priorite in liens.values_list(
+        "configurationtest_id", "script_id", "script__priorite"
+    ):
+        scripts[config_id].append(script_id)
+        priorites[config_id] = max(priorites.get(config_id, 0), priorite or 0)
+
+    executions = [
+        ExecutionTest(
+            configuration=config,
+            statut="pending",
+            date_mise_en_file=maintenant,
+            priorite=priorites.get(config.pk) or 2,
+            echeance=date_prevue + config.get_periodicite_timedelta(),
+        )
+        for config in en_file
+    ] + [
+        ExecutionTest(configuration=config, statut="non_executed", date_mise_en_file=maintenant)
+        for config in non_executees
+    ]
+    ExecutionTest.objects.bulk_create(executions, batch_size=1000)
+
+    # Relecture : MySQL ne renvoie pas les clés créées par bulk_create.
+    # date_mise_en_file les distingue : les configurations sont verrouillées
+    # et les exécutions « exécuter maintenant » ou les relances sont exclues
+    if any(execution.pk is None for execution in executions):
+        cles = dict(
+            ExecutionTest.objects.filter(
+                configuration_id__in=config_ids, date_mise_en_file=maintenant,
+                immediate=False, parent__isnull=True,
+            ).values_list("configuration_id", "id")
+        )
+        for execution in executions:
+            execution.pk = cles[execution.configuration_id]
+
+    ExecutionResult.objects.bulk_create(
+        [
+            ExecutionResult(execution_id=execution.pk, script_id=script_id, statut=execution.statut)
+            for execution in executions
+            for script_id in scripts[execution.configuration_id]
+        ],
+        batch_size=2000,
+    )
+    return [execution.pk for execution in executions if execution.statut == "pending"]
+
+
+def executer_maintenant(configuration):
+    """
+    Crée et met en file une exécution de la configuration dans la voie
+    prioritaire (« exécuter maintenant ») : elle passe avant les exécutions
+    planifiées et peut prendre les places réservées des workers. Le
+    planning de la configuration (last_execution) n'est pas modifié.
+    """
+    with transaction.atomic():
+        execution = ExecutionTest(configuration=configuration, statut="pending", immediate=True)
+        execution.preparer_mise_en_file()
+        # Échéance immédiate : ordre d'arrivée au sein de la voie prioritaire
+        execution.echeance = execution.date_mise_en_file
+        execution.save()
+    return execution
+
+
+def file_ordonnee():
+    """
+    Exécutions en attente dans leur ordre de passage : voie prioritaire
+    d'abord, priorité effective décroissante, puis échéance la plus proche,
+    puis ordre d'arrivée (index core_exec_file_voie_idx). Les exécutions
+    sans échéance, créées avant son introduction, passent en tête de leur
+    priorité.
+    """
+    return ExecutionTest.objects.filter(statut="pending").order_by("-immediate", "-priorite", "echeance", "id")
+
+
+def get_reglages_partage():
+    """Réglages du partage équitable entre sociétés (SNAPFLOW_PARTAGE_EXECUTION)."""
+    return {
+        "actif": True,
+        "par_projet": False,
+        "fenetre": 3600,
+        "rafraichissement": 15,
+        **getattr(settings, "SNAPFLOW_PARTAGE_EXECUTION", {}),
+    }
+
+
+def temps_execution_par_locataire(executions, instant, par_projet=False):
+    """
+    Temps d'exécution cumulé (secondes) par société, ou par (société, projet),
+    des exécutions données ; celles en cours comptent jusqu'à `instant`.
+    Agrégé en une requête.
+    """
+    cles = ["configuration__societe_id"] + (["configuration__projet_id"] if par_projet else [])
+    duree = ExpressionWrapper(
+        Coalesce("ended_at", Value(instant, output_field=DateTimeField())) - F("started_at"),
+        output_field=DurationField(),
+    )
+    temps = {}
+    for ligne in executions.filter(started_at__isnull=False).values(*cles).annotate(temps=Sum(duree)):
+        cle = tuple(ligne[c] for c in cles) if par_projet else ligne[cles[0]]
+        temps[cle] = ligne["temps"].total_seconds() if ligne["temps"] else 0.0
+    return temps
+
+
+_service_recent = {"cle": None, "expire": 0.0, "valeurs": {}}
+_verrou_service = threading.Lock()
+
+
+def service_recent(fenetre, rafraichissement, par_projet=False):
+    """
+    Temps d'exécution consommé par locataire sur la fenêtre glissante
+    (secondes), recalculé au plus toutes les `rafraichissement` secondes
+    dans chaque processus.
+    """
+    with _verrou_service:
+        cle = (fenetre, par_projet)
+        if _service_recent["cle"] != cle or time.monotonic() >= _service_recent["expire"]:
+            instant = now()
+            _service_recent["valeurs"] = temps_execution_par_locataire(
+                ExecutionTest.objects.filter(started_at__gte=instant - timedelta(seconds=fenetre)),
+                instant,
+                par_projet,
+            )
+            _service_recent["cle"] = cle
+            _service_recent["expire"] = time.monotonic() + rafraichissement
+        return _service_recent["valeurs"]
+
+
+def locataires_equitables(reglages=None, immediates_seulement=False):
+    """
+    Ordre dans lequel servir les locataires (sociétés, et projets au sein
+    d'une société si `par_projet`) qui ont des exécutions en attente :
+    file équitable pondérée. Est servie d'abord la société qui a le moins
+    d'exécutions en cours rapporté à son poids, puis, à égalité, celle qui
+    a consommé le moins de temps d'exécution sur la fenêtre récente (rapporté
+    à son poids). Les sociétés à leur plafond (executions_max) sont écartées.
+    Avec `immediates_seulement`, seuls comptent les locataires qui ont des
+    exécutions en attente dans la voie prioritaire.
+
+    Retourne [(societe_id, projet_id ou None, plafond ou None)].
+    """
+    reglages = reglages or get_reglages_partage()
+    par_projet = reglages["par_projet"]
+    cles = ["configuration__societe_id", "configuration__projet_id"]
+
+    def compter(statut, **filtres):
+        return {
+            (ligne["configuration__societe_id"], ligne["configuration__projet_id"]): ligne["nombre"]
+            for ligne in ExecutionTest.objects.filter(statut=statut, **filtres)
+            .values(*cles)
+            .annotate(nombre=Count("id"))
+        }
+
+    en_attente = compter("pending", **({"immediate": True} if immediates_seulement else {}))
+    if not en_attente:
+        return []
+    en_cours = compter("running")
+    en_cours_societe = defaultdict(int)
+    for (societe_id, _), nombre in en_cours.items():
+        en_cours_societe[societe_id] += nombre
+
+    societes = {
+        societe_id: (max(1, poids), plafond)
+        for societe_id, poids, plafond in Societe.objects.filter(
+            pk__in={societe_id for societe_id, _ in en_attente}
+        ).values_list("id", "poids_execution", "executions_max")
+    }
+    service = service_recent(reglages["fenetre"], reglages["rafraichissement"], par_projet)
+
+    projets_en_attente = defaultdict(list)
+    for societe_id, projet_id in en_attente:
+        projets_en_attente[societe_id].append(projet_id)
+
+    def cle_societe(societe_id):
+        poids, _ = societes.get(societe_id, (1, None))
+        service_societe = (
+            sum(v for (s_id, _), v in service.items() if s_id == societe_id)
+            if par_projet else service.get(societe_id, 0.0)
+        )
+        return (en_cours_societe[societe_id] / poids, service_societe / poids, societe_id or 0)
+
+    ordre = []
+    for societe_id in sorted(projets_en_attente, key=cle_societe):
+        _, plafond = societes.get(societe_id, (1, None))
+        if plafond is not None and en_cours_societe[societe_id] >= plafond:
+            continue
+        if not par_projet:
+            ordre.append((societe_id, None, plafond))
+            continue
+        # Au sein d'une société, projets à poids égaux
+        projets = sorted(
+            projets_en_attente[societe_id],
+            key=lambda projet_id: (
+                en_cours.get((societe_id, projet_id), 0),
+                service.get((societe_id, projet_id), 0.0),
+                projet_id or 0,
+            ),
+        )
+        ordre.extend((societe_id, projet_id, plafond) for projet_id in projets)
+    return ordre
+
+
+def sous_plafond(societe_id, plafond):
+    """
+    Vrai si la société a moins de `plafond` exécutions en cours. Dans une
+    transaction, verrouille la ligne de la société : deux workers ne peuvent
+    pas dépasser ensemble le plafond.
+    """
+    list(Societe.objects.select_for_update().filter(pk=societe_id).values_list("id"))
+    return ExecutionTest.objects.filter(
+        statut="running", configuration__societe_id=societe_id
+    ).count() < plafond
+
+
+def reserver_execution(worker_id, immediates_seulement=False):
+    """
+    Réserve atomiquement la prochaine exécution de la file et retourne son
+    id, ou None si aucune exécution ne peut être réservée.
+
+    Les exécutions de la voie prioritaire (executer_maintenant()) passent
+    avant toutes les autres ; avec `immediates_seulement` (place réservée
+    d'un worker), seules elles peuvent être réservées.
+
+    Avec le partage équitable (par défaut), la société servie est choisie
+    par locataires_equitables(), voie prioritaire d'abord ; au sein d'une
+    société, l'ordre reste celui de file_ordonnee(). Sinon, file_ordonnee()
+    pour toutes les sociétés.
+    """
+    fin_bail = now() + get_duree_bail()
+    reglages = get_reglages_partage()
+    if not reglages["actif"]:
+        en_attente = file_ordonnee()
+        if immediates_seulement:
+            en_attente = en_attente.filter(immediate=True)
+        return reserver_dans(en_attente, worker_id, fin_bail)
+
+    for immediates in (True,) if immediates_seulement else (True, False):
+        for societe_id, projet_id, plafond in locataires_equitables(reglages, immediates):
+            en_attente = file_ordonnee().filter(configuration__societe_id=societe_id)
+            if immediates:
+                en_attente = en_attente.filter(immediate=True)
+            if projet_id is not None:
+                en_attente = en_attente.filter(configuration__projet_id=projet_id)
+            execution_id = reserver_dans(en_attente, worker_id, fin_bail, societe_id, plafond)
+            if execution_id is not None:
+                return execution_id
+    return None
+
+
+def reserver_dans(en_attente, worker_id, fin_bail, societe_id=None, plafond=None):
+    """
+    Réserve la première exécution de `en_attente` (file déjà ordonnée) en
+    respectant le plafond éventuel de la société.
+
+    Utilise SELECT ... FOR UPDATE SKIP LOCKED quand la base le permet
+    (MySQL 8, PostgreSQL) ; sinon un UPDATE conditionnel sur le statut
+    sert de compare-and-set (SQLite, anciennes versions de MySQL).
+    """
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            if plafond is not None and not sous_plafond(societe_id, plafond):
+                return None
+            # Seules les lignes d'exécution sont verrouillées, pas les
+            # configurations jointes pour filtrer par société
+            verrou = {"of": ("self",)} if connection.features.has_select_for_update_of else {}
+            execution_id = (
+                en_attente.select_for_update(skip_locked=True, **verrou)
+                .values_list("id", flat=True)
+                .first()
+            )
+            if execution_id is None:
+                return None
+            ExecutionTest.objects.filter(pk=execution_id).update(
+                statut="running", claimed_by=worker_id, lease_expires_at=fin_bail
+            )
+            return execution_id
+
+    # Candidates lues hors transaction ; dans la transaction, l'écriture
+    # vient en premier. Sous SQLite, une transaction qui lit puis écrit
+    # échoue aussitôt ("database is locked") si un autre processus écrit,
+    # alors qu'une écriture initiale attend son tour (timeout de la base) ;
+    # le plafond est ensuite vérifié sous ce verrou d'écriture.
+    for execution_id in list(en_attente.values_list("id", flat=True)[:20]):
+        with transaction.atomic():
+            reserve = ExecutionTest.objects.filter(pk=execution_id, statut="pending").update(
+                statut="running", claimed_by=worker_id, lease_expires_at=fin_bail
+            )
+            if not reserve:
+                continue
+            if plafond is not None and ExecutionTest.objects.filter(
+                statut="running", configuration__societe_id=societe_id
+            ).count() > plafond:
+                transaction.set_rollback(True)
+                return None
+            return execution_id
+    return None
+
+
+def prolonger_baux(execution_ids, worker_id):
+    """
+    Prolonge en une requête le bail des exécutions tenues par un worker
+    (battement de cœur).
+    """
+    if not execution_ids:
+        return 0
+    instant = now()
+    return ExecutionTest.objects.filter(
+        pk__in=execution_ids, claimed_by=worker_id, statut="running"
+    ).update(lease_expires_at=instant + get_duree_bail(), dernier_battement=instant)
+
+
+def reclamer_baux_expires():
+    """
+    Balaye les exécutions orphelines, restées 'running' alors que le
+    processus qui les menait a disparu (worker, agent ou processus web
+    arrêtés) :
+    - bail expiré : il n'est plus prolongé ;
+    - sans bail, démarrées depuis plus d'une durée de bail (exécutions
+      lancées avant l'introduction des baux).
+
+    Selon la politique de reprise de leur configuration, elles sont
+    remises en file (résultats remis 'pending') ou terminées en erreur
+    (résultats non obtenus marqués 'non_executed'). Au-delà de
+    SNAPFLOW_REPRISES_MAX reprises, une exécution est terminée. Les
+    écritures sont groupées : quatre UPDATE au plus, quel que soit le
+    nombre d'orphelines.
+
+    Retourne (remises en file, terminées).
+    """
+    instant = now()
+    orphelines = ExecutionTest.objects.filter(statut="running").filter(
+        Q(lease_expires_at__lt=instant)
+        | Q(lease_expires_at__isnull=True, started_at__lt=instant - get_duree_bail())
+    )
+    reprises_max = getattr(settings, "SNAPFLOW_REPRISES_MAX", 3)
+
+    a_remettre, a_terminer = [], []
+    for execution_id, politique, reprises in orphelines.values_list(
+        "id", "configuration__politique_reprise", "reprises"
+    ):
+        if politique == "requeue" and reprises < reprises_max:
+            a_remettre.append(execution_id)
+        else:
+            a_terminer.append(execution_id)
+
+    # Les UPDATE reprennent les conditions de `orphelines` : une exécution
+    # dont le bail vient d'être prolongé n'est pas touchée
+    remises = terminees = 0
+    if a_remettre:
+        with transaction.atomic():
+            remises = orphelines.filter(pk__in=a_remettre).update(
+                statut="pending",
+                claimed_by="",
+                lease_expires_at=None,
+                reprises=F("reprises") + 1,
+            )
+            # Seules les exécutions effectivement remises en file (verrouillées
+            # par l'UPDATE) : pas celles prolongées ou terminées entre-temps
+            a_remettre = list(
+                ExecutionTest.objects.filter(pk__in=a_remettre, statut="pending", claimed_by="")
+                .values_list("id", flat=True)
+            )
+            ExecutionResult.objects.filter(execution_id__in=a_remettre).exclude(
+                statut="pending"
+            ).update(statut="pending")
+        logger.warning(f"♻️ {remises} exécution(s) orpheline(s) remise(s) en file")
+
+        if get_backend_execution() == "thread":
+            for execution_id in a_remettre:
+                mettre_en_file(ExecutionTest(pk=execution_id))
+
+    if a_terminer:
+        with transaction.atomic():
+            terminees = orphelines.filter(pk__in=a_terminer).update(
+                statut="error",
+                ended_at=instant,
+                lease_expires_at=None,
+                rapport="Exécution interrompue : le processus qui la menait s'est arrêté "
+                        "(bail expiré sans battement de cœur)",
+            )
+            a_terminer = list(
+                ExecutionTest.objects.filter(pk__in=a_terminer, statut="error", ended_at=instant)
+                .values_list("id", flat=True)
+            )
+            ExecutionResult.objects.filter(
+                execution_id__in=a_terminer, statut="pending"
+            ).update(statut="non_executed")
+        logger.warning(f"🪦 {terminees} exécution(s) orpheline(s) terminée(s) en erreur")
+
+    return remises, terminees
+
+
+def liberer_execution(execution_id, worker_id):
+    """Libère le bail d'une exécution terminée."""
+    ExecutionTest.objects.filter(pk=execution_id, claimed_by=worker_id).update(
+        lease_expires_at=None
+    )
@@ -0,0 +1,465 @@
+# core/hote_scripts.py
+"""
+Hôtes de scripts pré-chauffés (style forkserver).
+
+Un hôte est un interpréteur Python longue durée qui a déjà importé les
+modules lourds utilisés par les scripts (selenium, requests...). Pour chaque
+script, il crée un processus fils par fork() : le fils hérite des modules
+déjà chargés et exécute le script avec runpy, ce qui évite le démarrage de
+l'interpréteur et les imports à chaque exécution.
+
+Le processus appelant garde une socket (socketpair AF_UNIX/SEQPACKET) par
+hôte. Il y envoie le chemin du script avec les extrémités d'écriture de ses
+pipes stdout/stderr (SCM_RIGHTS), reçoit le pid du fils puis son code de
+retour et sa consommation (os.wait4, pic de mémoire relevé pendant
+l'exécution) : l'objet renvoyé se manipule comme un
+subprocess.Popen.
+
+Ce fichier est lancé directement par l'interpréteur (`python hote_scripts.py`)
+et ne doit dépendre que de la bibliothèque standard. Unix uniquement.
+"""
+import importlib
+import json
+import os
+import queue
+import select
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+TAILLE_MESSAGE = 65536
+# Variable donnant au script le descripteur de son canal de résultats
+# (lignes JSON, voir core/snapflow_resultats.py)
+VARIABLE_RESULTATS = "SNAPFLOW_RESULT_FD"
+
+
+def appliquer_limites(limites):
+    """
+    Applique au processus courant les limites d'un script :
+    {'cpu_secondes': int, 'memoire_mo': int, 'nice': int} (clés facultatives).
+    Appelée dans le fils, avant l'exécution du script ; les processus lancés
+    par le script (navigateur) en héritent.
+    """
+    if not limites:
+        return
+    import resource
+
+    cpu = limites.get("cpu_secondes")
+    if cpu:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu))
+    memoire = limites.get("memoire_mo")
+    if memoire:
+        octets = memoire * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (octets, octets))
+    if limites.get("nice"):
+        os.nice(limites["nice"])
+
+
+def abaisser_priorite(pid, increment):
+    """os.nice(increment) appliqué à un processus déjà lancé (`pid`)."""
+    priorite = min(19, os.getpriority(os.PRIO_PROCESS, 0) + increment)
+    try:
+        os.setpriority(os.PRIO_PROCESS, pid, priorite)
+    except ProcessLookupError:
+        pass  # déjà terminé
+
+
+def mesure_usage(usage, pic_memoire_ko=None):
+    """
+    Consommation d'un processus terminé : temps CPU utilisateur et système
+    (secondes), d'après la struct rusage de os.wait4(), et pic de mémoire
+    résidente (Ko) relevé pendant son exécution (voir RelevePicMemoire).
+    Le temps CPU couvre le processus et les fils qu'il a lui-même attendus,
+    pas ceux tués avec son groupe.
+
+    ru_maxrss n'est pas utilisé : pour un processus lancé par fork + exec,
+    Linux y garde le pic du processus avant exec, c'est-à-dire celui du
+    processus qui l'a lancé.
+    """
+    return {
+        "cpu_utilisateur": round(usage.ru_utime, 3),
+        "cpu_systeme": round(usage.ru_stime, 3),
+        "rss_max_ko": pic_memoire_ko,
+    }
+
+
+def pic_memoire_ko(pid):
+    """VmHWM de /proc/<pid>/status (Ko) ; None hors Linux ou si le processus est terminé."""
+    try:
+        with open(f"/proc/{pid}/status", "rb") as f:
+            for ligne in f:
+                if ligne.startswith(b"VmHWM:"):
+                    return int(ligne.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class RelevePicMemoire:
+    """
+    Pic de mémoire résidente d'un processus en cours, relevé dans
+    /proc/<pid>/status (VmHWM) à chaque appel de relever(). VmHWM ne fait
+    que croître pendant la vie du processus et ne compte que la mémoire
+    de l'image exécutée (remise à zéro par exec) ; il n'est plus lisible
+    une fois le processus terminé : la croissance après le dernier relevé
+    est perdue. Pour un script exécuté par un hôte, il compte aussi les
+    pages partagées avec l'hôte (modules pré-chargés).
+    """
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.pic = None
+        self.relever()
+
+    def relever(self):
+        valeur = pic_memoire_ko(self.pid)
+        if valeur is not None and (self.pic is None or valeur > self.pic):
+            self.pic = valeur
+        return self.pic
+
+
+PAS_RELEVE_MIN = 0.01  # secondes entre deux relevés de mémoire, doublées à chaque relevé
+PAS_RELEVE_MAX = 0.25
+
+
+def attendre_fin(pid, timeout, releve=None):
+    """
+    Attend au plus `timeout` secondes la fin d'un processus fils, sans le
+    récupérer ; retourne True s'il est terminé. Par un pidfd (Linux ≥ 5.3),
+    sinon par waitid(WNOWAIT) à intervalles croissants. Avec `releve`
+    (RelevePicMemoire), le pic de mémoire du processus est relevé pendant
+    l'attente, d'abord toutes les PAS_RELEVE_MIN secondes puis au plus
+    toutes les PAS_RELEVE_MAX secondes.
+    """
+    limite = None if timeout is None else time.monotonic() + timeout
+    try:
+        pidfd = os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        pidfd = None
+    if pidfd is not None:
+        try:
+            attente = select.poll()
+            attente.register(pidfd, select.POLLIN)
+            pas = PAS_RELEVE_MIN
+            while True:
+                if releve is not None:
+                    releve.relever()
+                reste = None if limite is None else max(0.0, limite - time.monotonic())
+                delai = reste if releve is None else (pas if reste is None else min(pas, reste))
+                if attente.poll(None if delai is None else delai * 1000):
+                    return True
+                if reste is not None and delai >= reste:
+                    return False
+                pas = min(pas * 2, PAS_RELEVE_MAX)
+        finally:
+            os.close(pidfd)
+
+    intervalle = 0.0005
+    while os.waitid(os.P_PID, pid, os.WEXITED | os.WNOHANG | os.WNOWAIT) is None:
+        if releve is not None:
+            releve.relever()
+        reste = None if limite is None else limite - time.monotonic()
+        if reste is not None and reste <= 0:
+            return False
+        time.sleep(intervalle if reste is None else min(intervalle, reste))
+        intervalle = min(intervalle * 2, 0.05)
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Côté hôte
+# ---------------------------------------------------------------------------
+
+def _executer_dans_fils(demande, fds):
+    """
+    Corps du processus fils : redirige stdout/stderr (fds[0], fds[1]) puis
+    exécute le script. fds[2], s'il est fourni, reste ouvert comme canal de
+    résultats.
+    """
+    import runpy
+    import traceback
+
+    os.setsid()  # groupe de processus propre, comme un script lancé à froid
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.dup2(fds[0], 1)
+    os.dup2(fds[1], 2)
+    for fd in (devnull, *fds[:2]):
+        os.close(fd)
+    sys.stdout = open(1, "w", encoding="utf-8", errors="backslashreplace", closefd=False)
+    sys.stderr = open(2, "w", encoding="utf-8", errors="backslashreplace", closefd=False)
+
+    appliquer_limites(demande.get("limites"))
+
+    chemin = demande["chemin"]
+    env = demande.get("env") or {}
+    os.environ.update(env)
+    if len(fds) > 2:
+        os.environ[VARIABLE_RESULTATS] = str(fds[2])
+    sys.argv = [chemin]
+    sys.path[0] = os.path.dirname(os.path.abspath(chemin))
+    if env.get("PYTHONPATH"):
+        # L'interpréteur de l'hôte a déjà lu PYTHONPATH au démarrage
+        sys.path[1:1] = [p for p in env["PYTHONPATH"].split(os.pathsep) if p]
+
+    code = 0
+    try:
+        runpy.run_path(chemin, run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        # Comme à la sortie normale d'un interpréteur : fonctions atexit
+        # (enregistrées par le script ou ses imports) puis vidage des flux
+        import atexit
+        atexit._run_exitfuncs()
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except Exception:
+            pass
+    os._exit(code)
+
+
+def servir(canal, modules):
+    """Boucle de l'hôte : une demande à la fois, un fork par script."""
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except Exception:
+            pass  # Un module absent ne doit pas empêcher l'hôte de servir
+
+    while True:
+        try:
+            message, fds, _, _ = socket.recv_fds(canal, TAILLE_MESSAGE, 3)
+        except OSError:
+            break
+        if not message:
+            break  # Le processus appelant a fermé la socket
+
+        demande = json.loads(message)
+        pid = os.fork()
+        if pid == 0:
+            canal.close()
+            _executer_dans_fils(demande, fds)
+        for fd in fds:
+            os.close(fd)
+
+        canal.send(json.dumps({"pid": pid}).encode())
+        releve = RelevePicMemoire(pid)
+        attendre_fin(pid, None, releve)
+        _, statut, usage = os.wait4(pid, 0)
+        canal.send(json.dumps({
+            "returncode": os.waitstatus_to_exitcode(statut),
+            "usage": mesure_usage(usage, releve.pic),
+        }).encode())
+
+
+def main():
+    canal = socket.socket(fileno=int(sys.argv[1]))
+    servir(canal, sys.argv[2:])
+
+
+# ---------------------------------------------------------------------------
+# Côté processus appelant
+# ---------------------------------------------------------------------------
+
+class HoteIndisponible(Exception):
+    """L'hôte ne répond plus (arrêté, tué ou canal fermé)."""
+
+
+class ProcessusHeberge:
+    """Script exécuté par un hôte, avec l'interface utile de subprocess.Popen."""
+
+    def __init__(self, hote, pid, stdout, stderr, args):
+        self.hote = hote
+        self.pid = pid
+        self.stdout = stdout
+        self.stderr = stderr
+        self.args = args
+        self.returncode = None
+        self.usage = None
+
+    def wait(self, timeout=None):
+        if self.returncode is None:
+            reponse = self.hote.recevoir(timeout, self.args)
+            self.returncode = reponse["returncode"]
+            self.usage = reponse.get("usage")
+        return self.returncode
+
+    def poll(self):
+        if self.returncode is None:
+            try:
+                return self.wait(timeout=0)
+            except subprocess.TimeoutExpired:
+                return None
+        return self.returncode
+
+    def kill(self):
+        """Tue le fils et les processus qu'il a lancés (son groupe, voir setsid())."""
+        try:
+            os.killpg(self.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+class HoteScripts:
+    """Un interpréteur pré-chauffé, utilisé par un seul script à la fois."""
+
+    def __init__(self, modules=()):
+        self.canal, extremite_hote = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        try:
+            self.processus = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), str(extremite_hote.fileno()), *modules],
+                pass_fds=[extremite_hote.fileno()],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        finally:
+            extremite_hote.close()
+
+    def est_vivant(self):
+        return self.processus.poll() is None
+
+    def lancer(self, chemin, env=None, limites=None, fd_resultats=None):
+        """
+        Demande l'exécution d'un script ; retourne un ProcessusHeberge.
+        `fd_resultats` (extrémité d'écriture du canal de résultats) est
+        transmis au fils ; il reste à la charge de l'appelant.
+        """
+        lecture_out, ecriture_out = os.pipe()
+        lecture_err, ecriture_err = os.pipe()
+        fds = [ecriture_out, ecriture_err]
+        if fd_resultats is not None:
+            fds.append(fd_resultats)
+        try:
+            demande = json.dumps({"chemin": chemin, "env": env or {}, "limites": limites}).encode()
+            socket.send_fds(self.canal, [demande], fds)
+        except OSError as e:
+            os.close(lecture_out)
+            os.close(lecture_err)
+            raise HoteIndisponible(str(e))
+        finally:
+            # Seul le fils (ou personne, en cas d'échec) écrit dans les pipes
+            os.close(ecriture_out)
+            os.close(ecriture_err)
+
+        args = [sys.executable, chemin]
+        try:
+            reponse = self.recevoir(10, args)
+        except (HoteIndisponible, subprocess.TimeoutExpired):
+            os.close(lecture_out)
+            os.close(lecture_err)
+            raise HoteIndisponible("L'hôte n'a pas démarré le script")
+        return ProcessusHeberge(
+            self, reponse["pid"], os.fdopen(lecture_out, "rb"), os.fdopen(lecture_err, "rb"), args
+        )
+
+    def recevoir(self, timeout, args):
+        self.canal.settimeout(timeout)
+        try:
+            message = self.canal.recv(TAILLE_MESSAGE)
+        except (socket.timeout, BlockingIOError):
+            # timeout=0 (poll()) : socket non bloquante, pas de réponse = toujours en cours
+            raise subprocess.TimeoutExpired(args, timeout)
+        except OSError as e:
+            raise HoteIndisponible(str(e))
+        if not message:
+            raise HoteIndisponible("Canal de l'hôte fermé")
+        return json.loads(message)
+
+    def arreter(self):
+        try:
+            self.canal.close()
+        finally:
+            try:
+                self.processus.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.processus.kill()
+
+
+class PoolHotes:
+    """
+    Ensemble d'au plus `taille` hôtes pré-chauffés. Les hôtes sont créés à
+    la demande et réutilisés ; un hôte défaillant est remplacé.
+    """
+
+    def __init__(self, taille, modules=()):
+        self.taille = taille
+        self.modules = tuple(modules)
+        self._libres = queue.Queue()
+        self._crees = 0
+        self._verrou = threading.Lock()
+
+    def acquerir(self):
+        try:
+            return self._libres.get_nowait()
+        except queue.Empty:
+            pass
+        with self._verrou:
+            if self._crees < self.taille:
+                self._crees += 1
+                try:
+                    return HoteScripts(self.modules)
+                except Exception:
+                    self._crees -= 1
+                    raise
+        return self._libres.get()
+
+    def rendre(self, hote, defaillant=False):
+        if defaillant or not hote.est_vivant():
+            hote.arreter()
+            with self._verrou:
+                self._crees -= 1
+            return
+        self._libres.put(hote)
+
+    def prechauffer(self):
+        """Démarre tous les hôtes sans attendre la première exécution."""
+        hotes = [self.acquerir() for _ in range(self.taille)]
+        for hote in hotes:
+            self.rendre(hote)
+
+    def arreter(self):
+        while True:
+            try:
+                hote = self._libres.get_nowait()
+            except queue.Empty:
+                break
+            hote.arreter()
+            with self._verrou:
+                self._crees -= 1
+
+
+_pools = {}
+_pools_verrou = threading.Lock()
+
+
+def get_pool_hotes(taille, modules=()):
+    """Pool partagé par le processus pour une taille et une liste de modules données."""
+    if taille <= 0 or not hasattr(socket, "send_fds") or not hasattr(os, "fork"):
+        return None
+    cle = (taille, tuple(modules))
+    with _pools_verrou:
+        if cle not in _pools:
+            _pools[cle] = PoolHotes(taille, modules)
+        return _pools[cle]
+
+
+if __name__ == "__main__":
+    main()
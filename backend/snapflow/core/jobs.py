@@ -1,101 +1,94 @@
 # core/jobs.py
 from django.utils.timezone import now
 from django.db.models import Q
-from datetime import timedelta
 import logging
 
-from core.models import ConfigurationTest, ExecutionTest
+from core.echeances import PERIODICITES
+from core.models import ConfigurationTest
+from core.execution_queue import declencher_executions, reclamer_baux_expires
 
 logger = logging.getLogger(__name__)
 
-# Définition des périodicités
-PERIODICITE_DELTA = {
-    '2min': timedelta(minutes=2),
-    '2h': timedelta(hours=2),
-    '6h': timedelta(hours=6),
-    '1j': timedelta(days=1),
-    '1s': timedelta(weeks=1),
-    '1m': timedelta(days=30),
-}
+# Définition des périodicités (celles de ConfigurationTest)
+PERIODICITE_DELTA = PERIODICITES
+
+def configurations_dues(current_time):
+    """
+    Configurations actives dont l'échéance matérialisée (next_run_at) est
+    passée et qui ne sont pas désactivées entre-temps : une requête
+    d'intervalle sur l'index core_config_echeance_idx.
+    """
+    return ConfigurationTest.objects.filter(
+        is_active=True, next_run_at__lte=current_time
+    ).filter(
+        Q(date_desactivation__gt=current_time) | Q(date_desactivation__isnull=True)
+    )
+
 
 def execute_pending_tests():
+    """
+    Passe complète : déclenche toutes les configurations dues. Le
+    planificateur (core/planificateur.py) ne traite que les configurations
+    arrivées à échéance ; cette fonction reste pour les vérifications
+    manuelles (manage.py test_scheduler --execute).
+    """
     current_time = now()
     logger.info(f"🕒 Début vérification des tests à exécuter - {current_time}")
     print(f"🕒 Début vérification des tests à exécuter - {current_time}")
 
-    # Configurations actives et valides dans la période
-    active_configs = ConfigurationTest.objects.filter(
-        is_active=True
-    ).filter(
-        Q(date_activation__lte=current_time) | Q(date_activation__isnull=True)
-    ).filter(
-        Q(date_desactivation__gt=current_time) | Q(date_desactivation__isnull=True)
-    )
+    bilan = traiter_configurations(list(configurations_dues(current_time)), current_time)
 
-    logger.info(f"📊 {active_configs.count()} configuration(s) active(s) trouvée(s)")
-    print(f"📊 {active_configs.count()} configuration(s) active(s) trouvée(s)")
+    logger.info(f"✅ Fin vérification des tests")
+    print(f"✅ Fin vérification des tests")
+    return bilan
 
-    for config in active_configs:
-        logger.info(f"🔍 Vérification configuration: {config.nom} (Périodicité: {config.periodicite})")
-        print(f"🔍 Vérification configuration: {config.nom} (Périodicité: {config.periodicite})")
 
+def traiter_configurations(configurations, current_time):
+    """
+    Déclenche en un lot les configurations dues : une exécution en file
+    pour chacune (selon sa politique de chevauchement), ou une exécution
+    'non_executed' si son déclenchement a été oublié (plus de deux
+    périodes écoulées). Les configurations pas encore dues sont ignorées.
+    Voir execution_queue.declencher_executions() ; retourne son bilan.
+    """
+    dues, oubliees = [], set()
+    for config in configurations:
         delta = PERIODICITE_DELTA.get(config.periodicite)
         if not delta:
             logger.warning(f"⚠️ Périodicité inconnue pour {config.nom} : {config.periodicite}")
             print(f"⚠️ Périodicité inconnue pour {config.nom} : {config.periodicite}")
             continue
-
         last_exec = config.last_execution
-        logger.info(f"⏰ Dernière exécution: {last_exec}")
-        print(f"⏰ Dernière exécution: {last_exec}")
-
-        if not last_exec:
-            # Aucun test encore exécuté → créer une première exécution
-            logger.info(f"🚀 Première exécution pour : {config.nom}")
-            print(f"🚀 Première exécution pour : {config.nom}")
-            
-            execution = ExecutionTest.objects.create(configuration=config, statut='pending')
-            config.last_execution = current_time
-            config.save()
-            
-            logger.info(f"✅ Execution créée: {execution.id}")
-            print(f"✅ Execution créée: {execution.id}")
-        else:
-            time_since_last = current_time - last_exec
-            logger.info(f"⏱️ Temps écoulé depuis dernière exécution: {time_since_last}")
-            print(f"⏱️ Temps écoulé depuis dernière exécution: {time_since_last}")
-            print(f"📅 Delta requis: {delta}")
-
+        if last_exec is None or current_time - last_exec >= delta:
+            dues.append(config)
             # Vérifier si on a dépassé le double du délai → alors test oublié
-            if time_since_last >= 2 * delta:
-                logger.warning(f"❌ Test oublié pour : {config.nom} - Temps écoulé: {time_since_last}")
-                print(f"❌ Test oublié pour : {config.nom} - Temps écoulé: {time_since_last}")
-                
-                execution = ExecutionTest.objects.create(configuration=config, statut='non_executed')
-                config.last_execution = current_time
-                config.save()
-                
-                logger.info(f"✅ Execution 'non_executed' créée: {execution.id}")
-                print(f"✅ Execution 'non_executed' créée: {execution.id}")
-
-            elif time_since_last >= delta:
-                logger.info(f"🚀 Exécution planifiée pour : {config.nom}")
-                print(f"🚀 Exécution planifiée pour : {config.nom}")
-                
-                execution = ExecutionTest.objects.create(configuration=config, statut='pending')
-                config.last_execution = current_time
-                config.save()
-                
-                logger.info(f"✅ Execution 'pending' créée: {execution.id}")
-                print(f"✅ Execution 'pending' créée: {execution.id}")
-            else:
-                temps_restant = delta - time_since_last
-                logger.info(f"⏸️ Trop tôt pour {config.nom} - Temps restant: {temps_restant}")
-                print(f"⏸️ Trop tôt pour {config.nom} - Temps restant: {temps_restant}")
+            if last_exec is not None and current_time - last_exec >= 2 * delta:
+                logger.warning(f"❌ Test oublié pour : {config.nom} - Temps écoulé: {current_time - last_exec}")
+                oubliees.add(config.pk)
+
+    bilan = declencher_executions(dues, current_time, oubliees)
+    if dues:
+        message = f"🚀 {len(dues)} configuration(s) déclenchée(s) : " + ", ".join(
+            f"{nombre} {action}" for action, nombre in sorted(bilan.items())
+        )
+        logger.info(message)
+        print(message)
+    return bilan
+
+
+def balayer_executions_orphelines():
+    """
+    Reprend les exécutions restées 'running' après l'arrêt du processus qui
+    les menait (voir reclamer_baux_expires). Tourne aussi sans worker
+    actif, en particulier en mode 'thread'.
+    """
+    remises, terminees = reclamer_baux_expires()
+    if remises or terminees:
+        logger.warning(f"♻️ Exécutions orphelines : {remises} remise(s) en file, {terminees} terminée(s)")
+        print(f"♻️ Exécutions orphelines : {remises} remise(s) en file, {terminees} terminée(s)")
+    return remises, terminees
+
 
-    logger.info(f"✅ Fin vérification des tests")
-    print(f"✅ Fin vérification des tests")
-    
 def detecter_scripts_problemes():
     """
     Cette fonction est censée détecter des problèmes dans les scripts d'exécution.
@@ -0,0 +1,124 @@
+# core/journaux.py
+"""
+Logs de scripts compressés avec accès direct par numéro de ligne.
+
+Un log compressé (`script_<id>.log.gz`) est une suite de membres gzip
+indépendants, chacun contenant un bloc de lignes : le fichier reste lisible
+par `zcat`/`gzip.open`. Un index (`script_<id>.log.gz.idx`, JSON) donne pour
+chaque bloc son numéro de première ligne, sa position et sa taille en
+octets, ce qui permet de lire une plage de lignes en ne décompressant que
+les blocs concernés.
+
+Ce module ne dépend pas de Django (il est utilisé par core/executeur.py).
+"""
+import bisect
+import gzip
+import json
+import os
+from itertools import islice
+
+LIGNES_PAR_BLOC = 500
+OCTETS_PAR_BLOC = 256 * 1024
+EXTENSION_INDEX = ".idx"
+
+
+def est_compresse(chemin):
+    return str(chemin).endswith(".gz")
+
+
+class JournalCompresse:
+    """Écrit un log ligne par ligne sous forme de blocs gzip indexés."""
+
+    def __init__(self, chemin, lignes_par_bloc=LIGNES_PAR_BLOC, octets_par_bloc=OCTETS_PAR_BLOC):
+        self.chemin = chemin
+        self.lignes_par_bloc = lignes_par_bloc
+        self.octets_par_bloc = octets_par_bloc
+        self.blocs = []  # [premiere_ligne, position, taille]
+        self.nb_lignes = 0
+        self._bloc = []
+        self._taille_bloc = 0
+        self._fichier = open(chemin, "wb")
+
+    def write(self, texte):
+        """Ajoute une ou plusieurs lignes terminées par '\\n' (interface fichier texte)."""
+        if texte.endswith("\n"):
+            texte = texte[:-1]
+        for ligne in texte.split("\n"):
+            self._bloc.append(ligne)
+            self._taille_bloc += len(ligne)
+            if len(self._bloc) >= self.lignes_par_bloc or self._taille_bloc >= self.octets_par_bloc:
+                self._vider_bloc()
+
+    def _vider_bloc(self):
+        if not self._bloc:
+            return
+        donnees = ("\n".join(self._bloc) + "\n").encode("utf-8")
+        membre = gzip.compress(donnees, compresslevel=6, mtime=0)
+        self.blocs.append([self.nb_lignes, self._fichier.tell(), len(membre)])
+        self._fichier.write(membre)
+        self.nb_lignes += len(self._bloc)
+        self._bloc = []
+        self._taille_bloc = 0
+
+    def close(self):
+        if self._fichier is None:
+            return
+        self._vider_bloc()
+        self._fichier.close()
+        self._fichier = None
+        with open(self.chemin + EXTENSION_INDEX, "w", encoding="utf-8") as f:
+            json.dump({"lignes": self.nb_lignes, "blocs": self.blocs}, f)
+
+
+def ouvrir_journal(chemin):
+    """Ouvre un log en écriture : compressé si le chemin se termine par .gz."""
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    if est_compresse(chemin):
+        return JournalCompresse(chemin)
+    return open(chemin, "w", encoding="utf-8")
+
+
+def lire_lignes(chemin, offset=0, limit=100):
+    """
+    Retourne (lignes, total) pour les lignes [offset, offset + limit) d'un log.
+    `total` vaut None quand il n'est pas connu sans lire tout le fichier
+    (log non compressé, ou log compressé dont l'index est absent).
+    """
+    offset = max(0, offset)
+    index = _charger_index(chemin) if est_compresse(chemin) else None
+
+    if index is None:
+        # Log texte, ou compressé sans index (script interrompu) : lecture
+        # séquentielle, arrêtée dès que la plage demandée est atteinte
+        ouvrir = gzip.open if est_compresse(chemin) else open
+        with ouvrir(chemin, "rt", encoding="utf-8", errors="replace") as f:
+            lignes = [l.rstrip("\n") for l in islice(f, offset, offset + limit)]
+        return lignes, None
+
+    total = index["lignes"]
+    blocs = index["blocs"]
+    if not blocs or offset >= total:
+        return [], total
+
+    premieres = [bloc[0] for bloc in blocs]
+    i = bisect.bisect_right(premieres, offset) - 1
+    lignes = []
+    fin = min(offset + limit, total)
+    with open(chemin, "rb") as f:
+        while i < len(blocs) and blocs[i][0] < fin:
+            premiere, position, taille = blocs[i]
+            f.seek(position)
+            contenu = gzip.decompress(f.read(taille)).decode("utf-8", errors="replace")
+            bloc = contenu.split("\n")[:-1]
+            debut = max(0, offset - premiere)
+            lignes.extend(bloc[debut:fin - premiere])
+            i += 1
+    return lignes, total
+
+
+def _charger_index(chemin):
+    try:
+        with open(chemin + EXTENSION_INDEX, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,67 @@
+# core/management/commands/bench_demarrage_scripts.py
+import os
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.executeur import executer_script
+from core.hote_scripts import PoolHotes
+
+
+class Command(BaseCommand):
+    help = "Compare la latence de démarrage d'un script : interpréteur neuf vs hôte pré-chauffé"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=20, help='Nombre d\'exécutions par mode (défaut: 20)')
+        parser.add_argument(
+            '--modules',
+            nargs='*',
+            default=None,
+            help='Modules importés par le script synthétique (défaut: SNAPFLOW_SCRIPT_HOST_MODULES)',
+        )
+
+    def handle(self, *args, **options):
+        modules = options['modules']
+        if modules is None:
+            modules = list(getattr(settings, 'SNAPFLOW_SCRIPT_HOST_MODULES', []))
+
+        with tempfile.TemporaryDirectory(prefix="snapflow_bench_") as dossier:
+            chemin = os.path.join(dossier, "script_demarrage.py")
+            with open(chemin, "w", encoding="utf-8") as f:
+                for module in modules:
+                    f.write(f"try:\n    import {module}\nexcept ImportError:\n    pass\n")
+                f.write('print("✅ Script synthétique terminé")\n')
+
+            self.stdout.write(self.style.SUCCESS('\n=== BENCHMARK DÉMARRAGE DES SCRIPTS ==='))
+            self.stdout.write(f"Modules importés: {', '.join(modules) or 'aucun'}")
+
+            pool = PoolHotes(1, modules)
+            pool.prechauffer()
+            try:
+                mesures = {
+                    'à froid': self.mesurer(chemin, options['runs'], None),
+                    'hôte pré-chauffé': self.mesurer(chemin, options['runs'], pool),
+                }
+            finally:
+                pool.arreter()
+
+        for mode, durees in mesures.items():
+            self.stdout.write(
+                f"  - {mode}: médiane {statistics.median(durees) * 1000:.1f} ms, "
+                f"min {min(durees) * 1000:.1f} ms, max {max(durees) * 1000:.1f} ms"
+            )
+        gain = statistics.median(mesures['à froid']) / statistics.median(mesures['hôte pré-chauffé'])
+        self.stdout.write(self.style.SUCCESS(f"\nAccélération (médiane): x{gain:.1f}"))
+
+    def mesurer(self, chemin, runs, pool):
+        durees = []
+        for _ in range(runs):
+            debut = time.monotonic()
+            resultat = executer_script(chemin, pool_hotes=pool)
+            durees.append(time.monotonic() - debut)
+            if resultat['returncode'] != 0:
+                self.stdout.write(self.style.ERROR(f"❌ Échec: {resultat['stderr']}"))
+        return durees
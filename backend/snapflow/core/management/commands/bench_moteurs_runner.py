@@ -0,0 +1,125 @@
+# core/management/commands/bench_moteurs_runner.py
+import asyncio
+import os
+import resource
+import shutil
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.executeur import executer_scripts, statut_depuis_resultat
+from core.executeur_async import executer_scripts_async
+
+
+class Echantillonneur:
+    """Relève périodiquement le nombre de threads et la mémoire résidente du processus."""
+
+    def __init__(self, periode=0.05):
+        self.periode = periode
+        self.threads_max = 0
+        self.rss_max = 0
+        self._arret = threading.Event()
+        self._thread = threading.Thread(target=self.boucle, daemon=True)
+
+    def boucle(self):
+        while not self._arret.is_set():
+            # Le thread d'échantillonnage lui-même n'est pas compté
+            self.threads_max = max(self.threads_max, threading.active_count() - 1)
+            self.rss_max = max(self.rss_max, rss_ko())
+            self._arret.wait(self.periode)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._arret.set()
+        self._thread.join()
+
+
+def rss_ko():
+    """Mémoire résidente actuelle du processus (Linux), en Ko."""
+    try:
+        with open("/proc/self/status") as f:
+            for ligne in f:
+                if ligne.startswith("VmRSS:"):
+                    return int(ligne.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare les moteurs d'exécution 'threads' et 'asyncio' sur des scripts "
+        "synthétiques lancés simultanément : durée totale, temps CPU du "
+        "superviseur, threads et mémoire résidente au plus haut."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scripts', type=int, nargs='+', default=[50, 200],
+                            help="Nombres de scripts simultanés (défaut : 50 200)")
+        parser.add_argument('--duree', type=float, default=2.0,
+                            help="Durée de chaque script en secondes (défaut : 2)")
+        parser.add_argument('--lignes', type=int, default=500,
+                            help="Lignes écrites par chaque script (défaut : 500)")
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('\n=== MOTEURS D\'EXÉCUTION : THREADS / ASYNCIO ==='))
+        dossier = tempfile.mkdtemp(prefix="snapflow_moteurs_")
+        try:
+            script = os.path.join(dossier, "script.py")
+            with open(script, "w", encoding="utf-8") as f:
+                f.write(
+                    "import time\n"
+                    f"for i in range({options['lignes']}):\n"
+                    "    print(f'ligne {i} ' + 'x' * 80, flush=True)\n"
+                    f"    time.sleep({options['duree']} / {max(1, options['lignes'])})\n"
+                )
+
+            self.stdout.write(
+                f"\n  {'Scripts':>7} {'Moteur':<8} {'Durée (s)':>10} {'CPU (s)':>8} "
+                f"{'Threads max':>12} {'RSS max (Mo)':>13} {'Échecs':>7}"
+            )
+            for nombre in sorted(options['scripts']):
+                chemins = [script] * nombre
+                logs = [os.path.join(dossier, f"log_{i}.log.gz") for i in range(nombre)]
+                for moteur, executer in (("threads", self.executer_threads), ("asyncio", self.executer_async)):
+                    mesure = self.mesurer(executer, chemins, logs)
+                    self.stdout.write(
+                        f"  {nombre:>7} {moteur:<8} {mesure['duree']:>10.2f} {mesure['cpu']:>8.2f} "
+                        f"{mesure['threads']:>12} {mesure['rss'] / 1024:>13.1f} {mesure['echecs']:>7}"
+                    )
+        finally:
+            shutil.rmtree(dossier, ignore_errors=True)
+
+        self.stdout.write(
+            "\n  Un worker 'threads' ouvre en plus une connexion à la base par exécution en cours ; "
+            "un worker 'asyncio', une seule."
+        )
+
+    def mesurer(self, executer, chemins, logs):
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        debut = time.perf_counter()
+        with Echantillonneur() as echantillons:
+            resultats = executer(chemins, logs)
+        duree = time.perf_counter() - debut
+        fin = resource.getrusage(resource.RUSAGE_SELF)
+        return {
+            "duree": duree,
+            "cpu": (fin.ru_utime - usage.ru_utime) + (fin.ru_stime - usage.ru_stime),
+            "threads": echantillons.threads_max,
+            "rss": echantillons.rss_max,
+            "echecs": sum(1 for r in resultats if statut_depuis_resultat(r) != "done"),
+        }
+
+    def executer_threads(self, chemins, logs):
+        return [r for _, r in executer_scripts(chemins, len(chemins), chemins_log=logs)]
+
+    def executer_async(self, chemins, logs):
+        async def executer():
+            return [r async for _, r in executer_scripts_async(chemins, len(chemins), chemins_log=logs)]
+
+        return asyncio.run(executer())
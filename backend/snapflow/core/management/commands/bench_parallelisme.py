@@ -0,0 +1,48 @@
+# core/management/commands/bench_parallelisme.py
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.executeur import executer_scripts
+
+SCRIPT_SYNTHETIQUE = """import time
+time.sleep({duree})
+print("✅ Script synthétique terminé")
+"""
+
+
+class Command(BaseCommand):
+    help = "Compare le temps d'exécution séquentiel et parallèle sur des scripts synthétiques"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scripts', type=int, default=10, help='Nombre de scripts (défaut: 10)')
+        parser.add_argument('--duree', type=float, default=1.0, help='Durée de chaque script en secondes (défaut: 1)')
+        parser.add_argument('--concurrence', type=int, default=4, help='Scripts simultanés en mode parallèle (défaut: 4)')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory(prefix="snapflow_bench_") as dossier:
+            chemins = []
+            for i in range(options['scripts']):
+                chemin = os.path.join(dossier, f"script_{i}.py")
+                with open(chemin, "w", encoding="utf-8") as f:
+                    f.write(SCRIPT_SYNTHETIQUE.format(duree=options['duree']))
+                chemins.append(chemin)
+
+            self.stdout.write(self.style.SUCCESS('\n=== BENCHMARK PARALLÉLISME ==='))
+            self.stdout.write(f"{len(chemins)} scripts de {options['duree']}s")
+
+            temps = {}
+            for concurrence in (1, options['concurrence']):
+                debut = time.monotonic()
+                resultats = list(executer_scripts(chemins, concurrence))
+                temps[concurrence] = time.monotonic() - debut
+                echecs = sum(1 for _, r in resultats if r['returncode'] != 0)
+                self.stdout.write(
+                    f"  - concurrence={concurrence}: {temps[concurrence]:.2f}s ({echecs} échec(s))"
+                )
+
+            if temps[options['concurrence']] > 0:
+                gain = temps[1] / temps[options['concurrence']]
+                self.stdout.write(self.style.SUCCESS(f"\nAccélération: x{gain:.2f}"))
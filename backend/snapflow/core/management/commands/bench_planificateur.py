@@ -0,0 +1,145 @@
+# core/management/commands/bench_planificateur.py
+import io
+import time
+from contextlib import redirect_stdout
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.utils.timezone import now
+
+from core.jobs import PERIODICITE_DELTA, configurations_dues, traiter_configurations
+from core.management.commands.bench_runner import CompteurRequetes
+from core.models import ConfigurationTest, ExecutionResult, ExecutionTest, Projet, Script, Societe
+from core.planificateur import TAILLE_LOT
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le coût d'un tour du planificateur quand toutes les configurations "
+        "sont dues : sélection en une requête puis déclenchement par lots "
+        "(bulk_create), comparé au chemin historique (create() + save() par "
+        "configuration) sur un échantillon. Les données sont créées dans une "
+        "transaction annulée à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--configurations', type=int, default=10000,
+                            help="Configurations dues (défaut : 10000)")
+        parser.add_argument('--scripts', type=int, default=3, help="Scripts par configuration (défaut : 3)")
+        parser.add_argument('--echantillon', type=int, default=200,
+                            help="Configurations déclenchées une à une par le chemin historique (défaut : 200, 0 : aucune)")
+
+    def handle(self, *args, **options):
+        nombre = options['configurations']
+        self.stdout.write(self.style.SUCCESS(
+            f"\n=== TOUR DU PLANIFICATEUR : {nombre} configuration(s) due(s), "
+            f"{options['scripts']} script(s) chacune ({connection.vendor}) ==="
+        ))
+
+        # Mode 'queue' : aucune exécution lancée dans ce processus
+        with override_settings(SNAPFLOW_EXECUTION_BACKEND="queue"), transaction.atomic():
+            instant = now()
+            debut = time.perf_counter()
+            self.creer_configurations(nombre + options['echantillon'], options['scripts'], instant)
+            self.stdout.write(f"  Données créées en {time.perf_counter() - debut:.1f} s")
+
+            ids = list(
+                ConfigurationTest.objects.filter(projet=self.projet).order_by("id").values_list("id", flat=True)
+            )
+            echantillon = ids[nombre:]
+            mesure = self.mesurer_lots(ids[:nombre], instant)
+            self.stdout.write(
+                f"  Sélection des dues : {mesure['selection']:.3f} s (1 requête)\n"
+                f"  Déclenchement par lots de {TAILLE_LOT} : {mesure['duree']:.2f} s, "
+                f"{mesure['requetes']} requêtes, {mesure['executions']} exécution(s), "
+                f"{mesure['resultats']} résultat(s) — "
+                f"{mesure['duree'] / max(1, nombre) * 1000:.2f} ms/configuration"
+            )
+
+            if echantillon:
+                unitaire = self.mesurer_unitaire(echantillon, instant)
+                self.stdout.write(
+                    f"  Chemin historique ({len(echantillon)} configurations) : "
+                    f"{unitaire['duree'] / len(echantillon) * 1000:.2f} ms/configuration, "
+                    f"{unitaire['requetes'] / len(echantillon):.1f} requêtes/configuration "
+                    f"(≈ {unitaire['duree'] / len(echantillon) * nombre:.1f} s pour {nombre})"
+                )
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("\n✅ Mesure terminée (données annulées)"))
+
+    def creer_configurations(self, nombre, scripts_par_configuration, instant):
+        """Configurations actives dont l'échéance est passée d'une minute."""
+        self.societe = Societe.objects.create(nom="Société benchmark planificateur")
+        self.projet = Projet.objects.create(nom="Projet benchmark planificateur", url="https://exemple.com", contrat="-")
+        self.societe.projets.add(self.projet)
+
+        Script.objects.bulk_create([
+            Script(nom=f"bench planificateur {i}", projet=self.projet, priorite=1 + i % 5)
+            for i in range(scripts_par_configuration)
+        ])
+        # Relecture : MySQL ne renvoie pas les clés créées par bulk_create
+        scripts = list(Script.objects.filter(projet=self.projet).values_list("id", flat=True))
+
+        periodicites = list(PERIODICITE_DELTA.items())
+        configurations = [
+            ConfigurationTest(
+                societe=self.societe, projet=self.projet, nom=f"Benchmark planificateur {i}",
+                periodicite=periodicites[i % len(periodicites)][0],
+                last_execution=instant - periodicites[i % len(periodicites)][1] - timedelta(minutes=1),
+                is_active=True,
+            )
+            for i in range(nombre)
+        ]
+        for config in configurations:
+            config.calculer_echeances(instant)
+        # bulk_create : ni save() (contrôles et traces) ni signaux
+        ConfigurationTest.objects.bulk_create(configurations, batch_size=1000)
+        Lien = ConfigurationTest.scripts.through
+        Lien.objects.bulk_create(
+            [
+                Lien(configurationtest_id=config_id, script_id=script_id)
+                for config_id in ConfigurationTest.objects.filter(projet=self.projet).values_list("id", flat=True)
+                for script_id in scripts
+            ],
+            batch_size=5000,
+        )
+
+    def mesurer_lots(self, ids, instant):
+        """Tour du planificateur : sélection des dues puis déclenchement par lots."""
+        compteur = CompteurRequetes()
+        with connection.execute_wrapper(compteur):
+            debut = time.perf_counter()
+            dues = list(configurations_dues(instant).filter(projet=self.projet, pk__lte=ids[-1]))
+            selection = time.perf_counter() - debut
+            for i in range(0, len(dues), TAILLE_LOT):
+                traiter_configurations(dues[i:i + TAILLE_LOT], instant)
+            duree = time.perf_counter() - debut
+        return {
+            "selection": selection,
+            "duree": duree,
+            "requetes": compteur.nombre,
+            "executions": ExecutionTest.objects.filter(
+                configuration__projet=self.projet, configuration_id__lte=ids[-1]
+            ).count(),
+            "resultats": ExecutionResult.objects.filter(
+                execution__configuration__projet=self.projet, execution__configuration_id__lte=ids[-1]
+            ).count(),
+        }
+
+    def mesurer_unitaire(self, ids, instant):
+        """Chemin d'avant les lots : une exécution créée (save(), signaux) et une configuration enregistrée par configuration."""
+        compteur = CompteurRequetes()
+        configurations = list(ConfigurationTest.objects.filter(pk__in=ids))
+        # Les traces de ConfigurationTest.save() sont écartées de la sortie
+        with connection.execute_wrapper(compteur), redirect_stdout(io.StringIO()):
+            debut = time.perf_counter()
+            for config in configurations:
+                ExecutionTest.objects.create(configuration=config, statut="pending")
+                config.last_execution = instant
+                config.save()
+            duree = time.perf_counter() - debut
+        return {"duree": duree, "requetes": compteur.nombre}
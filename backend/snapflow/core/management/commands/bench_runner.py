@@ -0,0 +1,332 @@
+# core/management/commands/bench_runner.py
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils.timezone import now
+
+from core.models import ConfigurationTest, ExecutionResult, ExecutionTest, Projet, Script, Societe
+from core.moteur_async import MoteurAsync
+from core.runner import lancer_scripts_pour_execution
+
+# Profils de scripts synthétiques : code (formaté avec les options) et durée
+# utile attendue en secondes, déduite du surcoût mesuré
+PROFILS = {
+    "sommeil": ("import time\ntime.sleep({duree})\nprint('ok')\n", lambda o: o["duree"]),
+    "sortie": (
+        "import sys\n"
+        "ligne = 'x' * 100 + '\\n'\n"
+        "for i in range({lignes}):\n"
+        "    sys.stdout.write(ligne)\n",
+        lambda o: 0.0,
+    ),
+    "plantage": ("raise RuntimeError('plantage simulé')\n", lambda o: 0.0),
+    "timeout": ("import time\ntime.sleep(3600)\n", lambda o: o["timeout"]),
+}
+
+
+class CompteurRequetes:
+    """Wrapper d'exécution SQL (connection.execute_wrapper) qui compte les requêtes, tous threads confondus."""
+
+    def __init__(self):
+        self.nombre = 0
+        self._verrou = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._verrou:
+            self.nombre += 1
+        return execute(sql, params, many, context)
+
+
+def rss_max_ko():
+    """Pic de mémoire résidente du processus (VmHWM, Linux), à défaut ru_maxrss."""
+    try:
+        with open("/proc/self/status") as f:
+            for ligne in f:
+                if ligne.startswith("VmHWM:"):
+                    return int(ligne.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def reinitialiser_rss_max():
+    """Remet à zéro le pic de mémoire résidente (Linux ≥ 4.0), pour mesurer chaque moteur séparément."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def percentile(valeurs_triees, p):
+    if not valeurs_triees:
+        return None
+    return valeurs_triees[min(len(valeurs_triees) - 1, int(len(valeurs_triees) * p / 100))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark du runner : fait passer N exécutions de scripts synthétiques "
+        "(sommeil, sortie abondante, plantage, délai dépassé ou mélange) par le "
+        "vrai chemin d'exécution (moteurs 'threads' et/ou 'asyncio') et produit "
+        "un rapport JSON : exécutions/min, surcoût par script, requêtes par "
+        "exécution, pic de mémoire. Sans ticket Redmine ni e-mail ; les données "
+        "de test sont supprimées à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--executions', type=int, default=20, help="Exécutions par moteur (défaut : 20)")
+        parser.add_argument('--scripts', type=int, default=4, help="Scripts par exécution (défaut : 4)")
+        parser.add_argument('--profil', choices=list(PROFILS) + ['mixte'], default='mixte',
+                            help="Profil des scripts (défaut : mixte, les profils en alternance)")
+        parser.add_argument('--moteur', choices=['threads', 'asyncio', 'tous'], default='tous',
+                            help="Moteur(s) mesuré(s) (défaut : tous)")
+        parser.add_argument('--concurrence', type=int, default=4,
+                            help="Exécutions menées simultanément (défaut : 4)")
+        parser.add_argument('--scripts-paralleles', type=int, default=1,
+                            help="Scripts simultanés par exécution (défaut : 1)")
+        parser.add_argument('--duree', type=float, default=0.5, help="Durée du profil sommeil en secondes (défaut : 0.5)")
+        parser.add_argument('--lignes', type=int, default=20000, help="Lignes du profil sortie (défaut : 20000)")
+        parser.add_argument('--timeout', type=int, default=2, help="Délai des scripts en secondes (défaut : 2)")
+        parser.add_argument('--sortie', help="Fichier JSON du rapport (défaut : sortie standard)")
+
+    def handle(self, *args, **options):
+        moteurs = ['threads', 'asyncio'] if options['moteur'] == 'tous' else [options['moteur']]
+        self.dossier = tempfile.mkdtemp(prefix="snapflow_bench_")
+        self.executions = []
+        rapport = {
+            "date": now().isoformat(),
+            "python": platform.python_version(),
+            "base": connection.vendor,
+            "parametres": {
+                cle: options[cle]
+                for cle in ('executions', 'scripts', 'profil', 'concurrence', 'scripts_paralleles',
+                            'duree', 'lignes', 'timeout')
+            },
+            "moteurs": {},
+        }
+        try:
+            self.creer_configuration(options)
+            # Délai fixe (sans historique) ; ni navigateurs ni hôtes pré-chauffés
+            reglages = {
+                'SNAPFLOW_TIMEOUTS': {
+                    'facteur': 1, 'plancher': options['timeout'], 'plafond': options['timeout'],
+                    'echantillons_min': 10 ** 9, 'historique': 1,
+                },
+                'SNAPFLOW_WEBDRIVER_POOL': None,
+                'SNAPFLOW_SCRIPT_HOSTS': 0,
+            }
+            with override_settings(**reglages):
+                for moteur in moteurs:
+                    # L'échec d'un moteur n'empêche ni la mesure des autres ni le rapport
+                    try:
+                        rapport["moteurs"][moteur] = self.mesurer(moteur, options)
+                    except Exception as e:
+                        rapport["moteurs"][moteur] = {
+                            "erreur": f"{type(e).__name__}: {e}",
+                            "trace": traceback.format_exc(),
+                        }
+                        self.stdout.write(self.style.ERROR(f"❌ Moteur {moteur} en erreur : {e}"))
+        finally:
+            self.nettoyer()
+
+        contenu = json.dumps(rapport, indent=2, ensure_ascii=False)
+        if options['sortie']:
+            with open(options['sortie'], "w", encoding="utf-8") as f:
+                f.write(contenu + "\n")
+            for moteur, mesure in rapport["moteurs"].items():
+                if "erreur" in mesure:
+                    self.stdout.write(self.style.ERROR(f"{moteur} : {mesure['erreur']}"))
+                    continue
+                self.stdout.write(
+                    f"{moteur} : {mesure['executions_par_minute']} exécutions/min, "
+                    f"surcoût p50 {mesure['surcout_processus_ms']['p50']} ms/script, "
+                    f"{mesure['requetes_par_execution']} requêtes/exécution"
+                )
+            self.stdout.write(self.style.SUCCESS(f"Rapport écrit dans {options['sortie']}"))
+        else:
+            self.stdout.write(contenu)
+
+    # -- Données -----------------------------------------------------------
+
+    def creer_configuration(self, options):
+        self.societe = Societe.objects.create(nom="Société benchmark runner")
+        self.projet = Projet.objects.create(nom="Projet benchmark runner", url="https://exemple.com", contrat="-")
+        self.societe.projets.add(self.projet)
+        self.configuration = ConfigurationTest.objects.create(
+            societe=self.societe, nom="Benchmark runner", projet=self.projet, periodicite="1j",
+            is_active=False, scripts_paralleles=max(1, options['scripts_paralleles']),
+        )
+
+        profils = list(PROFILS) if options['profil'] == 'mixte' else [options['profil']]
+        self.profils = {}
+        scripts = []
+        for i in range(options['scripts']):
+            profil = profils[i % len(profils)]
+            code, _ = PROFILS[profil]
+            chemin = os.path.join(self.dossier, f"script_{i}_{profil}.py")
+            with open(chemin, "w", encoding="utf-8") as f:
+                f.write(code.format(**options))
+            # bulk_create : pas de save(), le chemin absolu (hors MEDIA_ROOT) est gardé tel quel
+            scripts.append(Script(nom=f"bench {i} {profil}", fichier=chemin, projet=self.projet))
+        Script.objects.bulk_create(scripts)
+        # Relecture : MySQL ne renvoie pas les clés créées par bulk_create
+        for script_id, nom in Script.objects.filter(projet=self.projet).values_list("id", "nom"):
+            self.profils[script_id] = nom.rsplit(" ", 1)[1]
+        self.configuration.scripts.set(list(self.profils))
+
+    def creer_executions(self, nombre):
+        """Exécutions au statut 'running' : aucun worker ne peut les réserver pendant la mesure."""
+        avant = set(ExecutionTest.objects.filter(configuration=self.configuration).values_list("id", flat=True))
+        ExecutionTest.objects.bulk_create([
+            ExecutionTest(configuration=self.configuration, statut="running") for _ in range(nombre)
+        ])
+        ids = sorted(
+            set(ExecutionTest.objects.filter(configuration=self.configuration).values_list("id", flat=True)) - avant
+        )
+        self.executions.extend(ids)
+        return ids
+
+    # -- Mesure ------------------------------------------------------------
+
+    def mesurer(self, moteur, options):
+        ids = self.creer_executions(options['executions'])
+        compteur = CompteurRequetes()
+        reinitialiser_rss_max()
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+
+        debut = time.perf_counter()
+        if moteur == "threads":
+            self.executer_threads(ids, options['concurrence'], compteur)
+        else:
+            asyncio.run(self.executer_async(ids, options['concurrence'], compteur))
+        duree = time.perf_counter() - debut
+
+        fin = resource.getrusage(resource.RUSAGE_SELF)
+        return {
+            "duree_totale": round(duree, 3),
+            "executions_par_minute": round(len(ids) / duree * 60, 1),
+            "requetes_par_execution": round(compteur.nombre / len(ids), 1),
+            "cpu_superviseur": round((fin.ru_utime - usage.ru_utime) + (fin.ru_stime - usage.ru_stime), 3),
+            "rss_max_ko": rss_max_ko(),
+            **self.surcouts(ids, options),
+        }
+
+    def executer_threads(self, ids, concurrence, compteur):
+        def executer(execution_id):
+            try:
+                with connection.execute_wrapper(compteur):
+                    lancer_scripts_pour_execution(execution_id, notifier=False)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrence)) as pool:
+            list(pool.map(executer, ids))
+
+    async def executer_async(self, ids, concurrence, compteur):
+        moteur = MoteurAsync("bench_runner")
+        places = asyncio.Semaphore(max(1, concurrence))
+
+        async def executer(execution_id):
+            async with places:
+                await moteur.executer(execution_id, notifier=False)
+
+        # Le thread d'écriture du moteur porte la seule connexion utilisée ;
+        # `connection` (propre à chaque thread) est résolue dans ce thread
+        def compter():
+            connection.execute_wrappers.append(compteur)
+
+        def ne_plus_compter():
+            connection.execute_wrappers.remove(compteur)
+
+        try:
+            await moteur.base(compter)
+            try:
+                await asyncio.gather(*(executer(execution_id) for execution_id in ids))
+            finally:
+                await moteur.base(ne_plus_compter)
+        finally:
+            await moteur.fermer()
+
+    def surcouts(self, ids, options):
+        """
+        Surcoût de lancement et de supervision par script (durée mesurée moins
+        durée utile du profil) et surcoût du runner par script (durée de
+        l'exécution moins la somme des durées de ses scripts ; significatif
+        avec des scripts séquentiels). Le pic de mémoire des scripts est
+        celui enregistré par le runner pour chaque script de ces exécutions.
+        """
+        processus = []
+        duree_scripts = {}
+        statuts = {}
+        rss_scripts = []
+        for execution_id, script_id, statut, debut, fin, rss in ExecutionResult.objects.filter(
+            execution_id__in=ids
+        ).values_list("execution_id", "script_id", "statut", "started_at", "ended_at", "rss_max_ko"):
+            statuts[statut] = statuts.get(statut, 0) + 1
+            if rss is not None:
+                rss_scripts.append(rss)
+            if debut is None or fin is None:
+                continue
+            duree = (fin - debut).total_seconds()
+            duree_scripts[execution_id] = duree_scripts.get(execution_id, 0.0) + duree
+            _, utile = PROFILS[self.profils[script_id]]
+            processus.append(max(0.0, duree - utile(options)) * 1000)
+
+        runner = []
+        nb_scripts = max(1, len(self.profils))
+        for execution_id, debut, fin in ExecutionTest.objects.filter(pk__in=ids).values_list(
+            "id", "started_at", "ended_at"
+        ):
+            if debut and fin:
+                runner.append(
+                    max(0.0, (fin - debut).total_seconds() - duree_scripts.get(execution_id, 0.0))
+                    / nb_scripts * 1000
+                )
+
+        processus.sort()
+        runner.sort()
+        return {
+            "statuts_scripts": statuts,
+            "rss_max_script_ko": {
+                "max": max(rss_scripts) if rss_scripts else None,
+                "moyenne": round(sum(rss_scripts) / len(rss_scripts)) if rss_scripts else None,
+            },
+            "surcout_processus_ms": {
+                "moyenne": round(sum(processus) / len(processus), 1) if processus else None,
+                "p50": round(percentile(processus, 50), 1) if processus else None,
+                "p95": round(percentile(processus, 95), 1) if processus else None,
+            },
+            "surcout_runner_ms_par_script": {
+                "moyenne": round(sum(runner) / len(runner), 1) if runner else None,
+                "p95": round(percentile(runner, 95), 1) if runner else None,
+            },
+        }
+
+    def nettoyer(self):
+        logs = os.path.join(settings.MEDIA_ROOT, "logs")
+        for execution_id in self.executions:
+            shutil.rmtree(os.path.join(logs, f"execution_{execution_id}"), ignore_errors=True)
+            try:
+                os.remove(os.path.join(logs, f"execution_{execution_id}.txt"))
+            except OSError:
+                pass
+        if hasattr(self, 'configuration'):
+            self.configuration.delete()
+            Script.objects.filter(projet=self.projet).delete()
+            self.projet.delete()
+            self.societe.delete()
+        shutil.rmtree(self.dossier, ignore_errors=True)
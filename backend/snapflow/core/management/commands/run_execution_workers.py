@@ -0,0 +1,275 @@
+# core/management/commands/run_execution_workers.py
+import asyncio
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connection
+
+from core.execution_queue import (
+    get_duree_bail,
+    identifiant_worker,
+    liberer_execution,
+    prolonger_baux,
+    reclamer_baux_expires,
+    reserver_execution,
+)
+from core.moteur_async import MoteurAsync, get_moteur_runner
+from core.runner import lancer_scripts_pour_execution
+
+
+def executer_execution(execution_id, worker_id, **options_runner):
+    """Lance une exécution réservée puis libère son bail et la connexion du thread."""
+    try:
+        lancer_scripts_pour_execution(execution_id, **options_runner)
+    finally:
+        try:
+            liberer_execution(execution_id, worker_id)
+        finally:
+            connection.close()
+
+
+class Command(BaseCommand):
+    help = "Démarre un worker qui exécute les tests en file d'attente (statut 'pending')"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=2,
+            help='Nombre d\'exécutions traitées simultanément (défaut: 2)',
+        )
+        parser.add_argument(
+            '--places-immediates',
+            type=int,
+            default=None,
+            help=(
+                "Places réservées en plus aux exécutions demandées à la main "
+                "(« exécuter maintenant ») (défaut: SNAPFLOW_PLACES_IMMEDIATES)"
+            ),
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Délai en secondes entre deux consultations de la file vide (défaut: 2)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='S\'arrête dès que la file est vide et les exécutions terminées',
+        )
+
+    def handle(self, *args, **options):
+        concurrence = max(1, options['concurrency'])
+        intervalle = options['poll_interval']
+        self.concurrence = concurrence
+        self.places_immediates = max(0, (
+            options['places_immediates'] if options['places_immediates'] is not None
+            else getattr(settings, "SNAPFLOW_PLACES_IMMEDIATES", 1)
+        ))
+        self.worker_id = worker_id = self.identifiant(options)
+        self.arret_demande = False
+
+        signal.signal(signal.SIGTERM, self.demander_arret)
+        signal.signal(signal.SIGINT, self.demander_arret)
+
+        self.demarrer(options)
+        moteur = get_moteur_runner()
+        self.stdout.write(self.style.SUCCESS(
+            f"🚀 Worker {worker_id} démarré (concurrence: {concurrence}, "
+            f"places réservées: {self.places_immediates}, moteur: {moteur})"
+        ))
+        try:
+            if moteur == "asyncio":
+                asyncio.run(self.boucle_async(concurrence, intervalle, options['once']))
+            else:
+                self.boucle(concurrence, intervalle, options['once'])
+        finally:
+            self.arreter()
+        self.stdout.write(self.style.SUCCESS(f"🛑 Worker {worker_id} arrêté"))
+
+    def place_libre(self, en_cours, reservees, concurrence):
+        """
+        Place pour une nouvelle exécution : None si le worker est plein,
+        False pour une place ordinaire (toute la file), True pour une place
+        réservée à la voie prioritaire.
+        """
+        if len(en_cours) - len(reservees) < concurrence:
+            return False
+        if len(reservees) < self.places_immediates:
+            return True
+        return None
+
+    def boucle(self, concurrence, intervalle, une_fois):
+        worker_id = self.worker_id
+        en_cours = {}
+        reservees = set()  # exécutions sur une place réservée
+        intervalle_entretien = self.intervalle_entretien()
+        dernier_entretien = time.monotonic()
+        self.entretien([])
+
+        with ThreadPoolExecutor(
+            max_workers=concurrence + self.places_immediates, thread_name_prefix="execution"
+        ) as pool:
+            while True:
+                # Réserver autant d'exécutions que de places libres
+                file_vide = False
+                while not self.arret_demande:
+                    place_reservee = self.place_libre(en_cours, reservees, concurrence)
+                    if place_reservee is None:
+                        break
+                    close_old_connections()
+                    try:
+                        execution_id = reserver_execution(worker_id, place_reservee)
+                    except DatabaseError as e:
+                        self.erreur_base("réservation", e)
+                        execution_id = None
+                    if execution_id is None:
+                        file_vide = True
+                        break
+                    self.stdout.write(f"▶️ Exécution {execution_id} réservée")
+                    future = pool.submit(
+                        executer_execution, execution_id, worker_id, **self.options_runner()
+                    )
+                    en_cours[future] = execution_id
+                    if place_reservee:
+                        reservees.add(future)
+
+                if not en_cours and (self.arret_demande or (file_vide and une_fois)):
+                    break
+
+                if time.monotonic() - dernier_entretien >= intervalle_entretien:
+                    try:
+                        self.entretien([e for f, e in en_cours.items() if not f.done()])
+                    except DatabaseError as e:
+                        self.erreur_base("entretien", e)
+                    dernier_entretien = time.monotonic()
+
+                if not en_cours:
+                    time.sleep(intervalle)
+                    continue
+
+                termines, _ = wait(en_cours, timeout=intervalle, return_when=FIRST_COMPLETED)
+                for future in termines:
+                    execution_id = en_cours.pop(future)
+                    reservees.discard(future)
+                    try:
+                        future.result()
+                        self.stdout.write(f"✅ Exécution {execution_id} terminée")
+                    except Exception as e:
+                        self.stdout.write(self.style.ERROR(f"❌ Exécution {execution_id} en erreur: {e}"))
+
+    async def boucle_async(self, concurrence, intervalle, une_fois):
+        """
+        Même boucle que boucle(), pour le moteur 'asyncio' : les exécutions
+        sont des tâches de la boucle d'événements, la base n'est utilisée
+        que par le thread d'écriture du moteur.
+        """
+        moteur = MoteurAsync(self.worker_id)
+        en_cours = {}
+        reservees = set()
+        intervalle_entretien = self.intervalle_entretien()
+        dernier_entretien = time.monotonic()
+        try:
+            await moteur.base(self.entretien, [])
+            while True:
+                file_vide = False
+                while not self.arret_demande:
+                    place_reservee = self.place_libre(en_cours, reservees, concurrence)
+                    if place_reservee is None:
+                        break
+                    try:
+                        execution_id = await moteur.reserver(place_reservee)
+                    except DatabaseError as e:
+                        self.erreur_base("réservation", e)
+                        execution_id = None
+                    if execution_id is None:
+                        file_vide = True
+                        break
+                    self.stdout.write(f"▶️ Exécution {execution_id} réservée")
+                    tache = asyncio.create_task(moteur.executer(execution_id, **self.options_runner()))
+                    en_cours[tache] = execution_id
+                    if place_reservee:
+                        reservees.add(tache)
+
+                if not en_cours and (self.arret_demande or (file_vide and une_fois)):
+                    break
+
+                if time.monotonic() - dernier_entretien >= intervalle_entretien:
+                    try:
+                        await moteur.base(self.entretien, list(en_cours.values()))
+                    except DatabaseError as e:
+                        self.erreur_base("entretien", e)
+                    dernier_entretien = time.monotonic()
+
+                if not en_cours:
+                    await asyncio.sleep(intervalle)
+                    continue
+
+                termines, _ = await asyncio.wait(
+                    en_cours, timeout=intervalle, return_when=asyncio.FIRST_COMPLETED
+                )
+                for tache in termines:
+                    execution_id = en_cours.pop(tache)
+                    reservees.discard(tache)
+                    try:
+                        tache.result()
+                        self.stdout.write(f"✅ Exécution {execution_id} terminée")
+                    except Exception as e:
+                        self.stdout.write(self.style.ERROR(f"❌ Exécution {execution_id} en erreur: {e}"))
+        finally:
+            await moteur.fermer()
+
+    # Points d'extension (voir snapflow_agent)
+
+    def identifiant(self, options):
+        return identifiant_worker()
+
+    def demarrer(self, options):
+        pass
+
+    def arreter(self):
+        pass
+
+    def options_runner(self):
+        """Arguments supplémentaires de lancer_scripts_pour_execution."""
+        return {}
+
+    def intervalle_entretien(self):
+        return get_duree_bail().total_seconds() / 3
+
+    def entretien(self, execution_ids):
+        """
+        Prolonge les baux des exécutions en cours et remet en file celles
+        dont le bail a expiré (worker ou agent arrêté).
+        """
+        prolonges = prolonger_baux(execution_ids, self.worker_id)
+        if prolonges < len(execution_ids):
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ {len(execution_ids) - prolonges} bail(s) non prolongé(s) : "
+                f"exécution(s) terminée(s) ou reprise(s) par un autre worker"
+            ))
+        remises, terminees = reclamer_baux_expires()
+        if remises or terminees:
+            self.stdout.write(self.style.WARNING(
+                f"♻️ Exécutions au bail expiré : {remises} remise(s) en file, "
+                f"{terminees} terminée(s) en erreur"
+            ))
+
+    def erreur_base(self, operation, erreur):
+        """
+        Erreur passagère de la base (verrou, interblocage, connexion perdue) :
+        le worker continue ; la réservation ou l'entretien est retenté au tour
+        suivant, et un bail non prolongé d'ici là est repris par le balayage.
+        """
+        self.stdout.write(self.style.WARNING(f"⚠️ Base indisponible ({operation}) : {erreur}"))
+
+    def demander_arret(self, signum, frame):
+        if not self.arret_demande:
+            self.stdout.write(self.style.WARNING(
+                "⏳ Arrêt demandé : fin des exécutions en cours, plus de nouvelle réservation"
+            ))
+        self.arret_demande = True
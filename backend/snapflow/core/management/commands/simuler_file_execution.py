@@ -0,0 +1,173 @@
+# core/management/commands/simuler_file_execution.py
+import heapq
+import random
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.timezone import now
+
+from core.execution_queue import reserver_execution
+from core.jobs import PERIODICITE_DELTA
+from core.models import ConfigurationTest, ExecutionTest, Projet, Script, Societe
+
+# Répartition des priorités dans la rafale : surtout des scripts Basse/Normale
+POIDS_PRIORITES = {1: 35, 2: 35, 3: 15, 4: 10, 5: 5}
+
+
+class Command(BaseCommand):
+    help = (
+        "Simule une rafale de milliers d'exécutions mises en file au même instant, "
+        "dépilées par N workers avec reserver_execution(), et compare l'attente par "
+        "priorité à un ordre d'arrivée (FIFO). Échoue (CommandError) si l'ordre "
+        "(priorité, échéance) n'est pas respecté. Les données sont annulées à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--executions', type=int, default=3000, help="Exécutions en file (défaut : 3000)")
+        parser.add_argument('--workers', type=int, default=8, help="Workers simulés (défaut : 8)")
+        parser.add_argument(
+            '--duree-moyenne', type=float, default=60.0,
+            help="Durée moyenne simulée d'une exécution, en secondes (défaut : 60)",
+        )
+        parser.add_argument('--graine', type=int, default=42, help="Graine aléatoire")
+
+    def handle(self, *args, **options):
+        nb_executions = options['executions']
+        nb_workers = max(1, options['workers'])
+        aleatoire = random.Random(options['graine'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n=== SIMULATION DE LA FILE : {nb_executions} exécutions, {nb_workers} workers ==='
+        ))
+
+        # Durée simulée de la k-ième exécution lancée, identique pour les deux ordres
+        durees = [aleatoire.expovariate(1 / options['duree_moyenne']) for _ in range(nb_executions)]
+
+        with transaction.atomic():
+            infos = self.remplir_file(nb_executions, aleatoire)
+
+            latences = []
+
+            def reserver():
+                debut = time.perf_counter()
+                execution_id = reserver_execution("simulation")
+                latences.append(time.perf_counter() - debut)
+                return execution_id
+
+            ordre_file = self.simuler(reserver, nb_workers, durees)
+            transaction.set_rollback(True)
+
+        # Ordre d'arrivée : même rafale, dépilée par id
+        ids_fifo = iter(sorted(infos))
+        ordre_fifo = self.simuler(lambda: next(ids_fifo, None), nb_workers, durees)
+
+        self.afficher(infos, ordre_file, ordre_fifo, latences)
+        self.verifier(infos, ordre_file, ordre_fifo)
+
+    def remplir_file(self, nb_executions, aleatoire):
+        """Crée la rafale d'exécutions ; retourne {id: (priorite, echeance)}."""
+        societe = Societe.objects.create(nom="Société simulation file")
+        projet = Projet.objects.create(nom="Projet simulation file", url="https://exemple.com", contrat="-")
+        societe.projets.add(projet)
+        configuration = ConfigurationTest.objects.create(
+            societe=societe, nom="Simulation file", projet=projet, periodicite="1j", is_active=False
+        )
+
+        instant = now()
+        priorites = list(POIDS_PRIORITES)
+        poids = list(POIDS_PRIORITES.values())
+        periodicites = list(PERIODICITE_DELTA.values())
+        ExecutionTest.objects.bulk_create(
+            [
+                ExecutionTest(
+                    configuration=configuration,
+                    statut="pending",
+                    priorite=aleatoire.choices(priorites, weights=poids)[0],
+                    echeance=instant + aleatoire.choice(periodicites),
+                    date_mise_en_file=instant,
+                )
+                for _ in range(nb_executions)
+            ],
+            batch_size=1000,
+        )
+        # Relecture : MySQL ne renvoie pas les clés créées par bulk_create
+        return {
+            execution_id: (priorite, echeance)
+            for execution_id, priorite, echeance in ExecutionTest.objects.filter(
+                configuration=configuration
+            ).values_list("id", "priorite", "echeance")
+        }
+
+    def simuler(self, reserver, nb_workers, durees):
+        """
+        Simulation à événements discrets : chaque worker libre réserve la
+        prochaine exécution. Retourne [(execution_id, attente simulée)].
+        """
+        libres = [0.0] * nb_workers  # instants où chaque worker se libère
+        ordre = []
+        while True:
+            instant = heapq.heappop(libres)
+            execution_id = reserver()
+            if execution_id is None:
+                return ordre
+            ordre.append((execution_id, instant))
+            heapq.heappush(libres, instant + durees[len(ordre) - 1])
+
+    def attentes_par_priorite(self, infos, ordre):
+        attentes = defaultdict(list)
+        for execution_id, attente in ordre:
+            attentes[infos[execution_id][0]].append(attente)
+        return attentes
+
+    def afficher(self, infos, ordre_file, ordre_fifo, latences):
+        file = self.attentes_par_priorite(infos, ordre_file)
+        fifo = self.attentes_par_priorite(infos, ordre_fifo)
+        libelles = dict(Script.PRIORITY_CHOICES)
+
+        self.stdout.write(f"\n  {'Priorité':<10} {'Nb':>6} {'File : moy / p95 (min)':>26} {'FIFO : moy / p95 (min)':>26}")
+        for priorite in sorted(file, reverse=True):
+            self.stdout.write(
+                f"  {libelles[priorite]:<10} {len(file[priorite]):>6} "
+                f"{self.resume(file[priorite]):>26} {self.resume(fifo[priorite]):>26}"
+            )
+
+        latences = sorted(latences)
+        self.stdout.write(
+            f"\n  Réservation : moyenne {sum(latences) / len(latences) * 1000:.2f} ms, "
+            f"p95 {latences[int(len(latences) * 0.95)] * 1000:.2f} ms "
+            f"({len(latences)} appels à reserver_execution)"
+        )
+
+    def resume(self, attentes):
+        if not attentes:
+            return "-"
+        triees = sorted(attentes)
+        moyenne = sum(triees) / len(triees) / 60
+        p95 = triees[int(len(triees) * 0.95)] / 60
+        return f"{moyenne:.1f} / {p95:.1f}"
+
+    def verifier(self, infos, ordre_file, ordre_fifo):
+        echecs = []
+
+        attendu = sorted(infos, key=lambda i: (-infos[i][0], infos[i][1], i))
+        if [execution_id for execution_id, _ in ordre_file] != attendu:
+            echecs.append("l'ordre de réservation ne suit pas (priorité, échéance)")
+
+        file = self.attentes_par_priorite(infos, ordre_file)
+        fifo = self.attentes_par_priorite(infos, ordre_fifo)
+        haute, basse = max(file), min(file)
+        moyenne = lambda valeurs: sum(valeurs) / len(valeurs)
+        if moyenne(file[haute]) > moyenne(file[basse]):
+            echecs.append("la priorité la plus haute attend plus que la plus basse")
+        if moyenne(file[haute]) > moyenne(fifo[haute]):
+            echecs.append("la priorité la plus haute attend plus qu'en FIFO")
+
+        if echecs:
+            for echec in echecs:
+                self.stdout.write(self.style.ERROR(f"  ❌ {echec}"))
+            raise CommandError(f"{len(echecs)} vérification(s) en échec")
+        self.stdout.write(self.style.SUCCESS(
+            "\n✅ Ordre (priorité, échéance) respecté ; les exécutions prioritaires passent en tête"
+        ))
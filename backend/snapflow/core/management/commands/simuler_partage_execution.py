@@ -0,0 +1,167 @@
+# core/management/commands/simuler_partage_execution.py
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils.timezone import now
+
+from core.execution_queue import reserver_execution
+from core.models import ConfigurationTest, ExecutionTest, Projet, Societe
+
+# (nom, poids, plafond, exécutions en file) : une société à grosse batterie,
+# une petite, une de poids double et une plafonnée à une exécution à la fois
+SOCIETES = [
+    ("Grosse batterie", 1, None, 400),
+    ("Petite", 1, None, 100),
+    ("Poids double", 2, None, 200),
+    ("Plafonnée", 4, 1, 50),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Simule plusieurs sociétés dont les exécutions sont en file au même instant "
+        "(la plus grosse mise en file la première), dépilées par N workers avec "
+        "reserver_execution() : compare le partage équitable à l'ordre de la file "
+        "seule (partage désactivé). Échoue (CommandError) si les poids ou les plafonds "
+        "ne sont pas respectés. Les données sont annulées à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help="Workers simulés (défaut : 8)")
+        parser.add_argument('--duree', type=float, default=60.0,
+                            help="Durée simulée d'une exécution, en secondes (défaut : 60)")
+
+    def handle(self, *args, **options):
+        nb_workers = max(1, options['workers'])
+        duree = options['duree']
+        self.stdout.write(self.style.SUCCESS(
+            f'\n=== SIMULATION DU PARTAGE ENTRE SOCIÉTÉS : {nb_workers} workers ==='
+        ))
+
+        mesures = {}
+        for actif in (True, False):
+            reglages = {'actif': actif, 'par_projet': False, 'fenetre': 30 * 86400, 'rafraichissement': 0}
+            with override_settings(SNAPFLOW_PARTAGE_EXECUTION=reglages), transaction.atomic():
+                societes = self.remplir_file()
+                mesures[actif] = (societes, self.simuler(nb_workers, duree))
+                transaction.set_rollback(True)
+
+        equitable = self.statistiques(*mesures[True], duree)
+        file = self.statistiques(*mesures[False], duree)
+        self.afficher(equitable, file)
+        self.verifier(equitable, file)
+
+    def remplir_file(self):
+        """Crée les sociétés et leurs exécutions en attente ; retourne {execution_id: nom de société}."""
+        instant = now()
+        societes = {}
+        for nom, poids, plafond, nombre in SOCIETES:
+            societe = Societe.objects.create(nom=f"Simulation {nom}", poids_execution=poids, executions_max=plafond)
+            projet = Projet.objects.create(nom=f"Projet {nom}", url="https://exemple.com", contrat="-")
+            societe.projets.add(projet)
+            configuration = ConfigurationTest.objects.create(
+                societe=societe, nom=f"Simulation {nom}", projet=projet, periodicite="1j", is_active=False
+            )
+            ExecutionTest.objects.bulk_create([
+                ExecutionTest(
+                    configuration=configuration, statut="pending", priorite=2,
+                    echeance=instant + timedelta(days=1), date_mise_en_file=instant,
+                )
+                for _ in range(nombre)
+            ], batch_size=1000)
+            # Relecture : MySQL ne renvoie pas les clés créées par bulk_create
+            for execution_id in ExecutionTest.objects.filter(configuration=configuration).values_list("id", flat=True):
+                societes[execution_id] = nom
+        return societes
+
+    def simuler(self, nb_workers, duree):
+        """
+        Simulation à événements discrets : chaque worker libre réserve la
+        prochaine exécution ; les exécutions terminées sont enregistrées avec
+        des dates simulées (dans le passé) pour alimenter le temps consommé.
+        Retourne [(execution_id, début simulé)].
+        """
+        total = sum(nombre for *_, nombre in SOCIETES)
+        origine = now() - timedelta(seconds=total * duree)  # fin de simulation dans le passé
+        libres = [0.0] * nb_workers
+        en_cours = []  # (fin, execution_id, debut)
+        ordre = []
+        while libres:
+            instant = heapq.heappop(libres)
+            while en_cours and en_cours[0][0] <= instant:
+                fin, execution_id, debut = heapq.heappop(en_cours)
+                ExecutionTest.objects.filter(pk=execution_id).update(
+                    statut="done",
+                    started_at=origine + timedelta(seconds=debut),
+                    ended_at=origine + timedelta(seconds=fin),
+                )
+            execution_id = reserver_execution("simulation")
+            if execution_id is None:
+                if en_cours:
+                    # Sociétés restantes à leur plafond : attendre la prochaine fin
+                    heapq.heappush(libres, en_cours[0][0])
+                continue
+            ordre.append((execution_id, instant))
+            heapq.heappush(en_cours, (instant + duree, execution_id, instant))
+            heapq.heappush(libres, instant + duree)
+        return ordre
+
+    def statistiques(self, societes, ordre, duree):
+        """Attente moyenne (min), concurrence max et part de capacité tant que toutes attendent."""
+        debuts = defaultdict(list)
+        for execution_id, debut in ordre:
+            debuts[societes[execution_id]].append(debut)
+        fin_file_commune = min(max(valeurs) for valeurs in debuts.values())
+        parts = {nom: sum(1 for d in valeurs if d < fin_file_commune) for nom, valeurs in debuts.items()}
+        total_parts = sum(parts.values()) or 1
+
+        resultat = {}
+        for nom, valeurs in debuts.items():
+            evenements = sorted([(d, 1) for d in valeurs] + [(d + duree, -1) for d in valeurs])
+            courant = maximum = 0
+            for _, delta in evenements:
+                courant += delta
+                maximum = max(maximum, courant)
+            resultat[nom] = {
+                "attente": sum(valeurs) / len(valeurs) / 60,
+                "concurrence_max": maximum,
+                "part": 100 * parts[nom] / total_parts,
+            }
+        return resultat
+
+    def afficher(self, equitable, file):
+        self.stdout.write(
+            f"\n  {'Société':<16} {'Poids':>5} {'Plafond':>7} "
+            f"{'Attente moy. (min) équitable / file':>37} {'Part (%)':>9} {'Concurrence max':>16}"
+        )
+        for nom, poids, plafond, _ in SOCIETES:
+            self.stdout.write(
+                f"  {nom:<16} {poids:>5} {plafond or '-':>7} "
+                f"{equitable[nom]['attente']:>18.1f} / {file[nom]['attente']:<16.1f} "
+                f"{equitable[nom]['part']:>9.1f} {equitable[nom]['concurrence_max']:>16}"
+            )
+        self.stdout.write("  Part : réservations tant que toutes les sociétés ont des exécutions en attente")
+
+    def verifier(self, equitable, file):
+        echecs = []
+
+        for nom, _, plafond, _ in SOCIETES:
+            if plafond is not None and equitable[nom]["concurrence_max"] > plafond:
+                echecs.append(f"{nom} : plafond {plafond} dépassé ({equitable[nom]['concurrence_max']})")
+        rapport = equitable["Poids double"]["part"] / max(equitable["Petite"]["part"], 0.1)
+        if not 1.5 <= rapport <= 2.5:
+            echecs.append(f"part poids double / poids simple = {rapport:.2f} (≈ 2 attendu)")
+        if equitable["Petite"]["attente"] >= file["Petite"]["attente"] / 2:
+            echecs.append("la petite société attend presque autant qu'avec la file seule")
+
+        if echecs:
+            for echec in echecs:
+                self.stdout.write(self.style.ERROR(f"  ❌ {echec}"))
+            raise CommandError(f"{len(echecs)} vérification(s) en échec")
+        self.stdout.write(self.style.SUCCESS(
+            "\n✅ Capacité partagée selon les poids, plafonds respectés, plus de famine des petites sociétés"
+        ))
@@ -0,0 +1,90 @@
+# core/management/commands/snapflow_agent.py
+import os
+import socket
+
+from django.conf import settings
+from django.utils.timezone import now
+
+from core.cache_scripts import CacheScripts
+from core.execution_queue import identifiant_worker
+from core.management.commands.run_execution_workers import Command as CommandeWorker
+from core.models import AgentExecution
+
+
+class Command(CommandeWorker):
+    help = (
+        "Agent d'exécution, éventuellement sur une autre machine que le serveur : "
+        "réserve les exécutions dans la base partagée, envoie des battements de cœur "
+        "et tient un bail sur ses exécutions (remises en file si l'agent disparaît)"
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--nom',
+            help="Nom unique de l'agent (défaut: hôte:pid:agent)",
+        )
+        parser.add_argument(
+            '--serveur',
+            help="URL du serveur SnapFlow : les scripts sont téléchargés par empreinte "
+                 "(jeton SNAPFLOW_AGENT_TOKEN). Sans cette option, ils sont lus dans MEDIA_ROOT",
+        )
+        parser.add_argument(
+            '--cache',
+            default=os.path.join(settings.BASE_DIR, 'cache_scripts'),
+            help="Dossier du cache de scripts téléchargés",
+        )
+        parser.add_argument(
+            '--bail',
+            type=int,
+            help="Durée du bail en secondes (défaut: SNAPFLOW_EXECUTION_LEASE)",
+        )
+
+    def identifiant(self, options):
+        return options['nom'] or identifiant_worker("agent")
+
+    def demarrer(self, options):
+        if options['bail']:
+            settings.SNAPFLOW_EXECUTION_LEASE = options['bail']
+
+        self.cache = None
+        if options['serveur']:
+            self.cache = CacheScripts(
+                options['serveur'], getattr(settings, 'SNAPFLOW_AGENT_TOKEN', ''), options['cache']
+            )
+            self.stdout.write(f"📦 Scripts téléchargés depuis {options['serveur']} (cache: {options['cache']})")
+
+        instant = now()
+        valeurs = {
+            'hote': socket.gethostname(),
+            'pid': os.getpid(),
+            'concurrence': self.concurrence,
+            'executions_en_cours': 0,
+            'demarre_le': instant,
+            'dernier_battement': instant,
+            'arrete_le': None,
+        }
+        # UPDATE puis INSERT plutôt que update_or_create (lecture puis écriture
+        # dans une transaction) : sous SQLite, plusieurs agents démarrés
+        # ensemble attendent leur tour au lieu d'échouer ("database is locked")
+        if not AgentExecution.objects.filter(nom=self.worker_id).update(**valeurs):
+            AgentExecution.objects.create(nom=self.worker_id, **valeurs)
+
+    def arreter(self):
+        AgentExecution.objects.filter(nom=self.worker_id).update(
+            arrete_le=now(), executions_en_cours=0
+        )
+
+    def options_runner(self):
+        return {'chemin_script': self.cache.chemin} if self.cache else {}
+
+    def intervalle_entretien(self):
+        # Battement au moins toutes les SNAPFLOW_AGENT_BATTEMENT secondes
+        return min(super().intervalle_entretien(), getattr(settings, 'SNAPFLOW_AGENT_BATTEMENT', 30))
+
+    def entretien(self, execution_ids):
+        super().entretien(execution_ids)
+        AgentExecution.objects.filter(nom=self.worker_id).update(
+            dernier_battement=now(), executions_en_cours=len(execution_ids)
+        )
+
@@ -0,0 +1,248 @@
+# core/management/commands/test_agents.py
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils.timezone import now
+
+from core.models import AgentExecution, ConfigurationTest, ExecutionTest, Projet, Script, Societe
+
+
+class Command(BaseCommand):
+    help = (
+        "Lance plusieurs agents (processus snapflow_agent) sur cette machine contre la base "
+        "configurée, qui doit être une base de test (nom commençant par 'test') : mesure le "
+        "débit selon le nombre d'agents, puis tue un agent en cours d'exécution et vérifie "
+        "qu'un autre reprend ses exécutions à l'expiration du bail. Échoue (CommandError) "
+        "si le débit ne suit pas le nombre d'agents ou si la reprise n'a pas lieu. Les "
+        "données de test sont supprimées à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--agents', type=int, nargs='+', default=[1, 2, 4],
+                            help="Nombres d'agents à comparer (défaut : 1 2 4)")
+        parser.add_argument('--executions', type=int, default=24,
+                            help="Exécutions par mesure de débit (défaut : 24)")
+        parser.add_argument('--duree', type=float, default=1.0,
+                            help="Durée du script de test en secondes (défaut : 1)")
+        parser.add_argument('--bail', type=int, default=4,
+                            help="Bail des agents en secondes pour le test de reprise (défaut : 4)")
+
+    def handle(self, *args, **options):
+        # Les agents sont des processus distincts : ils ne peuvent pas utiliser
+        # la base créée par le lanceur de tests, seulement la base configurée
+        base = os.path.basename(str(connection.settings_dict["NAME"]))
+        if not base.startswith("test"):
+            raise CommandError(
+                f"La base configurée ({base}) n'est pas une base de test : les agents y "
+                f"créeraient et y exécuteraient des données. Pointez DATABASES vers une base "
+                f"dont le nom commence par 'test' (par exemple test_{base})."
+            )
+
+        self.stdout.write(self.style.SUCCESS('\n=== TEST DES AGENTS D\'EXÉCUTION ==='))
+        self.dossier = tempfile.mkdtemp(prefix="snapflow_agents_")
+        self.prefixe = f"test-agent-{os.getpid()}"
+        self.processus = []
+        self.executions = []
+        echecs = []
+        try:
+            self.creer_configuration()
+
+            debits = {}
+            for nb_agents in sorted(options['agents']):
+                debits[nb_agents] = self.mesurer_debit(nb_agents, options['executions'], options['duree'])
+                self.stdout.write(f"  {nb_agents} agent(s) : {debits[nb_agents] * 60:.1f} exécutions/min")
+
+            reference = min(debits)
+            if not debits[reference]:
+                echecs.append(f"{reference} agent(s) : aucune exécution terminée")
+            else:
+                for nb_agents, debit in debits.items():
+                    efficacite = (debit / debits[reference]) / (nb_agents / reference)
+                    if efficacite < 0.75:
+                        echecs.append(f"{nb_agents} agents : efficacité {efficacite:.0%} (< 75 %)")
+
+            echecs.extend(self.verifier_reprise(options['bail']))
+        finally:
+            self.nettoyer()
+
+        if echecs:
+            for echec in echecs:
+                self.stdout.write(self.style.ERROR(f"  ❌ {echec}"))
+            raise CommandError(f"{len(echecs)} vérification(s) en échec")
+        self.stdout.write(self.style.SUCCESS(
+            "\n✅ Débit proportionnel au nombre d'agents ; exécutions reprises après la mort d'un agent"
+        ))
+
+    # -- Données -----------------------------------------------------------
+
+    def creer_configuration(self):
+        self.societe = Societe.objects.create(nom="Société test agents")
+        self.projet = Projet.objects.create(nom="Projet test agents", url="https://exemple.com", contrat="-")
+        self.societe.projets.add(self.projet)
+        self.configuration = ConfigurationTest.objects.create(
+            societe=self.societe, nom="Test agents", projet=self.projet, periodicite="1j", is_active=False
+        )
+        self.script = Script.objects.create(nom="Script test agents", projet=self.projet)
+        self.configuration.scripts.add(self.script)
+
+    def definir_duree(self, duree):
+        """Réécrit le script de test (chemin absolu, MEDIA_ROOT ignoré) pour qu'il dure `duree` s."""
+        chemin = os.path.join(self.dossier, f"script_{duree}.py")
+        with open(chemin, "w", encoding="utf-8") as f:
+            f.write(f"import time\ntime.sleep({duree})\nprint('ok')\n")
+        Script.objects.filter(pk=self.script.pk).update(fichier=chemin)
+
+    def creer_executions(self, nombre):
+        """Exécutions retenues (non_executed) jusqu'à ce que les agents soient prêts."""
+        instant = now()
+        ExecutionTest.objects.bulk_create([
+            ExecutionTest(configuration=self.configuration, statut="non_executed", date_mise_en_file=instant)
+            for _ in range(nombre)
+        ])
+        ids = list(
+            ExecutionTest.objects.filter(configuration=self.configuration, statut="non_executed")
+            .values_list("id", flat=True)
+        )
+        self.executions.extend(ids)
+        return ids
+
+    # -- Agents ------------------------------------------------------------
+
+    def lancer_agent(self, nom, concurrence=1, bail=None):
+        commande = [
+            sys.executable, os.path.join(settings.BASE_DIR, "manage.py"), "snapflow_agent",
+            "--nom", nom, "--concurrency", str(concurrence), "--poll-interval", "0.2",
+        ]
+        if bail:
+            commande += ["--bail", str(bail)]
+        journal = open(os.path.join(self.dossier, f"{nom}.log"), "w")
+        processus = subprocess.Popen(
+            commande, cwd=settings.BASE_DIR, stdout=journal, stderr=subprocess.STDOUT, start_new_session=True
+        )
+        self.processus.append(processus)
+        return processus
+
+    def attendre(self, condition, timeout, message):
+        limite = time.monotonic() + timeout
+        while time.monotonic() < limite:
+            if condition():
+                return True
+            time.sleep(0.2)
+        self.stdout.write(self.style.WARNING(f"  ⏳ Délai dépassé : {message}"))
+        return False
+
+    def attendre_agents(self, noms, timeout=60):
+        return self.attendre(
+            lambda: AgentExecution.objects.filter(nom__in=noms, arrete_le__isnull=True).count() == len(noms),
+            timeout, "démarrage des agents",
+        )
+
+    def arreter_agents(self):
+        for processus in self.processus:
+            if processus.poll() is None:
+                processus.send_signal(signal.SIGTERM)
+        for processus in self.processus:
+            try:
+                processus.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                os.killpg(processus.pid, signal.SIGKILL)
+        self.processus = []
+
+    # -- Vérifications -----------------------------------------------------
+
+    def mesurer_debit(self, nb_agents, nb_executions, duree):
+        """Exécutions par seconde, entre le premier démarrage et la dernière fin (horodatages en base)."""
+        self.definir_duree(duree)
+        ids = self.creer_executions(nb_executions)
+        noms = [f"{self.prefixe}-{nb_agents}-{i}" for i in range(nb_agents)]
+        for nom in noms:
+            self.lancer_agent(nom)
+        try:
+            self.attendre_agents(noms)
+            ExecutionTest.objects.filter(pk__in=ids).update(statut="pending")
+            self.attendre(
+                lambda: not ExecutionTest.objects.filter(pk__in=ids, statut__in=["pending", "running"]).exists(),
+                nb_executions * duree * 3 + 30, "fin des exécutions",
+            )
+        finally:
+            self.arreter_agents()
+
+        executions = ExecutionTest.objects.filter(pk__in=ids, ended_at__isnull=False)
+        debuts = [e.started_at for e in executions]
+        fins = [e.ended_at for e in executions]
+        if len(fins) < nb_executions:
+            self.stdout.write(self.style.WARNING(f"  {nb_executions - len(fins)} exécution(s) non terminée(s)"))
+        if not fins:
+            return 0.0
+        return len(fins) / max((max(fins) - min(debuts)).total_seconds(), 0.001)
+
+    def verifier_reprise(self, bail):
+        """Un agent tué pendant ses exécutions : un second agent les reprend après expiration du bail."""
+        echecs = []
+        self.definir_duree(bail * 2)
+        ids = self.creer_executions(4)
+        victime, relais = f"{self.prefixe}-victime", f"{self.prefixe}-relais"
+
+        processus = self.lancer_agent(victime, concurrence=4, bail=bail)
+        try:
+            self.attendre_agents([victime])
+            ExecutionTest.objects.filter(pk__in=ids).update(statut="pending")
+            self.attendre(
+                lambda: ExecutionTest.objects.filter(pk__in=ids, statut="running", claimed_by=victime).count() == 4,
+                60, "réservation par l'agent victime",
+            )
+            os.killpg(processus.pid, signal.SIGKILL)
+            mort = now()
+            self.stdout.write(f"  💀 Agent {victime} tué avec 4 exécutions en cours")
+
+            self.lancer_agent(relais, concurrence=4, bail=bail)
+            termine = self.attendre(
+                lambda: ExecutionTest.objects.filter(pk__in=ids, statut="done").count() == 4,
+                bail * 4 + 90, "reprise des exécutions",
+            )
+        finally:
+            self.arreter_agents()
+
+        executions = list(ExecutionTest.objects.filter(pk__in=ids))
+        if not termine:
+            echecs.append("les exécutions de l'agent tué n'ont pas toutes été menées à terme")
+        if any(e.claimed_by != relais for e in executions):
+            echecs.append("des exécutions n'ont pas été reprises par l'agent relais")
+        # en_ligne se juge avec le bail de l'agent, pas celui de ce processus
+        with override_settings(SNAPFLOW_EXECUTION_LEASE=bail):
+            en_ligne = AgentExecution.objects.get(nom=victime).en_ligne
+        if en_ligne:
+            echecs.append("l'agent tué apparaît encore en ligne")
+        reprises = [e.started_at for e in executions if e.started_at and e.started_at > mort]
+        if reprises:
+            self.stdout.write(
+                f"  ♻️ Reprise {(min(reprises) - mort).total_seconds():.1f} s après la mort "
+                f"(bail : {bail} s)"
+            )
+        return echecs
+
+    def nettoyer(self):
+        self.arreter_agents()
+        logs = os.path.join(settings.MEDIA_ROOT, "logs")
+        for execution_id in self.executions:
+            shutil.rmtree(os.path.join(logs, f"execution_{execution_id}"), ignore_errors=True)
+            try:
+                os.remove(os.path.join(logs, f"execution_{execution_id}.txt"))
+            except OSError:
+                pass
+        AgentExecution.objects.filter(nom__startswith=self.prefixe).delete()
+        if hasattr(self, 'configuration'):
+            self.configuration.delete()
+            Script.objects.filter(pk=self.script.pk).delete()
+            self.projet.delete()
+            self.societe.delete()
+        shutil.rmtree(self.dossier, ignore_errors=True)
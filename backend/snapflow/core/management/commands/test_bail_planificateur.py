@@ -0,0 +1,103 @@
+# core/management/commands/test_bail_planificateur.py
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from apscheduler.events import EVENT_JOB_EXECUTED
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils.timezone import now
+
+from core import scheduler as module_scheduler
+from core.models import BailPlanificateur
+
+
+class Command(BaseCommand):
+    help = (
+        "Lance la candidature au bail du planificateur, fait perdre le bail à ce "
+        "processus puis le lui laisse reprendre : vérifie que le scheduler est arrêté "
+        "puis redémarré, et que le balayage des exécutions orphelines tourne encore "
+        "après la reprise ; échoue (CommandError) sinon. À lancer sans processus web "
+        "actif sur la même base."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bail', type=int, default=3,
+                            help="Durée du bail en secondes pendant le test (défaut : 3)")
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('\n=== BAIL DU PLANIFICATEUR PERDU PUIS REPRIS ==='))
+        duree = options['bail']
+        bail = module_scheduler.get_bail()
+        if bail is not None and bail.actif:
+            raise CommandError(f"Bail détenu par {bail.titulaire} : arrêtez d'abord les processus web")
+
+        echecs = []
+        with override_settings(SNAPFLOW_PLANIFICATEUR_ACTIF=True, SNAPFLOW_PLANIFICATEUR_BAIL=duree):
+            module_scheduler.demarrer_candidature()
+            try:
+                if not self.attendre(lambda: module_scheduler.scheduler.running, duree * 2):
+                    echecs.append("scheduler non démarré à la prise du bail")
+                else:
+                    self.stdout.write("  Bail pris, scheduler démarré : ✅")
+                    premier = module_scheduler.scheduler
+
+                    # Un autre processus prend le bail (jusqu'à son expiration)
+                    BailPlanificateur.objects.filter(nom=module_scheduler.NOM_BAIL).update(
+                        titulaire="autre-processus", acquis_le=now(), expire_le=now() + timedelta(seconds=duree)
+                    )
+                    if not self.attendre(lambda: not module_scheduler.scheduler.running, duree * 2):
+                        echecs.append("scheduler toujours actif après la perte du bail")
+                    else:
+                        self.stdout.write("  Bail perdu, scheduler arrêté : ✅")
+
+                    if not self.attendre(lambda: module_scheduler.scheduler.running, duree * 3):
+                        echecs.append("scheduler non redémarré à la reprise du bail")
+                    else:
+                        self.stdout.write("  Bail repris, scheduler redémarré : ✅")
+                        if module_scheduler.scheduler is premier:
+                            echecs.append("scheduler arrêté réutilisé")
+                        if not self.balayage_execute(duree * 2):
+                            echecs.append("balayage des orphelines non exécuté après la reprise")
+                        else:
+                            self.stdout.write("  Balayage exécuté après la reprise : ✅")
+            finally:
+                module_scheduler.arreter_candidature()
+
+        bail = module_scheduler.get_bail()
+        if module_scheduler.scheduler.running:
+            echecs.append("scheduler toujours actif après l'arrêt de la candidature")
+        if bail is not None and bail.actif:
+            echecs.append(f"bail non rendu (titulaire : {bail.titulaire})")
+
+        if echecs:
+            for echec in echecs:
+                self.stdout.write(self.style.ERROR(f"  ❌ {echec}"))
+            raise CommandError(f"{len(echecs)} vérification(s) en échec")
+        self.stdout.write(self.style.SUCCESS("\n✅ Scheduler redémarré après la reprise du bail"))
+
+    def attendre(self, condition, delai):
+        limite = time.monotonic() + delai
+        while time.monotonic() < limite:
+            if condition():
+                return True
+            time.sleep(0.1)
+        return condition()
+
+    def balayage_execute(self, delai):
+        """Avance le balayage à maintenant et attend qu'il se termine sans erreur."""
+        scheduler = module_scheduler.scheduler
+        execute = threading.Event()
+
+        def ecouter(evenement):
+            if evenement.job_id == 'balayer_executions_orphelines':
+                execute.set()
+
+        scheduler.add_listener(ecouter, EVENT_JOB_EXECUTED)
+        try:
+            # Un pool de threads arrêté fait échouer la soumission de la tâche
+            # (« cannot schedule new futures after shutdown ») sans l'exécuter
+            scheduler.modify_job('balayer_executions_orphelines', next_run_time=datetime.now(dt_timezone.utc))
+            return execute.wait(delai)
+        finally:
+            scheduler.remove_listener(ecouter)
@@ -0,0 +1,91 @@
+# core/management/commands/test_moteur_async.py
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from core.models import ConfigurationTest, ExecutionTest, Projet, Script, Societe
+from core.moteur_async import MoteurAsync
+
+
+class Command(BaseCommand):
+    help = (
+        "Mène une exécution avec le moteur 'asyncio' (MoteurAsync) puis l'arrête, comme "
+        "un worker en fin de boucle : vérifie que l'exécution aboutit et que le moteur "
+        "se ferme sans erreur (connexion du thread d'écriture fermée dans ce thread) ; "
+        "échoue (CommandError) sinon. Les données de test sont supprimées à la fin."
+    )
+
+    @override_settings(
+        SNAPFLOW_EXECUTION_BACKEND='queue',
+        SNAPFLOW_WEBDRIVER_POOL=None,
+        SNAPFLOW_SCRIPT_HOSTS=0,
+    )
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('\n=== MOTEUR ASYNCIO : EXÉCUTION ET ARRÊT ==='))
+        dossier = tempfile.mkdtemp(prefix="snapflow_moteur_async_")
+        echecs = []
+        execution_id = None
+        # Données validées : le thread d'écriture du moteur a sa propre connexion
+        societe = Societe.objects.create(nom="Société test moteur asyncio")
+        projet = Projet.objects.create(nom="Projet test moteur asyncio", url="https://exemple.com", contrat="-")
+        try:
+            societe.projets.add(projet)
+            configuration = ConfigurationTest.objects.create(
+                societe=societe, nom="Test moteur asyncio", projet=projet, periodicite="1j", is_active=False
+            )
+            for i in range(2):
+                chemin = os.path.join(dossier, f"script_{i}.py")
+                with open(chemin, "w", encoding="utf-8") as f:
+                    f.write("print('ok')\n")
+                script = Script(nom=f"script moteur asyncio {i}", projet=projet)
+                script.fichier.name = chemin  # chemin absolu : MEDIA_ROOT est ignoré
+                script.save()
+                configuration.scripts.add(script)
+            execution_id = ExecutionTest.objects.create(configuration=configuration, statut="non_executed").id
+
+            # Moteur arrêté sans avoir servi, puis après une exécution
+            for libelle, execution in (("sans exécution", None), ("après une exécution", execution_id)):
+                try:
+                    asyncio.run(self.mener(execution))
+                    self.stdout.write(f"  Arrêt {libelle} : ✅")
+                except Exception as e:
+                    echecs.append(f"arrêt {libelle} : {type(e).__name__}: {e}")
+
+            statut = ExecutionTest.objects.get(pk=execution_id).statut
+            if statut != "done":
+                echecs.append(f"exécution au statut '{statut}' ('done' attendu)")
+            restants = [t.name for t in threading.enumerate() if t.name.startswith("base")]
+            if restants:
+                echecs.append(f"thread(s) d'écriture encore actif(s) : {', '.join(restants)}")
+        finally:
+            Script.objects.filter(projet=projet).delete()
+            projet.delete()
+            societe.delete()
+            shutil.rmtree(dossier, ignore_errors=True)
+            if execution_id:
+                logs = os.path.join(settings.MEDIA_ROOT, "logs")
+                shutil.rmtree(os.path.join(logs, f"execution_{execution_id}"), ignore_errors=True)
+                try:
+                    os.remove(os.path.join(logs, f"execution_{execution_id}.txt"))
+                except OSError:
+                    pass
+
+        if echecs:
+            for echec in echecs:
+                self.stdout.write(self.style.ERROR(f"  ❌ {echec}"))
+            raise CommandError(f"{len(echecs)} vérification(s) en échec")
+        self.stdout.write(self.style.SUCCESS("\n✅ Exécution menée et moteur arrêté proprement"))
+
+    async def mener(self, execution_id):
+        moteur = MoteurAsync("test-moteur-async")
+        try:
+            if execution_id is not None:
+                await moteur.executer(execution_id, notifier=False)
+        finally:
+            await moteur.fermer()
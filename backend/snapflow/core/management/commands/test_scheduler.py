@@ -1,6 +1,6 @@
 # core/management/commands/test_scheduler.py
 from django.core.management.base import BaseCommand
-from core.scheduler import get_scheduler_status, scheduler
+from core.scheduler import get_bail, get_scheduler_status
 from core.jobs import execute_pending_tests
 from core.models import ConfigurationTest, ExecutionTest
 import time
@@ -45,6 +45,17 @@ class Command(BaseCommand):
         status = get_scheduler_status()
         self.stdout.write(f"Running: {status['running']}")
         self.stdout.write(f"Nombre de jobs: {status['jobs_count']}")
+        bail = status['bail']
+        self.stdout.write(
+            f"Bail du planificateur: {bail['titulaire'] or 'libre'} "
+            f"({'actif' if bail['actif'] else 'expiré'}, expire le {bail['expire_le']})"
+        )
+        planificateur = status['planificateur']
+        self.stdout.write(
+            f"Planificateur: {'actif' if planificateur['running'] else 'arrêté'} | "
+            f"{planificateur['configurations']} configuration(s) planifiée(s) | "
+            f"prochaine échéance: {planificateur['prochaine_echeance']}"
+        )
         
         if status['jobs']:
             self.stdout.write("\nJobs planifiés:")
@@ -82,9 +93,12 @@ class Command(BaseCommand):
         """Surveille le scheduler pendant 60 secondes"""
         self.stdout.write(self.style.SUCCESS('\n=== SURVEILLANCE DU SCHEDULER (60s) ==='))
         
-        if not scheduler.running:
-            self.stdout.write(self.style.ERROR('❌ Le scheduler n\'est pas démarré!'))
+        # Le scheduler tourne dans un processus web, titulaire du bail
+        bail = get_bail()
+        if bail is None or not bail.actif:
+            self.stdout.write(self.style.ERROR('❌ Aucun processus web ne mène le scheduler!'))
             return
+        self.stdout.write(f'Scheduler mené par {bail.titulaire}')
         
         self.stdout.write('Surveillance en cours...\n')
         
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0060_alter_groupepersonnalise_role_predefini'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configurationtest',
+            name='scripts_paralleles',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Nombre de scripts exécutés simultanément (1 = séquentiel)'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0061_configurationtest_scripts_paralleles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='executiontest',
+            name='claimed_by',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='executiontest',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='executiontest',
+            index=models.Index(fields=['statut', 'lease_expires_at'], name='core_exec_statut_lease_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0062_executiontest_claimed_by_lease_expires_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='executionresult',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='executionresult',
+            name='ended_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='executionresult',
+            name='statut',
+            field=models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('done', 'Concluant'), ('error', 'Non concluant'), ('timeout', 'Délai dépassé'), ('non_executed', 'Non exécuté')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='executiontest',
+            name='statut',
+            field=models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('done', 'Concluant'), ('error', 'Non concluant'), ('timeout', 'Délai dépassé'), ('non_executed', 'Non exécuté')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='executionresult',
+            index=models.Index(fields=['script', 'statut'], name='core_result_script_statut_idx'),
+        ),
+    ]
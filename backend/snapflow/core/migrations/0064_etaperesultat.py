@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0063_executionresult_started_at_ended_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EtapeResultat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ordre', models.PositiveIntegerField()),
+                ('type', models.CharField(choices=[('etape', 'Étape'), ('assertion', 'Vérification')], default='etape', max_length=20)),
+                ('nom', models.CharField(max_length=255)),
+                ('statut', models.CharField(choices=[('done', 'Concluant'), ('error', 'Non concluant')], max_length=20)),
+                ('duree', models.FloatField(blank=True, help_text='Durée en secondes', null=True)),
+                ('message', models.TextField(blank=True)),
+                ('resultat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='etapes', to='core.executionresult')),
+            ],
+            options={
+                'verbose_name': 'Étape de script',
+                'verbose_name_plural': 'Étapes des scripts',
+                'ordering': ['resultat', 'ordre'],
+                'indexes': [models.Index(fields=['statut', 'nom'], name='core_etape_statut_nom_idx')],
+            },
+        ),
+    ]
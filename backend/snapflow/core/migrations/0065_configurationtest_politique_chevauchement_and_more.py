@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0064_etaperesultat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configurationtest',
+            name='politique_chevauchement',
+            field=models.CharField(choices=[('skip', 'Ignorer le déclenchement'), ('queue_one', 'Garder une seule exécution en attente'), ('replace', "Remplacer l'exécution en attente")], default='queue_one', help_text="Que faire quand l'exécution précédente est encore en attente ou en cours", max_length=10),
+        ),
+        migrations.CreateModel(
+            name='DeclenchementCoalesce',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_prevue', models.DateTimeField()),
+                ('politique', models.CharField(choices=[('skip', 'Ignorer le déclenchement'), ('queue_one', 'Garder une seule exécution en attente'), ('replace', "Remplacer l'exécution en attente")], max_length=10)),
+                ('action', models.CharField(choices=[('ignore', 'Ignoré (exécution en cours)'), ('fusionne', "Fusionné avec l'exécution en attente"), ('remplace', 'Exécution en attente remplacée')], max_length=10)),
+                ('configuration', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='declenchements_coalesces', to='core.configurationtest')),
+                ('execution', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.executiontest')),
+            ],
+            options={
+                'verbose_name': 'Déclenchement coalescé',
+                'verbose_name_plural': 'Déclenchements coalescés',
+                'indexes': [models.Index(fields=['configuration', 'date_prevue'], name='core_declench_config_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0065_configurationtest_politique_chevauchement_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='executiontest',
+            name='priorite',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Basse'), (2, 'Normale'), (3, 'Haute'), (4, 'Urgente'), (5, 'Immédiate')], default=2),
+        ),
+        migrations.AddField(
+            model_name='executiontest',
+            name='echeance',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='executiontest',
+            name='date_mise_en_file',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='executiontest',
+            index=models.Index(fields=['statut', '-priorite', 'echeance'], name='core_exec_file_prio_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+def calculer_empreintes(apps, schema_editor):
+    import hashlib
+
+    Script = apps.get_model('core', 'Script')
+    for script in Script.objects.exclude(fichier=''):
+        empreinte = hashlib.sha256()
+        try:
+            with script.fichier.open('rb') as f:
+                for bloc in f.chunks():
+                    empreinte.update(bloc)
+        except (OSError, ValueError):
+            continue  # fichier absent : empreinte calculée au prochain enregistrement
+        Script.objects.filter(pk=script.pk).update(empreinte=empreinte.hexdigest())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0066_executiontest_priorite_echeance_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='script',
+            name='empreinte',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.CreateModel(
+            name='AgentExecution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=255, unique=True)),
+                ('hote', models.CharField(max_length=255)),
+                ('pid', models.PositiveIntegerField(blank=True, null=True)),
+                ('concurrence', models.PositiveSmallIntegerField(default=1)),
+                ('executions_en_cours', models.PositiveSmallIntegerField(default=0)),
+                ('demarre_le', models.DateTimeField()),
+                ('dernier_battement', models.DateTimeField()),
+                ('arrete_le', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': "Agent d'exécution",
+                'verbose_name_plural': "Agents d'exécution",
+                'ordering': ['-dernier_battement'],
+            },
+        ),
+        migrations.RunPython(calculer_empreintes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0067_script_empreinte_agentexecution'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configurationtest',
+            name='politique_reprise',
+            field=models.CharField(choices=[('requeue', 'Remettre en file'), ('finalize', 'Terminer en erreur')], default='requeue', help_text="Que faire d'une exécution restée en cours après l'arrêt du processus qui la menait", max_length=10),
+        ),
+        migrations.AddField(
+            model_name='executiontest',
+            name='dernier_battement',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='executiontest',
+            name='reprises',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
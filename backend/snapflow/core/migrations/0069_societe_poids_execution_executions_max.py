@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0068_configurationtest_politique_reprise_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='societe',
+            name='poids_execution',
+            field=models.PositiveSmallIntegerField(default=1, help_text="Part relative de la capacité d'exécution quand plusieurs sociétés attendent"),
+        ),
+        migrations.AddField(
+            model_name='societe',
+            name='executions_max',
+            field=models.PositiveIntegerField(blank=True, help_text='Exécutions simultanées au plus (vide = sans plafond)', null=True),
+        ),
+    ]
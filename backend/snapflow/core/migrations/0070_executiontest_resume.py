@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0069_societe_poids_execution_executions_max'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='executiontest',
+            name='resume',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
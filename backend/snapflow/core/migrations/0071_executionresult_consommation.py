@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0070_executiontest_resume'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='executionresult',
+            name='cpu_utilisateur',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='executionresult',
+            name='cpu_systeme',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='executionresult',
+            name='rss_max_ko',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0071_executionresult_consommation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='executiontest',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='relances', to='core.executiontest'),
+        ),
+        migrations.AddField(
+            model_name='executiontest',
+            name='statut_effectif',
+            field=models.CharField(blank=True, choices=[('pending', 'En attente'), ('running', 'En cours'), ('done', 'Concluant'), ('error', 'Non concluant'), ('timeout', 'Délai dépassé'), ('non_executed', 'Non exécuté')], max_length=20, null=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0072_executiontest_parent_statut_effectif'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='executiontest',
+            name='immediate',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RemoveIndex(
+            model_name='executiontest',
+            name='core_exec_file_prio_idx',
+        ),
+        migrations.AddIndex(
+            model_name='executiontest',
+            index=models.Index(fields=['statut', '-immediate', '-priorite', 'echeance'], name='core_exec_file_voie_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0073_executiontest_immediate'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='configurationtest',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
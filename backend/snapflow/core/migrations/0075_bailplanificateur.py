@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0074_configurationtest_date_modification_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BailPlanificateur',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=50, unique=True)),
+                ('titulaire', models.CharField(blank=True, max_length=255)),
+                ('acquis_le', models.DateTimeField(blank=True, null=True)),
+                ('expire_le', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Bail du planificateur',
+                'verbose_name_plural': 'Baux du planificateur',
+            },
+        ),
+    ]
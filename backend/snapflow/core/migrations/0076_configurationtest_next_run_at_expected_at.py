@@ -0,0 +1,55 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+def calculer_echeances(apps, schema_editor):
+    from django.utils import timezone
+
+    from core.echeances import PERIODICITES, echeance_planifiee
+
+    ConfigurationTest = apps.get_model('core', 'ConfigurationTest')
+    maintenant = timezone.now()
+    lot = []
+    for config in ConfigurationTest.objects.all().iterator(chunk_size=2000):
+        config.next_run_at = echeance_planifiee(
+            config.last_execution, config.periodicite, config.date_activation,
+            config.date_desactivation, config.is_active, maintenant=maintenant,
+        )
+        periode = PERIODICITES.get(config.periodicite)
+        config.expected_at = config.last_execution + periode if config.last_execution and periode else None
+        lot.append(config)
+        if len(lot) >= 500:
+            ConfigurationTest.objects.bulk_update(lot, ['next_run_at', 'expected_at'])
+            lot = []
+    if lot:
+        ConfigurationTest.objects.bulk_update(lot, ['next_run_at', 'expected_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0075_bailplanificateur'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configurationtest',
+            name='next_run_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='configurationtest',
+            name='expected_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='configurationtest',
+            index=models.Index(fields=['is_active', 'next_run_at'], name='core_config_echeance_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='configurationtest',
+            index=models.Index(fields=['is_active', 'expected_at'], name='core_config_attendue_idx'),
+        ),
+        migrations.RunPython(calculer_echeances, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,14 @@
 # core/models.py
 from django.contrib.auth.models import Group, Permission
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 from users.managers import CustomUserManager
 from django.utils.timezone import now
 from django.utils import timezone
 import requests
 import json
-from django.core.exceptions import ImproperlyConfigured
+import hashlib
+from django.core.exceptions import ImproperlyConfigured, SuspiciousFileOperation
 from dateutil.parser import parse as parse_datetime
 from datetime import datetime, timedelta
 from rest_framework.exceptions import ValidationError, PermissionDenied
@@ -16,6 +17,10 @@ from rest_framework.exceptions import ValidationError, PermissionDenied
 # AJOUTER CET IMPORT
 from django.conf import settings
 
+from .echeances import (
+    PERIODICITES, echeance_planifiee, executions_dans, prochaine_execution, prochaines_executions_lot,
+)
+
 
 class CustomUser(AbstractUser):
     email = models.EmailField(unique=True)
@@ -152,6 +157,16 @@ class Societe(models.Model):
         blank=True,
         related_name="societes_employes",
     )
+    # Partage équitable de la capacité d'exécution entre sociétés
+    poids_execution = models.PositiveSmallIntegerField(
+        default=1,
+        help_text="Part relative de la capacité d'exécution quand plusieurs sociétés attendent",
+    )
+    executions_max = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Exécutions simultanées au plus (vide = sans plafond)",
+    )
     date_creation = models.DateTimeField(auto_now_add=True)
     date_modification = models.DateTimeField(auto_now=True)
 
@@ -199,10 +214,37 @@ class Script(models.Model):
         Projet, on_delete=models.CASCADE, related_name="scripts", null=True
     )
     priorite = models.PositiveSmallIntegerField(choices=PRIORITY_CHOICES, default=2)
+    # SHA-256 du fichier : les agents d'exécution distants téléchargent et
+    # mettent en cache les scripts par empreinte
+    empreinte = models.CharField(max_length=64, blank=True, default="", db_index=True)
 
     def __str__(self):
         return f"{self.axe.nom}/{self.sous_axe.nom}/{self.nom}"
 
+    def save(self, *args, **kwargs):
+        # Nouveau fichier (téléversé, pas encore enregistré) ou empreinte manquante
+        if self.fichier and (not self.empreinte or not self.fichier._committed):
+            self.empreinte = calculer_empreinte(self.fichier) or self.empreinte
+        super().save(*args, **kwargs)
+
+
+def calculer_empreinte(fichier):
+    """SHA-256 (hexadécimal) d'un FieldFile ; None si le fichier est illisible."""
+    empreinte = hashlib.sha256()
+    try:
+        fichier.open("rb")
+        try:
+            for bloc in fichier.chunks():
+                empreinte.update(bloc)
+        finally:
+            # Un fichier téléversé reste ouvert : le stockage va le lire
+            if fichier._committed:
+                fichier.close()
+    except (OSError, ValueError, SuspiciousFileOperation):
+        # SuspiciousFileOperation : chemin hors de MEDIA_ROOT (scripts de test)
+        return None
+    return empreinte.hexdigest()
+
 
 
 
@@ -266,6 +308,15 @@ class EmailNotification(models.Model):
 
 
 class ConfigurationTest(models.Model):
+    POLITIQUE_CHEVAUCHEMENT_CHOICES = [
+        ("skip", "Ignorer le déclenchement"),
+        ("queue_one", "Garder une seule exécution en attente"),
+        ("replace", "Remplacer l'exécution en attente"),
+    ]
+    POLITIQUE_REPRISE_CHOICES = [
+        ("requeue", "Remettre en file"),
+        ("finalize", "Terminer en erreur"),
+    ]
     PERIODICITE_CHOICES = [
         ("2min", "Toutes les 2 minutes"),
         ("2h", "Toutes les 2 heures"),
@@ -291,6 +342,22 @@ class ConfigurationTest(models.Model):
     )
 
     periodicite = models.CharField(max_length=10, choices=PERIODICITE_CHOICES)
+    scripts_paralleles = models.PositiveSmallIntegerField(
+        default=1,
+        help_text="Nombre de scripts exécutés simultanément (1 = séquentiel)",
+    )
+    politique_chevauchement = models.CharField(
+        max_length=10,
+        choices=POLITIQUE_CHEVAUCHEMENT_CHOICES,
+        default="queue_one",
+        help_text="Que faire quand l'exécution précédente est encore en attente ou en cours",
+    )
+    politique_reprise = models.CharField(
+        max_length=10,
+        choices=POLITIQUE_REPRISE_CHOICES,
+        default="requeue",
+        help_text="Que faire d'une exécution restée en cours après l'arrêt du processus qui la menait",
+    )
     last_execution = models.DateTimeField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
     date_activation = models.DateTimeField(
@@ -304,7 +371,14 @@ class ConfigurationTest(models.Model):
         help_text="Date et heure de désactivation de la configuration",
     )
     date_creation = models.DateTimeField(auto_now_add=True)
-    date_modification = models.DateTimeField(auto_now=True)
+    # Indexée : les planificateurs relisent les configurations modifiées
+    date_modification = models.DateTimeField(auto_now=True, db_index=True)
+    # Échéances matérialisées, recalculées à chaque enregistrement et à chaque
+    # déclenchement (calculer_echeances) : prochaine échéance du planificateur
+    # et exécution attendue (last_execution + périodicité). Configurations
+    # à exécuter, en retard et à venir se lisent par des requêtes sur ces index
+    next_run_at = models.DateTimeField(null=True, blank=True, editable=False)
+    expected_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.nom} - {self.societe.nom}"
@@ -323,6 +397,9 @@ class ConfigurationTest(models.Model):
             print(f"   date_activation: {self.date_activation}")
             print(f"   date_desactivation: {self.date_desactivation}")
             
+            self.calculer_echeances()
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "next_run_at", "expected_at"}
             super().save(*args, **kwargs)
             print(f"✅ ConfigurationTest sauvegardé avec ID: {self.id}")
             
@@ -339,102 +416,133 @@ class ConfigurationTest(models.Model):
         )
 
     def get_periodicite_timedelta(self):
-        periodicite_map = {
-            "2min": timedelta(minutes=2),
-            "2h": timedelta(hours=2),
-            "6h": timedelta(hours=6),
-            "1j": timedelta(days=1),
-            "1s": timedelta(weeks=1),
-            "1m": timedelta(days=30),
-        }
-        return periodicite_map.get(self.periodicite, timedelta(days=1))
+        return PERIODICITES.get(self.periodicite, timedelta(days=1))
+
+    def calculer_echeances(self, maintenant=None):
+        """Renseigne next_run_at (échéance du planificateur) et expected_at, sans enregistrer."""
+        self.next_run_at = echeance_planifiee(
+            self.last_execution, self.periodicite, self.date_activation, self.date_desactivation,
+            self.is_active, maintenant=maintenant or timezone.now(),
+        )
+        self.expected_at = (
+            self.last_execution + self.get_periodicite_timedelta() if self.last_execution else None
+        )
+
+    @classmethod
+    def recalculer_echeances(cls, configurations, maintenant=None):
+        """Recalcule et enregistre (bulk_update) les échéances de ces configurations."""
+        configurations = list(configurations)
+        for config in configurations:
+            config.calculer_echeances(maintenant)
+        cls.objects.bulk_update(configurations, ["next_run_at", "expected_at"], batch_size=500)
 
     def get_next_execution_time(self):
-        now = timezone.now()
-        if not self.is_active:
-            return None
-        if self.date_activation and now < self.date_activation:
-            return self.date_activation
-        base_time = self.last_execution or self.date_activation or now
-        next_time = base_time + self.get_periodicite_timedelta()
-        while next_time < now:
-            next_time += self.get_periodicite_timedelta()
-        if self.date_desactivation and next_time > self.date_desactivation:
-            return None
-        return next_time
+        return prochaine_execution(
+            self.is_active, self.get_periodicite_timedelta(), timezone.now(),
+            self.last_execution, self.date_activation, self.date_desactivation,
+        )
 
     def get_next_executions_within(self, hours_ahead=24):
         now = timezone.now()
-        limit_time = now + timedelta(hours=hours_ahead)
-        if not self.is_active:
-            return []
-        base_time = self.last_execution or self.date_activation or now
-        executions = []
-        next_time = base_time
-        while next_time <= now:
-            next_time += self.get_periodicite_timedelta()
-        while next_time <= limit_time:
-            if self.date_desactivation and next_time > self.date_desactivation:
-                break
-            executions.append(next_time)
-            next_time += self.get_periodicite_timedelta()
-        return executions
+        return executions_dans(
+            self.is_active, self.get_periodicite_timedelta(), now, now + timedelta(hours=hours_ahead),
+            self.last_execution, self.date_activation, self.date_desactivation,
+        )
 
     def is_due_for_execution(self):
-        next_time = self.get_next_execution_time()
-        if not next_time:
-            return False
-        return timezone.now() >= next_time
+        return self.next_run_at is not None and timezone.now() >= self.next_run_at
+
+    @classmethod
+    def prochaines_executions(cls, configurations, maintenant=None):
+        """
+        get_next_execution_time() pour plusieurs configurations en un calcul
+        (core/echeances.py) : {id: prochaine exécution ou None}. Un queryset
+        est lu en une requête, sans instancier les configurations.
+        """
+        maintenant = maintenant or timezone.now()
+        champs = ("id", "is_active", "periodicite", "last_execution", "date_activation", "date_desactivation")
+        if isinstance(configurations, models.QuerySet):
+            lignes = configurations.values_list(*champs)
+        else:
+            lignes = ([getattr(config, champ) for champ in champs] for config in configurations)
+        return prochaines_executions_lot(
+            (
+                (config_id, actif, PERIODICITES.get(periodicite, timedelta(days=1)), *dates)
+                for config_id, actif, periodicite, *dates in lignes
+            ),
+            maintenant,
+        )
 
     @classmethod
     def get_configurations_to_execute(cls):
-        return [
-            config
-            for config in cls.objects.filter(is_active=True)
-            if config.is_due_for_execution()
+        """Configurations actives dont l'échéance du planificateur est passée (index core_config_echeance_idx)."""
+        return list(
+            cls.objects.filter(is_active=True, next_run_at__lte=timezone.now())
+            .select_related("projet")
+            .prefetch_related("scripts")
+            .order_by("next_run_at")
+        )
+
+    @classmethod
+    def configurations_a_venir(cls, configurations, maintenant, limite):
+        """
+        [(configuration, prochaine exécution)] entre `maintenant` et `limite`,
+        triées. L'index sur next_run_at écarte les échéances après `limite` ;
+        une échéance dépassée mais pas encore déclenchée (planificateur
+        arrêté, bascule de leader) est reportée à l'occurrence suivante,
+        comme get_next_execution_time(), au lieu de disparaître.
+        """
+        configurations = list(configurations.filter(is_active=True, next_run_at__lte=limite))
+        prochaines = cls.prochaines_executions(configurations, maintenant)
+        a_venir = [
+            (config, prochaines[config.id])
+            for config in configurations
+            if prochaines[config.id] and maintenant <= prochaines[config.id] <= limite
         ]
+        a_venir.sort(key=lambda couple: couple[1])
+        return a_venir
 
     @classmethod
     def get_next_scheduled_configurations(cls, limit_hours=24):
         now = timezone.now()
         limit_time = now + timedelta(hours=limit_hours)
-        scheduled_configs = []
-        for config in cls.objects.filter(is_active=True):
-            next_time = config.get_next_execution_time()
-            if next_time and now <= next_time <= limit_time:
-                scheduled_configs.append(
-                    {
-                        "configuration": config,
-                        "next_execution": next_time,
-                        "scripts": list(config.scripts.all()),
-                        "time_until_execution": next_time - now,
-                    }
-                )
-        scheduled_configs.sort(key=lambda x: x["next_execution"])
-        return scheduled_configs
+        configurations = cls.objects.select_related("projet").prefetch_related("scripts")
+        return [
+            {
+                "configuration": config,
+                "next_execution": next_time,
+                "scripts": list(config.scripts.all()),
+                "time_until_execution": next_time - now,
+            }
+            for config, next_time in cls.configurations_a_venir(configurations, now, limit_time)
+        ]
 
     @classmethod
     def get_overdue_configurations(cls):
-        overdue_configs = []
-        for config in cls.objects.filter(is_active=True):
-            if config.last_execution:
-                expected_next = (
-                    config.last_execution + config.get_periodicite_timedelta()
-                )
-                if timezone.now() > expected_next:
-                    overdue_configs.append(
-                        {
-                            "configuration": config,
-                            "expected_time": expected_next,
-                            "delay": timezone.now() - expected_next,
-                            "scripts": list(config.scripts.all()),
-                        }
-                    )
-        return overdue_configs
+        now = timezone.now()
+        configurations = (
+            cls.objects.filter(is_active=True, expected_at__lt=now)
+            .select_related("projet")
+            .prefetch_related("scripts")
+            .order_by("expected_at")
+        )
+        return [
+            {
+                "configuration": config,
+                "expected_time": config.expected_at,
+                "delay": now - config.expected_at,
+                "scripts": list(config.scripts.all()),
+            }
+            for config in configurations
+        ]
 
     class Meta:
         verbose_name = "Configuration Test"
         verbose_name_plural = "Configurations Test"
+        indexes = [
+            models.Index(fields=["is_active", "next_run_at"], name="core_config_echeance_idx"),
+            models.Index(fields=["is_active", "expected_at"], name="core_config_attendue_idx"),
+        ]
         ordering = ["nom"]
         permissions = [
             ("view_societe_configurationtest", "Peut voir les configurations test de sa société"),
@@ -449,6 +557,7 @@ class ExecutionTest(models.Model):
         ("running", "En cours"),
         ("done", "Concluant"),
         ("error", "Non concluant"),
+        ("timeout", "Délai dépassé"),
         ("non_executed", "Non exécuté"),
     ]
     configuration = models.ForeignKey(ConfigurationTest, on_delete=models.CASCADE)
@@ -457,17 +566,134 @@ class ExecutionTest(models.Model):
     ended_at = models.DateTimeField(null=True, blank=True)
     log_fichier = models.FileField(upload_to="logs/", null=True, blank=True)
     rapport = models.TextField(blank=True)
+    # Résumé structuré par script (core/resume_execution.py), de taille
+    # bornée ; les sorties complètes restent dans les fichiers de log
+    resume = models.JSONField(null=True, blank=True)
     ticket_redmine_id = models.IntegerField(null=True, blank=True)
+    # File d'exécution : processus qui a réservé l'exécution et fin du bail
+    claimed_by = models.CharField(max_length=255, blank=True, default="")
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    # Dernier signe de vie du processus qui mène l'exécution, et nombre de
+    # reprises après sa disparition
+    dernier_battement = models.DateTimeField(null=True, blank=True)
+    reprises = models.PositiveSmallIntegerField(default=0)
+    # Ordre de passage dans la file : voie prioritaire (exécution demandée
+    # à la main, « exécuter maintenant »), priorité effective (script le
+    # plus prioritaire de la configuration), puis échéance
+    immediate = models.BooleanField(default=False)
+    priorite = models.PositiveSmallIntegerField(choices=Script.PRIORITY_CHOICES, default=2)
+    echeance = models.DateTimeField(null=True, blank=True)
+    date_mise_en_file = models.DateTimeField(null=True, blank=True)
+    # Relance des seuls scripts en échec (relancer_echecs()) : la relance
+    # pointe vers l'exécution d'origine, dont le statut effectif fusionne
+    # ses résultats avec ceux des relances terminées
+    parent = models.ForeignKey(
+        "self", null=True, blank=True, on_delete=models.CASCADE, related_name="relances"
+    )
+    statut_effectif = models.CharField(max_length=20, choices=STATUS_CHOICES, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["statut", "lease_expires_at"], name="core_exec_statut_lease_idx"),
+            models.Index(fields=["statut", "-immediate", "-priorite", "echeance"], name="core_exec_file_voie_idx"),
+        ]
 
     def __str__(self):
         return f"{self.configuration.nom} - {self.statut}"
 
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.statut == "pending" and self.date_mise_en_file is None:
+            self.preparer_mise_en_file()
+        super().save(*args, **kwargs)
+
+    def preparer_mise_en_file(self, date_prevue=None):
+        """
+        Renseigne priorité effective, échéance (déclenchement prévu + périodicité,
+        c'est-à-dire le déclenchement suivant) et date de mise en file.
+        """
+        maintenant = timezone.now()
+        self.date_mise_en_file = maintenant
+        self.priorite = (
+            self.configuration.scripts.aggregate(max_priorite=models.Max("priorite"))["max_priorite"]
+            or 2
+        )
+        self.echeance = (date_prevue or maintenant) + self.configuration.get_periodicite_timedelta()
+
+    def scripts_en_echec(self):
+        """
+        Ids des scripts en échec ou en délai dépassé, résultats des relances
+        terminées compris (la dernière relance d'un script fait foi).
+        """
+        statuts = self.statuts_fusionnes()
+        return [script_id for script_id, statut in statuts.items() if statut in ("error", "timeout")]
+
+    def statuts_fusionnes(self):
+        """{script_id: statut} de l'exécution, remplacés par ceux de ses relances terminées, dans l'ordre."""
+        statuts = dict(self.resultats.values_list("script_id", "statut"))
+        for script_id, statut in (
+            ExecutionResult.objects.filter(execution__parent=self, execution__statut__in=("done", "error"))
+            .order_by("execution_id")
+            .values_list("script_id", "statut")
+        ):
+            statuts[script_id] = statut
+        return statuts
+
+    def calculer_statut_effectif(self):
+        """
+        Statut de l'exécution d'origine après ses relances : 'done' si chaque
+        script est concluant dans sa dernière exécution. Une erreur hors des
+        scripts (aucun script en échec) n'est pas couverte par une relance.
+        """
+        if self.statut not in ("done", "error"):
+            return self.statut
+        if self.statut == "error" and not self.resultats.filter(statut__in=("error", "timeout")).exists():
+            return "error"
+        statuts = self.statuts_fusionnes()
+        return "done" if all(statut == "done" for statut in statuts.values()) else "error"
+
+    def relancer_echecs(self):
+        """
+        Crée et met en file une relance limitée aux scripts en échec ou en
+        délai dépassé ; une relance de relance repart de l'exécution
+        d'origine. ValueError si l'exécution n'est pas terminée, n'a aucun
+        script en échec ou a déjà une relance en cours.
+        """
+        origine = self.parent or self
+        with transaction.atomic():
+            # Verrou sur l'exécution d'origine : une seule relance créée à la fois
+            origine = ExecutionTest.objects.select_for_update().get(pk=origine.pk)
+            if origine.statut not in ("done", "error"):
+                raise ValueError("L'exécution n'est pas terminée.")
+            if origine.relances.filter(statut__in=("pending", "running")).exists():
+                raise ValueError("Une relance de cette exécution est déjà en cours.")
+            scripts = origine.scripts_en_echec()
+            if not scripts:
+                raise ValueError("Aucun script en échec à relancer.")
+
+            relance = ExecutionTest(configuration=origine.configuration, parent=origine, statut="pending")
+            relance.preparer_mise_en_file()
+            # Priorité effective : celle des scripts relancés
+            relance.priorite = (
+                Script.objects.filter(pk__in=scripts).aggregate(max_priorite=models.Max("priorite"))["max_priorite"]
+                or 2
+            )
+            # Le signal post_save ne crée pas de résultats pour une relance :
+            # ils sont créés ici, avant la validation de la transaction
+            relance.save()
+            ExecutionResult.objects.bulk_create([
+                ExecutionResult(execution=relance, script_id=script_id, statut="pending")
+                for script_id in scripts
+            ])
+        return relance
+
     @property
     def resultat_interprete(self):
         if self.statut == "done":
             return "Concluant"
         elif self.statut == "error":
             return "Non concluant"
+        elif self.statut == "timeout":
+            return "Non concluant (délai dépassé)"
         elif self.statut == "pending":
             return "En attente d'exécution"
         elif self.statut == "running":
@@ -485,6 +711,14 @@ class ExecutionResult(models.Model):
     statut = models.CharField(max_length=20, choices=ExecutionTest.STATUS_CHOICES)
     log_fichier = models.FileField(upload_to="logs/", null=True, blank=True)
     commentaire = models.TextField(blank=True)
+    # Début et fin du script : l'historique des durées sert à calculer son délai
+    started_at = models.DateTimeField(null=True, blank=True)
+    ended_at = models.DateTimeField(null=True, blank=True)
+    # Consommation du script : temps CPU en secondes (os.wait4, à sa fin) et
+    # pic de mémoire résidente en Ko (VmHWM relevé pendant son exécution)
+    cpu_utilisateur = models.FloatField(null=True, blank=True)
+    cpu_systeme = models.FloatField(null=True, blank=True)
+    rss_max_ko = models.PositiveIntegerField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.script.nom} - {self.get_statut_display()}"
@@ -495,6 +729,8 @@ class ExecutionResult(models.Model):
             return "Concluant"
         elif self.statut == "error":
             return "Non concluant"
+        elif self.statut == "timeout":
+            return "Non concluant (délai dépassé)"
         elif self.statut == "pending":
             return "En attente"
         elif self.statut == "running":
@@ -504,6 +740,130 @@ class ExecutionResult(models.Model):
     class Meta:
         verbose_name = "Résultat d'exécution de script"
         verbose_name_plural = "Résultats des scripts"
+        indexes = [
+            models.Index(fields=["script", "statut"], name="core_result_script_statut_idx"),
+        ]
+
+
+class EtapeResultat(models.Model):
+    """Étape ou vérification rapportée par un script (core/snapflow_resultats.py)."""
+
+    TYPE_CHOICES = [
+        ("etape", "Étape"),
+        ("assertion", "Vérification"),
+    ]
+    STATUT_CHOICES = [
+        ("done", "Concluant"),
+        ("error", "Non concluant"),
+    ]
+    resultat = models.ForeignKey(
+        ExecutionResult, on_delete=models.CASCADE, related_name="etapes"
+    )
+    ordre = models.PositiveIntegerField()
+    type = models.CharField(max_length=20, choices=TYPE_CHOICES, default="etape")
+    nom = models.CharField(max_length=255)
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES)
+    duree = models.FloatField(null=True, blank=True, help_text="Durée en secondes")
+    message = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"{self.nom} - {self.get_statut_display()}"
+
+    class Meta:
+        verbose_name = "Étape de script"
+        verbose_name_plural = "Étapes des scripts"
+        ordering = ["resultat", "ordre"]
+        indexes = [
+            models.Index(fields=["statut", "nom"], name="core_etape_statut_nom_idx"),
+        ]
+
+
+class DeclenchementCoalesce(models.Model):
+    """
+    Déclenchement planifié qui n'a pas donné lieu à une nouvelle exécution
+    (ou en a remplacé une) parce que l'exécution précédente de la
+    configuration n'était pas terminée.
+    """
+
+    ACTION_CHOICES = [
+        ("ignore", "Ignoré (exécution en cours)"),
+        ("fusionne", "Fusionné avec l'exécution en attente"),
+        ("remplace", "Exécution en attente remplacée"),
+    ]
+    configuration = models.ForeignKey(
+        ConfigurationTest, on_delete=models.CASCADE, related_name="declenchements_coalesces"
+    )
+    date_prevue = models.DateTimeField()
+    politique = models.CharField(
+        max_length=10, choices=ConfigurationTest.POLITIQUE_CHEVAUCHEMENT_CHOICES
+    )
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    # Exécution qui a absorbé le déclenchement (ou qui a été remplacée)
+    execution = models.ForeignKey(
+        ExecutionTest, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+
+    def __str__(self):
+        return f"{self.configuration.nom} - {self.date_prevue} - {self.get_action_display()}"
+
+    class Meta:
+        verbose_name = "Déclenchement coalescé"
+        verbose_name_plural = "Déclenchements coalescés"
+        indexes = [
+            models.Index(fields=["configuration", "date_prevue"], name="core_declench_config_date_idx"),
+        ]
+
+
+class AgentExecution(models.Model):
+    """Agent d'exécution (manage.py snapflow_agent), local ou sur une autre machine."""
+
+    nom = models.CharField(max_length=255, unique=True)
+    hote = models.CharField(max_length=255)
+    pid = models.PositiveIntegerField(null=True, blank=True)
+    concurrence = models.PositiveSmallIntegerField(default=1)
+    executions_en_cours = models.PositiveSmallIntegerField(default=0)
+    demarre_le = models.DateTimeField()
+    dernier_battement = models.DateTimeField()
+    arrete_le = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.nom
+
+    @property
+    def en_ligne(self):
+        """Non arrêté, et dernier battement plus récent que la durée d'un bail."""
+        bail = timedelta(seconds=getattr(settings, "SNAPFLOW_EXECUTION_LEASE", 600))
+        return self.arrete_le is None and timezone.now() - self.dernier_battement < bail
+
+    class Meta:
+        verbose_name = "Agent d'exécution"
+        verbose_name_plural = "Agents d'exécution"
+        ordering = ["-dernier_battement"]
+
+
+class BailPlanificateur(models.Model):
+    """
+    Bail du planificateur : seul le processus web titulaire d'un bail non
+    expiré crée les exécutions périodiques. Il le prolonge régulièrement ;
+    s'il s'arrête, un autre processus web le reprend à son expiration
+    (voir core/scheduler.py).
+    """
+
+    nom = models.CharField(max_length=50, unique=True)
+    titulaire = models.CharField(max_length=255, blank=True)
+    acquis_le = models.DateTimeField(null=True, blank=True)
+    expire_le = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.nom} - {self.titulaire or 'libre'}"
+
+    @property
+    def actif(self):
+        return bool(self.titulaire) and self.expire_le is not None and self.expire_le > timezone.now()
+
+    class Meta:
+        verbose_name = "Bail du planificateur"
+        verbose_name_plural = "Baux du planificateur"
 
 
 class TicketRedmine:
@@ -0,0 +1,83 @@
+# core/moteur_async.py
+"""
+Moteur 'asyncio' des workers (SNAPFLOW_RUNNER_ENGINE = 'asyncio').
+
+Une boucle d'événements mène toutes les exécutions réservées par le worker
+et supervise leurs scripts (core/executeur_async.py), sans thread par
+exécution ni par script. Les accès à la base (réservation, résultats, état
+final, entretien des baux) passent par un seul thread d'écriture, donc une
+seule connexion, quel que soit le nombre d'exécutions en cours. Les
+opérations en base sont celles du moteur 'threads' (DeroulementExecution).
+"""
+import asyncio
+import functools
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from .execution_queue import liberer_execution, reserver_execution
+from .executeur_async import executer_scripts_async
+from .runner import DeroulementExecution, chemin_script_local
+
+
+def get_moteur_runner():
+    """'threads' (un thread par exécution et par script) ou 'asyncio'."""
+    return getattr(settings, "SNAPFLOW_RUNNER_ENGINE", "threads")
+
+
+class MoteurAsync:
+    """Exécutions d'un worker menées dans la boucle d'événements courante."""
+
+    def __init__(self, worker_id, scripts_max=None):
+        self.worker_id = worker_id
+        self.ecrivain = ThreadPoolExecutor(max_workers=1, thread_name_prefix="base")
+        self.semaphore = asyncio.Semaphore(
+            scripts_max or getattr(settings, "SNAPFLOW_RUNNER_SCRIPTS_MAX", 200)
+        )
+
+    async def base(self, fonction, *args, **kwargs):
+        """Exécute `fonction` dans le thread d'écriture (seul à utiliser la base)."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self.ecrivain, functools.partial(fonction, *args, **kwargs)
+        )
+
+    async def reserver(self, immediates_seulement=False):
+        def reserver():
+            close_old_connections()
+            return reserver_execution(self.worker_id, immediates_seulement)
+
+        return await self.base(reserver)
+
+    async def executer(self, execution_id, notifier=True, chemin_script=chemin_script_local):
+        """Équivalent de lancer_scripts_pour_execution(), puis libération du bail."""
+        try:
+            deroulement = await self.base(DeroulementExecution, execution_id, chemin_script, notifier)
+            try:
+                parametres = await self.base(deroulement.preparer)
+                async for index, resultat in executer_scripts_async(
+                    parametres["chemins"],
+                    parametres["concurrence"],
+                    chemins_log=parametres["chemins_log"],
+                    env=parametres["env"],
+                    timeouts=parametres["timeouts"],
+                    limites=parametres["limites"],
+                    semaphore=self.semaphore,
+                ):
+                    await self.base(deroulement.enregistrer, index, resultat)
+            except Exception:
+                # La trace est prise ici : le thread d'écriture n'a pas d'exception en cours
+                await self.base(deroulement.echouer, traceback.format_exc())
+            await self.base(deroulement.terminer)
+        finally:
+            await self.base(liberer_execution, execution_id, self.worker_id)
+
+    async def fermer(self):
+        def fermer_connexion():
+            # `connection` est propre à chaque thread : résolue ici, dans le
+            # thread d'écriture, et non dans celui de la boucle d'événements
+            connection.close()
+
+        await self.base(fermer_connexion)
+        self.ecrivain.shutdown()
@@ -1,4 +1,7 @@
 # core/permissions.py
+import hmac
+
+from django.conf import settings
 from rest_framework import permissions
 
 class IsSuperAdmin(permissions.BasePermission):
@@ -14,4 +17,15 @@ class IsSuperAdmin(permissions.BasePermission):
                 (hasattr(request.user, 'groupe_personnalise') and 
                  request.user.groupe_personnalise.role_predefini == 'super-admin')
             )
-        )
\ No newline at end of file
+        )
+
+
+class IsAgentExecution(permissions.BasePermission):
+    """
+    Vérifie que la requête vient d'un agent d'exécution :
+    en-tête « Authorization: Agent <SNAPFLOW_AGENT_TOKEN> »
+    """
+    def has_permission(self, request, view):
+        jeton = getattr(settings, "SNAPFLOW_AGENT_TOKEN", "")
+        entete = request.headers.get("Authorization", "")
+        return bool(jeton) and hmac.compare_digest(entete.encode(), f"Agent {jeton}".encode())
@@ -0,0 +1,243 @@
+# core/planificateur.py
+"""
+Planificateur des exécutions périodiques, piloté par les échéances.
+
+Un tas (min-heap) garde la prochaine échéance de chaque configuration
+active (voir echeances.echeance_planifiee). Le thread du planificateur dort
+jusqu'à l'échéance la plus proche, déclenche en un lot les seules
+configurations dues (jobs.traiter_configurations) puis les replace dans le
+tas : un tour coûte O(log n) par configuration due au lieu d'un balayage
+de toutes les configurations chaque minute, et une exécution démarre à
+quelques secondes de son échéance.
+
+Le planificateur est réveillé :
+- par signaler(), appelé après l'enregistrement ou la suppression d'une
+  configuration dans ce processus (core/signals.py) ;
+- au plus tard toutes les SNAPFLOW_PLANIFICATEUR_VEILLE_MAX secondes, pour
+  relire les configurations modifiées par un autre processus
+  (date_modification).
+Les entrées du tas devenues obsolètes ne sont pas retirées : elles sont
+ignorées quand elles sortent du tas (échéance différente de celle
+retenue pour la configuration).
+"""
+import heapq
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from core.echeances import echeance_planifiee
+from core.jobs import traiter_configurations
+from core.models import ConfigurationTest
+
+logger = logging.getLogger(__name__)
+
+CHAMPS_ECHEANCE = (
+    "id", "last_execution", "periodicite", "date_activation", "date_desactivation", "is_active",
+)
+# Une modification enregistrée dans une transaction plus longue peut porter une
+# date_modification antérieure au tour précédent : on relit avec cette marge
+MARGE_RELECTURE = timedelta(seconds=60)
+# Configurations déclenchées par transaction (execution_queue.declencher_executions)
+TAILLE_LOT = 500
+
+
+def get_veille_max():
+    return getattr(settings, "SNAPFLOW_PLANIFICATEUR_VEILLE_MAX", 15)
+
+
+class Planificateur:
+    def __init__(self):
+        self.tas = []  # (échéance, configuration_id)
+        self.echeances = {}  # configuration_id -> échéance retenue
+        self.a_revoir = set()  # configurations signalées depuis le dernier tour
+        self.verrou = threading.Lock()
+        self.reveil = threading.Event()
+        self.arret = threading.Event()
+        self.thread = None
+        self.derniere_relecture = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def demarrer(self):
+        if self.running:
+            return
+        self.arret.clear()
+        # Après une interruption (bail perdu puis repris), le tas est reconstruit
+        self.derniere_relecture = None
+        self.thread = threading.Thread(target=self.boucle, name="planificateur", daemon=True)
+        self.thread.start()
+
+    def arreter(self, timeout=10):
+        self.arret.set()
+        self.reveil.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def signaler(self, configuration_ids):
+        """Fait recalculer l'échéance de ces configurations au prochain tour, tout de suite."""
+        with self.verrou:
+            self.a_revoir.update(configuration_ids)
+        self.reveil.set()
+
+    def prochaine_echeance(self):
+        with self.verrou:
+            self.nettoyer_sommet()
+            return self.tas[0][0] if self.tas else None
+
+    # Boucle du thread
+
+    def boucle(self):
+        try:
+            while not self.arret.is_set():
+                try:
+                    if self.derniere_relecture is None:
+                        self.reconstruire()
+                    self.tour()
+                except Exception as e:
+                    logger.error(f"❌ Erreur du planificateur: {e}", exc_info=True)
+                    print(f"❌ Erreur du planificateur: {e}")
+                self.reveil.wait(self.attente())
+                self.reveil.clear()
+        finally:
+            connection.close()
+
+    def attente(self):
+        """Secondes avant la prochaine échéance, bornées par SNAPFLOW_PLANIFICATEUR_VEILLE_MAX."""
+        veille_max = get_veille_max()
+        prochaine = self.prochaine_echeance()
+        if prochaine is None:
+            return veille_max
+        return min(veille_max, max(0.0, (prochaine - timezone.now()).total_seconds()))
+
+    def reconstruire(self):
+        """Charge l'échéance de toutes les configurations actives (une requête, tas construit en O(n))."""
+        close_old_connections()
+        maintenant = timezone.now()
+        lignes = ConfigurationTest.objects.filter(is_active=True).values_list(*CHAMPS_ECHEANCE)
+        echeances = {}
+        for configuration_id, *champs in lignes.iterator(chunk_size=2000):
+            echeance = echeance_planifiee(*champs, maintenant=maintenant)
+            if echeance is not None:
+                echeances[configuration_id] = echeance
+        with self.verrou:
+            self.echeances = echeances
+            self.tas = [(echeance, configuration_id) for configuration_id, echeance in echeances.items()]
+            heapq.heapify(self.tas)
+        self.derniere_relecture = maintenant
+        logger.info(f"🗓️ Planificateur : {len(echeances)} configuration(s) planifiée(s)")
+        print(f"🗓️ Planificateur : {len(echeances)} configuration(s) planifiée(s)")
+
+    def tour(self):
+        close_old_connections()
+        self.relire_modifiees()
+        with self.verrou:
+            a_revoir, self.a_revoir = self.a_revoir, set()
+        if a_revoir:
+            self.replanifier(a_revoir)
+
+        maintenant = timezone.now()
+        dues = []
+        with self.verrou:
+            while True:
+                self.nettoyer_sommet()
+                if not self.tas or self.tas[0][0] > maintenant:
+                    break
+                _, configuration_id = heapq.heappop(self.tas)
+                del self.echeances[configuration_id]
+                dues.append(configuration_id)
+        for debut in range(0, len(dues), TAILLE_LOT):
+            if self.arret.is_set():
+                # Les configurations non traitées seront relues au prochain démarrage
+                break
+            self.declencher(dues[debut:debut + TAILLE_LOT], maintenant)
+
+    def declencher(self, configuration_ids, maintenant):
+        """Traite un lot de configurations arrivées à échéance, puis les replace dans le tas."""
+        configurations = []
+        for config in ConfigurationTest.objects.filter(pk__in=configuration_ids):
+            echeance = echeance_planifiee(
+                config.last_execution, config.periodicite, config.date_activation,
+                config.date_desactivation, config.is_active, maintenant=maintenant,
+            )
+            # Le tas peut être en retard sur la base (modification pas encore relue)
+            if echeance is not None and echeance <= maintenant:
+                configurations.append(config)
+        try:
+            traiter_configurations(configurations, maintenant)
+        except Exception as e:
+            logger.error(f"❌ Déclenchement de {len(configurations)} configuration(s) en erreur: {e}", exc_info=True)
+            print(f"❌ Déclenchement de {len(configurations)} configuration(s) en erreur: {e}")
+            # Nouvel essai après une veille plutôt qu'en boucle
+            for configuration_id in configuration_ids:
+                self.planifier(configuration_id, maintenant + timedelta(seconds=get_veille_max()))
+            return
+        self.replanifier(configuration_ids)
+
+    def relire_modifiees(self):
+        """Replanifie les configurations modifiées (date_modification) depuis le tour précédent."""
+        maintenant = timezone.now()
+        lignes = ConfigurationTest.objects.filter(
+            date_modification__gte=self.derniere_relecture - MARGE_RELECTURE
+        ).values_list(*CHAMPS_ECHEANCE)
+        for configuration_id, *champs in lignes:
+            self.planifier(configuration_id, echeance_planifiee(*champs, maintenant=maintenant))
+        self.derniere_relecture = maintenant
+
+    def replanifier(self, configuration_ids):
+        """Recalcule depuis la base l'échéance de ces configurations ; les supprimées sortent du tas."""
+        maintenant = timezone.now()
+        restantes = set(configuration_ids)
+        lignes = ConfigurationTest.objects.filter(pk__in=restantes).values_list(*CHAMPS_ECHEANCE)
+        for configuration_id, *champs in lignes:
+            restantes.discard(configuration_id)
+            self.planifier(configuration_id, echeance_planifiee(*champs, maintenant=maintenant))
+        for configuration_id in restantes:
+            self.planifier(configuration_id, None)
+
+    def planifier(self, configuration_id, echeance):
+        with self.verrou:
+            if self.echeances.get(configuration_id) == echeance:
+                return
+            if echeance is None:
+                del self.echeances[configuration_id]
+                return
+            self.echeances[configuration_id] = echeance
+            heapq.heappush(self.tas, (echeance, configuration_id))
+            # Trop d'entrées obsolètes : on reconstruit le tas depuis les échéances retenues
+            if len(self.tas) > 2 * len(self.echeances) + 1000:
+                self.tas = [(e, c) for c, e in self.echeances.items()]
+                heapq.heapify(self.tas)
+
+    def nettoyer_sommet(self):
+        """Retire du sommet du tas les entrées obsolètes (appelé sous le verrou)."""
+        while self.tas and self.echeances.get(self.tas[0][1]) != self.tas[0][0]:
+            heapq.heappop(self.tas)
+
+    def statut(self):
+        prochaine = self.prochaine_echeance()
+        return {
+            "running": self.running,
+            "configurations": len(self.echeances),
+            "prochaine_echeance": str(prochaine) if prochaine else None,
+        }
+
+
+planificateur = Planificateur()
+
+
+def signaler_configurations(configuration_ids):
+    """
+    Réveille le planificateur de ce processus pour ces configurations, après
+    validation de la transaction en cours. Sans effet s'il n'est pas démarré
+    ici : un planificateur d'un autre processus relit date_modification.
+    """
+    if not planificateur.running:
+        return
+    configuration_ids = list(configuration_ids)
+    transaction.on_commit(lambda: planificateur.signaler(configuration_ids))
@@ -0,0 +1,227 @@
+# core/pool_navigateurs.py
+"""
+Pool de sessions WebDriver partagées entre les scripts.
+
+Le lancement du navigateur domine la durée des scripts courts : le runner
+peut donc garder quelques sessions ouvertes et en confier une à chaque
+script. La session est transmise par variables d'environnement
+(SNAPFLOW_WEBDRIVER_URL, SNAPFLOW_WEBDRIVER_SESSION) ; le script s'y
+rattache avec core.snapflow_navigateur.obtenir_driver().
+
+Après chaque script la session est réinitialisée (cookies, onglets, page
+vierge). Elle est recyclée (navigateur fermé) après `utilisations_max`
+scripts ou dès qu'un script échoue.
+
+Ce module ne dépend pas de Django ; selenium n'est importé que par
+FabriqueChrome. FabriqueFactice permet d'utiliser le pool sans navigateur.
+"""
+import threading
+import time
+import uuid
+
+VARIABLE_URL = "SNAPFLOW_WEBDRIVER_URL"
+VARIABLE_SESSION = "SNAPFLOW_WEBDRIVER_SESSION"
+
+
+class SessionNavigateur:
+    """Un driver ouvert et le nombre de scripts qui l'ont utilisé."""
+
+    def __init__(self, driver, url):
+        self.driver = driver
+        self.url = url
+        self.utilisations = 0
+        self.creee_le = time.monotonic()
+
+    @property
+    def session_id(self):
+        return self.driver.session_id
+
+    def variables_environnement(self):
+        return {VARIABLE_URL: self.url, VARIABLE_SESSION: self.session_id}
+
+
+class FabriqueChrome:
+    """Démarre un Chrome (headless par défaut) piloté par chromedriver."""
+
+    def __init__(self, headless=True, arguments=()):
+        self.headless = headless
+        self.arguments = tuple(arguments)
+
+    def creer(self):
+        from selenium import webdriver
+
+        options = webdriver.ChromeOptions()
+        if self.headless:
+            options.add_argument("--headless=new")
+        for argument in self.arguments:
+            options.add_argument(argument)
+        driver = webdriver.Chrome(options=options)
+        return SessionNavigateur(driver, url_executeur(driver))
+
+    def reinitialiser(self, session):
+        driver = session.driver
+        poignees = driver.window_handles
+        for poignee in poignees[1:]:
+            driver.switch_to.window(poignee)
+            driver.close()
+        driver.switch_to.window(poignees[0])
+        try:
+            # Tous les cookies, pas seulement ceux du domaine courant
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        except Exception:
+            driver.delete_all_cookies()
+        driver.get("about:blank")
+
+    def detruire(self, session):
+        session.driver.quit()
+
+
+class FauxDriver:
+    """Driver factice : mêmes méthodes que celles utilisées par le pool."""
+
+    def __init__(self):
+        self.session_id = uuid.uuid4().hex
+        self.window_handles = ["principal"]
+        self.cookies = {}
+        self.url_courante = "about:blank"
+        self.ferme = False
+
+    def get(self, url):
+        self.url_courante = url
+
+    def delete_all_cookies(self):
+        self.cookies.clear()
+
+    def quit(self):
+        self.ferme = True
+
+
+class FabriqueFactice:
+    """Fabrique sans navigateur, pour vérifier la logique du pool."""
+
+    def __init__(self, echec_reinitialisation=False):
+        self.echec_reinitialisation = echec_reinitialisation
+        self.creees = 0
+        self.detruites = 0
+
+    def creer(self):
+        self.creees += 1
+        return SessionNavigateur(FauxDriver(), "http://127.0.0.1:0")
+
+    def reinitialiser(self, session):
+        if self.echec_reinitialisation:
+            raise RuntimeError("Réinitialisation impossible")
+        session.driver.delete_all_cookies()
+        session.driver.get("about:blank")
+
+    def detruire(self, session):
+        self.detruites += 1
+        session.driver.quit()
+
+
+class PoolNavigateurs:
+    """
+    Au plus `taille_max` sessions ouvertes. acquerir() rend une session
+    libre, en crée une si le plafond n'est pas atteint, sinon attend qu'une
+    session soit rendue ou fermée.
+    """
+
+    def __init__(self, fabrique, taille_max=2, utilisations_max=20):
+        self.fabrique = fabrique
+        self.taille_max = taille_max
+        self.utilisations_max = utilisations_max
+        self._libres = []  # pile : la session la plus récente d'abord
+        self._ouvertes = 0
+        self._condition = threading.Condition()
+
+    @property
+    def ouvertes(self):
+        return self._ouvertes
+
+    def acquerir(self, timeout=None):
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                if self._libres:
+                    return self._libres.pop()
+                if self._ouvertes < self.taille_max:
+                    self._ouvertes += 1
+                    break
+                reste = None if limite is None else limite - time.monotonic()
+                if reste is not None and reste <= 0:
+                    raise TimeoutError("Aucune session navigateur disponible")
+                self._condition.wait(reste)
+        try:
+            return self.fabrique.creer()
+        except Exception:
+            self._liberer_place()
+            raise
+
+    def liberer(self, session, echec=False):
+        session.utilisations += 1
+        if echec or session.utilisations >= self.utilisations_max:
+            self._detruire(session)
+            return
+        try:
+            self.fabrique.reinitialiser(session)
+        except Exception:
+            self._detruire(session)
+            return
+        with self._condition:
+            self._libres.append(session)
+            self._condition.notify()
+
+    def _detruire(self, session):
+        try:
+            self.fabrique.detruire(session)
+        except Exception:
+            pass
+        finally:
+            self._liberer_place()
+
+    def _liberer_place(self):
+        with self._condition:
+            self._ouvertes -= 1
+            self._condition.notify()
+
+    def fermer(self):
+        with self._condition:
+            sessions, self._libres = self._libres, []
+        for session in sessions:
+            self._detruire(session)
+
+
+def url_executeur(driver):
+    """Adresse du serveur WebDriver (chromedriver) d'un driver Selenium 4."""
+    executeur = driver.command_executor
+    config = getattr(executeur, "_client_config", None)
+    if config is not None:
+        return config.remote_server_addr
+    return executeur._url
+
+
+_pools = {}
+_pools_verrou = threading.Lock()
+
+
+def get_pool_navigateurs(configuration):
+    """
+    Pool partagé par le processus, construit depuis un dict de configuration :
+    {'active': bool, 'taille_max': int, 'utilisations_max': int,
+     'headless': bool, 'factice': bool}. Retourne None si désactivé.
+    """
+    if not configuration or not configuration.get("active"):
+        return None
+    cle = tuple(sorted(configuration.items()))
+    with _pools_verrou:
+        if cle not in _pools:
+            if configuration.get("factice"):
+                fabrique = FabriqueFactice()
+            else:
+                fabrique = FabriqueChrome(headless=configuration.get("headless", True))
+            _pools[cle] = PoolNavigateurs(
+                fabrique,
+                taille_max=configuration.get("taille_max", 2),
+                utilisations_max=configuration.get("utilisations_max", 20),
+            )
+        return _pools[cle]
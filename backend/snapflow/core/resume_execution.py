@@ -0,0 +1,161 @@
+# core/resume_execution.py
+"""
+Résumé structuré d'une exécution (ExecutionTest.resume).
+
+Pour chaque script : statut, durée, code de retour, premières lignes
+d'erreur, étapes en échec et, pour les scripts en échec, une fin de sortie
+de taille bornée. Les sorties complètes restent dans les fichiers de log,
+référencés par leur chemin. Chaque entrée a une taille bornée : le rapport
+texte, la description des tickets Redmine et les e-mails sont construits à
+partir du résumé, en un temps proportionnel à sa taille.
+
+Ce module ne dépend pas de Django.
+"""
+
+TAILLE_LIGNE = 300  # caractères conservés par ligne d'erreur ou message
+TAILLE_FIN = 1500  # caractères de fin de sortie conservés par script en échec
+ETAPES_EN_ECHEC_MAX = 10
+ECHECS_DETAILLES = 20  # au-delà, les scripts en échec n'ont plus de fin de sortie
+LIGNES_EMAIL = 20  # scripts en échec cités dans l'e-mail
+
+STATUTS_ECHEC = ("error", "timeout")
+
+
+def tronquer(texte, taille=TAILLE_LIGNE):
+    texte = str(texte)
+    return texte if len(texte) <= taille else texte[: taille - 1] + "…"
+
+
+def fin_de_texte(texte, taille=TAILLE_FIN):
+    """Dernières lignes entières de `texte` tenant en `taille` caractères."""
+    texte = texte.rstrip("\n")
+    if len(texte) <= taille:
+        return texte
+    fin = texte[-taille:]
+    coupure = fin.find("\n")
+    return "[…]\n" + (fin[coupure + 1:] if coupure != -1 else fin)
+
+
+def nouveau_resume(projet, log=None):
+    return {"projet": projet, "log": log, "compteurs": {}, "scripts": [], "erreur": None}
+
+
+def resume_script(script_id, nom, statut, resultat, log=None):
+    """Entrée du résumé pour un script, à partir du dict de résultat de core/executeur.py."""
+    erreurs = []
+    if resultat.get("timeout_depasse"):
+        erreurs.append(f"Délai dépassé ({resultat['timeout']:.0f} s) : le script et ses processus fils ont été arrêtés")
+    elif resultat.get("exception") is not None:
+        erreurs.append(f"Erreur pendant l'exécution du script : {resultat['exception']}")
+    erreurs.extend(resultat.get("premieres_erreurs", ()))
+
+    entree = {
+        "id": script_id,
+        "nom": nom,
+        "statut": statut,
+        "duree": round(resultat["duree"], 1) if resultat.get("duree") is not None else None,
+        "code": resultat.get("returncode"),
+        "log": log,
+    }
+    if statut in STATUTS_ECHEC:
+        entree["erreurs"] = [tronquer(ligne) for ligne in erreurs]
+        entree["etapes_en_echec"] = [
+            tronquer(e.get("nom"), 100) for e in resultat.get("etapes", ()) if e.get("statut") != "done"
+        ][:ETAPES_EN_ECHEC_MAX]
+        statut_final = resultat.get("statut_final") or {}
+        if statut_final.get("message"):
+            entree["message"] = tronquer(statut_final["message"])
+        sortie = resultat.get("stderr") or resultat.get("stdout") or ""
+        entree["fin"] = fin_de_texte(sortie)
+    return entree
+
+
+def ajouter_script(resume, entree):
+    """Ajoute l'entrée d'un script ; seuls les ECHECS_DETAILLES premiers échecs gardent leur fin de sortie."""
+    compteurs = resume["compteurs"]
+    compteurs[entree["statut"]] = compteurs.get(entree["statut"], 0) + 1
+    if "fin" in entree and sum(compteurs.get(s, 0) for s in STATUTS_ECHEC) > ECHECS_DETAILLES:
+        entree.pop("fin")
+    resume["scripts"].append(entree)
+    return entree
+
+
+def noter_erreur(resume, trace):
+    """Exception hors d'un script : seule la fin de la trace est conservée."""
+    resume["erreur"] = fin_de_texte(trace)
+
+
+def texte_compteurs(resume):
+    return ", ".join(f"{nombre} {statut}" for statut, nombre in sorted(resume["compteurs"].items())) or "aucun script"
+
+
+def texte_script(entree, fin=None):
+    """Lignes d'un script dans le rapport et les tickets ; `fin` remplace une fin de sortie non conservée."""
+    duree = f"{entree['duree']} s" if entree["duree"] is not None else "durée inconnue"
+    lignes = [f"{'✅' if entree['statut'] == 'done' else '❌'} {entree['nom']} : {entree['statut']} ({duree})"]
+    if entree["statut"] in STATUTS_ECHEC and entree["code"] is not None:
+        lignes.append(f"   Code de retour : {entree['code']}")
+    for erreur in entree.get("erreurs", ()):
+        lignes.append(f"   {erreur}")
+    if entree.get("etapes_en_echec"):
+        lignes.append("   Étapes en échec : " + ", ".join(entree["etapes_en_echec"]))
+    if entree.get("message"):
+        lignes.append(f"   Statut rapporté par le script : {entree['message']}")
+    fin = entree.get("fin") or fin
+    if fin:
+        lignes.append("   Fin de la sortie :")
+        lignes.extend(f"   | {ligne}" for ligne in fin.split("\n"))
+    if entree.get("ticket"):
+        lignes.append(f"   Ticket Redmine : #{entree['ticket']}")
+    if entree["statut"] in STATUTS_ECHEC and entree.get("log"):
+        lignes.append(f"   Log complet : {entree['log']}")
+    return lignes
+
+
+def texte_rapport(resume):
+    """Rapport texte (ExecutionTest.rapport, PDF) construit à partir du résumé."""
+    lignes = [f"=== Projet : {resume['projet']} ===", f"Scripts : {texte_compteurs(resume)}", ""]
+    for entree in resume["scripts"]:
+        lignes.extend(texte_script(entree))
+    if resume["erreur"]:
+        lignes.extend(["", "❌ Exception globale :", resume["erreur"]])
+    if resume["log"]:
+        lignes.extend(["", f"Log complet de l'exécution : {resume['log']}"])
+    return "\n".join(lignes)
+
+
+def description_ticket(resume, entree, fin=None):
+    """
+    Description d'un ticket Redmine : le script en échec (avec `fin`, sa fin
+    de sortie si le résumé ne la garde pas) et l'état de l'exécution à cet
+    instant.
+    """
+    lignes = [f"Le script '{entree['nom']}' a échoué avec le code {entree['code'] if entree['code'] is not None else 'N/A'}.", ""]
+    lignes.extend(texte_script(entree, fin))
+    lignes.extend(["", f"Projet : {resume['projet']}", f"Scripts exécutés jusqu'ici : {texte_compteurs(resume)}"])
+    if resume["log"]:
+        lignes.append(f"Log complet de l'exécution : {resume['log']}")
+    return "\n".join(lignes)
+
+
+def message_email(nom_configuration, statut, resume):
+    """Corps de l'e-mail de fin d'exécution : compteurs et premiers scripts en échec."""
+    lignes = [
+        f"Le test '{nom_configuration}' est terminé.",
+        f"Statut : {statut}",
+        f"Scripts : {texte_compteurs(resume)}",
+    ]
+    echecs = [entree for entree in resume["scripts"] if entree["statut"] in STATUTS_ECHEC]
+    if echecs:
+        lignes.extend(["", "Scripts en échec :"])
+        for entree in echecs[:LIGNES_EMAIL]:
+            premiere = (entree.get("erreurs") or [""])[0]
+            ticket = f" (ticket #{entree['ticket']})" if entree.get("ticket") else ""
+            lignes.append(f"- {entree['nom']} : {entree['statut']}{ticket}" + (f" — {premiere}" if premiere else ""))
+        if len(echecs) > LIGNES_EMAIL:
+            lignes.append(f"- … et {len(echecs) - LIGNES_EMAIL} autre(s)")
+    if resume["erreur"]:
+        lignes.extend(["", "Exception globale :", tronquer(resume["erreur"].rsplit("\n", 1)[-1])])
+    if resume["log"]:
+        lignes.extend(["", f"Log complet : {resume['log']}"])
+    return "\n".join(lignes)
@@ -1,14 +1,29 @@
 # core/runner.py
 import json
-import subprocess
 import os
-import sys
+import time
 import traceback
+from collections import defaultdict
 from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
 from django.utils.timezone import now
 from django.core.mail import send_mail
 import requests
 from .models import *
+from .executeur import executer_scripts, statut_depuis_resultat, timeout_adaptatif
+from .hote_scripts import get_pool_hotes
+from .pool_navigateurs import get_pool_navigateurs
+from .resume_execution import (
+    ajouter_script,
+    description_ticket,
+    message_email,
+    noter_erreur,
+    nouveau_resume,
+    resume_script,
+    texte_rapport,
+)
 
 def get_global_config():
     try:
@@ -65,6 +80,119 @@ def creer_ticket_redmine(projet_id, sujet, description, priority_id=2):
         raise
 
 
+def timeouts_scripts(scripts):
+    """
+    Délai de chaque script (même ordre que `scripts`), calculé d'après les
+    durées de ses dernières exécutions réussies (settings.SNAPFLOW_TIMEOUTS).
+    """
+    reglages = getattr(settings, "SNAPFLOW_TIMEOUTS", {})
+    historique = reglages.get("historique", 50)
+
+    # Une seule requête pour tous les scripts de l'exécution ; la fenêtre est
+    # limitée par script (ROW_NUMBER par script_id) : un script fréquent
+    # n'évince pas l'historique des autres
+    durees = defaultdict(list)
+    lignes = (
+        ExecutionResult.objects.filter(
+            script__in=scripts,
+            statut="done",
+            started_at__isnull=False,
+            ended_at__isnull=False,
+        )
+        .annotate(rang=Window(RowNumber(), partition_by=F("script_id"), order_by=F("id").desc()))
+        .filter(rang__lte=historique)
+        .values_list("script_id", "started_at", "ended_at")
+    )
+    for script_id, debut, fin in lignes:
+        durees[script_id].append((fin - debut).total_seconds())
+
+    return [
+        timeout_adaptatif(
+            durees[script.id],
+            facteur=reglages.get("facteur", 3.0),
+            plancher=reglages.get("plancher", 30),
+            plafond=reglages.get("plafond", 300),
+            echantillons_min=reglages.get("echantillons_min", 5),
+        )
+        for script in scripts
+    ]
+
+
+def etapes_depuis_resultat(execution_result, resultat):
+    """Lignes EtapeResultat (non enregistrées) pour les messages d'étape d'un script."""
+    etapes = []
+    for ordre, message in enumerate(resultat["etapes"]):
+        duree = message.get("duree")
+        etapes.append(EtapeResultat(
+            resultat=execution_result,
+            ordre=ordre,
+            type="assertion" if message.get("type") == "assertion" else "etape",
+            nom=str(message.get("nom") or "Sans nom")[:255],
+            statut="done" if message.get("statut") == "done" else "error",
+            duree=duree if isinstance(duree, (int, float)) else None,
+            message=str(message.get("message") or "")[:2000],
+        ))
+    return etapes
+
+
+class EcrituresResultats:
+    """
+    Regroupe les mises à jour des ExecutionResult d'une exécution et leurs
+    étapes, écrites par lots (bulk_update / bulk_create) tous les
+    `taille_lot` scripts ou toutes les `intervalle` secondes, pour que
+    l'avancement reste visible sans une requête par script.
+    """
+
+    CHAMPS = ["statut", "log_fichier", "started_at", "ended_at", "cpu_utilisateur", "cpu_systeme", "rss_max_ko"]
+
+    def __init__(self, taille_lot=50, intervalle=5):
+        self.taille_lot = max(1, taille_lot)
+        self.intervalle = intervalle
+        self.resultats = []
+        self.etapes = []
+        self._dernier_envoi = time.monotonic()
+
+    def ajouter(self, execution_result, etapes=()):
+        self.resultats.append(execution_result)
+        self.etapes.extend(etapes)
+        if (
+            len(self.resultats) >= self.taille_lot
+            or time.monotonic() - self._dernier_envoi >= self.intervalle
+        ):
+            self.vider()
+
+    def vider(self):
+        if self.resultats:
+            with transaction.atomic():
+                ExecutionResult.objects.bulk_update(
+                    self.resultats, self.CHAMPS, batch_size=self.taille_lot
+                )
+                if self.etapes:
+                    EtapeResultat.objects.bulk_create(self.etapes, batch_size=500)
+        self.resultats = []
+        self.etapes = []
+        self._dernier_envoi = time.monotonic()
+
+
+def resultats_par_script(execution, scripts):
+    """
+    ExecutionResult de l'exécution, indexés par script. Les lignes sont
+    normalement créées par le signal post_save ; celles qui manquent (script
+    ajouté à la configuration entre-temps) sont créées en une requête.
+    """
+    resultats = {r.script_id: r for r in ExecutionResult.objects.filter(execution=execution)}
+    manquants = [
+        ExecutionResult(execution=execution, script=script, statut="pending")
+        for script in scripts
+        if script.id not in resultats
+    ]
+    if manquants:
+        ExecutionResult.objects.bulk_create(manquants)
+        # MySQL ne renvoie pas les clés créées par bulk_create : relecture
+        resultats = {r.script_id: r for r in ExecutionResult.objects.filter(execution=execution)}
+    return resultats
+
+
 from django.core.mail import EmailMessage, get_connection
 
 def notifier_utilisateurs(execution):
@@ -88,11 +216,14 @@ def notifier_utilisateurs(execution):
     )
 
     subject = f"Test terminé : {configuration.nom}"
-    message = (
-        f"Le test '{configuration.nom}' est terminé.\n"
-        f"Statut : {execution.statut}\n\n"
-        f"Rapport :\n{execution.rapport[:500]}..."
-    )
+    if execution.resume:
+        message = message_email(configuration.nom, execution.statut, execution.resume)
+    else:
+        message = (
+            f"Le test '{configuration.nom}' est terminé.\n"
+            f"Statut : {execution.statut}\n\n"
+            f"Rapport :\n{execution.rapport[:500]}..."
+        )
 
     email = EmailMessage(subject, message, config.email_host_user, destinataires, connection=connection)
     try:
@@ -102,109 +233,232 @@ def notifier_utilisateurs(execution):
         print(f"Erreur envoi email: {e}")
 
 
-def lancer_scripts_pour_execution(execution_id):
-    execution = ExecutionTest.objects.get(id=execution_id)
-    execution.statut = "running"
-    execution.started_at = now()
-    execution.save()
-
-    logs = []
-    erreur_detectee = False
-
-    try:
-        scripts = execution.configuration.scripts.all()
+def chemin_script_local(script):
+    """Fichier d'un script dans MEDIA_ROOT (workers sur la machine du serveur)."""
+    return os.path.join(settings.MEDIA_ROOT, script.fichier.name)
+
+
+class DeroulementExecution:
+    """
+    Opérations en base d'une exécution, communes aux moteurs 'threads'
+    (lancer_scripts_pour_execution) et 'asyncio' (core/moteur_async.py) :
+    démarrage, enregistrement du résultat de chaque script au fil de l'eau,
+    état final. Les scripts eux-mêmes sont lancés par le moteur.
+
+    Le log global de l'exécution est écrit au fil de l'eau ; en base ne sont
+    gardés que le résumé structuré (core/resume_execution.py) et le rapport
+    texte qui en est tiré, de taille bornée.
+    """
+
+    def __init__(self, execution_id, chemin_script=chemin_script_local, notifier=True):
+        # Une requête UPDATE plutôt qu'un save() : pas de signal post_save
+        instant = now()
+        ExecutionTest.objects.filter(pk=execution_id).update(
+            statut="running", started_at=instant, dernier_battement=instant
+        )
+        self.execution = ExecutionTest.objects.select_related("configuration__projet").get(pk=execution_id)
+        self.chemin_script = chemin_script
+        # Sans notification : ni ticket Redmine ni e-mail (tests, benchmarks)
+        self.notifier = notifier
+        self.erreur_detectee = False
+        self.log_global = f"logs/execution_{execution_id}.txt"
+        self._journal = None
+        self.resume = nouveau_resume(self.execution.configuration.projet.nom, self.log_global)
+        self.ecritures = EcrituresResultats(getattr(settings, "SNAPFLOW_RESULTATS_LOT", 50))
+
+    def preparer(self):
+        """
+        Charge les scripts et retourne les paramètres de leur exécution :
+        chemins, concurrence, chemins_log, env, timeouts, limites.
+        """
+        execution = self.execution
+        if execution.parent_id:
+            # Relance : les seuls scripts de ses résultats (en échec à l'origine)
+            scripts = list(Script.objects.filter(executionresult__execution=execution).order_by("id"))
+        else:
+            scripts = list(execution.configuration.scripts.all())
+        self.scripts = scripts
         projet = execution.configuration.projet
-        infos_projet = f"=== Projet : {projet.nom} ===\n\n"
-        id_redmine = projet.id_redmine
-
-        from core.models import ExecutionResult
-
-        for script in scripts:
-            path = os.path.join(settings.MEDIA_ROOT, script.fichier.name)
-            logs.append(f"Execution du script: {script.nom}\n")
-
+        self.journaliser(f"=== Projet : {projet.nom} ===\n")
+        self.id_redmine = projet.id_redmine
+
+        self.resultats = resultats_par_script(execution, scripts)
+        # Étapes d'une tentative précédente (exécution remise en file)
+        EtapeResultat.objects.filter(resultat__execution=execution).delete()
+
+        chemins = [self.chemin_script(script) for script in scripts]
+        concurrence = min(
+            max(1, execution.configuration.scripts_paralleles),
+            getattr(settings, "SNAPFLOW_MAX_SCRIPTS_PARALLELES", 8),
+        )
+
+        # Un fichier de log par script, alimenté pendant l'exécution
+        extension = ".log.gz" if getattr(settings, "SNAPFLOW_LOGS_COMPRESSES", True) else ".log"
+        self.logs_scripts = [
+            f"logs/execution_{execution.id}/script_{script.id}{extension}" for script in scripts
+        ]
+        chemins_log = [os.path.join(settings.MEDIA_ROOT, log) for log in self.logs_scripts]
+
+        # Les scripts peuvent importer core.snapflow_navigateur
+        env_scripts = {
+            "PYTHONPATH": os.pathsep.join(
+                filter(None, [str(settings.BASE_DIR), os.environ.get("PYTHONPATH")])
+            )
+        }
+
+        limites = {
+            cle: valeur
+            for cle, valeur in getattr(settings, "SNAPFLOW_SCRIPT_LIMITES", {}).items()
+            if valeur
+        }
+        return {
+            "chemins": chemins,
+            "concurrence": concurrence,
+            "chemins_log": chemins_log,
+            "env": env_scripts,
+            "timeouts": timeouts_scripts(scripts),
+            "limites": limites or None,
+        }
+
+    def journaliser(self, *lignes):
+        """Ajoute des lignes au log global de l'exécution (MEDIA_ROOT/logs/execution_<id>.txt)."""
+        if self._journal is None:
+            chemin = os.path.join(settings.MEDIA_ROOT, self.log_global)
+            os.makedirs(os.path.dirname(chemin), exist_ok=True)
+            self._journal = open(chemin, "w", encoding="utf-8")
+        for ligne in lignes:
+            self._journal.write(ligne + "\n")
+
+    def enregistrer(self, index, resultat):
+        """Traite le résultat du script `index` (log global, résumé, ExecutionResult, ticket Redmine)."""
+        execution = self.execution
+        script = self.scripts[index]
+        statut_resultat = statut_depuis_resultat(resultat)
+
+        # stdout / stderr ne contiennent que les dernières lignes ;
+        # la sortie complète est dans le log du script
+        self.journaliser(f"Execution du script: {script.nom}\n", resultat["stdout"])
+        if resultat["stderr"]:
+            self.journaliser("ERREUR:\n" + resultat["stderr"])
+        entree = resume_script(script.id, script.nom, statut_resultat, resultat, self.logs_scripts[index])
+        fin_sortie = entree.get("fin")
+        ajouter_script(self.resume, entree)
+        self.journaliser(*entree.get("erreurs", ()))
+        if entree.get("etapes_en_echec"):
+            self.journaliser("Étapes en échec : " + ", ".join(entree["etapes_en_echec"]))
+        if entree.get("message"):
+            self.journaliser(f"Statut rapporté par le script : {entree['message']}")
+
+        # ✅ Mise à jour de l'ExecutionResult (écrite par lots), avec les
+        # étapes rapportées sur le canal de résultats
+        execution_result = self.resultats[script.id]
+        execution_result.statut = statut_resultat
+        execution_result.log_fichier.name = self.logs_scripts[index]
+        execution_result.started_at = resultat["debut"]
+        execution_result.ended_at = resultat["fin"]
+        usage = resultat.get("usage") or {}
+        execution_result.cpu_utilisateur = usage.get("cpu_utilisateur")
+        execution_result.cpu_systeme = usage.get("cpu_systeme")
+        execution_result.rss_max_ko = usage.get("rss_max_ko")
+        self.ecritures.ajouter(execution_result, etapes_depuis_resultat(execution_result, resultat))
+
+        # ✅ Si erreur (ou délai dépassé), créer un ticket Redmine
+        if statut_resultat in ("error", "timeout"):
+            self.erreur_detectee = True
+            if not self.notifier:
+                return
             try:
-                venv_python = sys.executable  # Python actuellement utilisé (celui du venv)
-                result = subprocess.run(
-                    [venv_python, path],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    timeout=300,
+                # Description tirée du résumé : le script en échec et les
+                # compteurs, pas les sorties des scripts précédents
+                ticket_id = creer_ticket_redmine(
+                    projet_id=self.id_redmine,
+                    sujet=f"Erreur test automatique - {script.nom}",
+                    description=description_ticket(self.resume, entree, fin_sortie),
+                    priority_id=script.priorite
                 )
-                stdout = result.stdout.decode("utf-8", errors="replace")
-                stderr = result.stderr.decode("utf-8", errors="replace")
-
-                logs.append(stdout)
-                if stderr:
-                    logs.append("ERREUR:\n" + stderr)
-
-                statut_resultat = (
-                    "error"
-                    if result.returncode != 0
-                    or "ERREURS_FORMULAIRES" in stdout
-                    or "❌" in stdout
-                    else "done"
-                )
-
+                self.journaliser(f"\n✅ Ticket Redmine créé avec ID: {ticket_id}")
+                entree["ticket"] = ticket_id
+                execution.ticket_redmine_id = ticket_id
             except Exception as e:
-                stdout = ""
-                stderr = str(e)
-                statut_resultat = "error"
-                logs.append(f"Erreur pendant l'exécution du script: {e}")
-
-            # ✅ Mise à jour ou création d’un ExecutionResult
-            execution_result, _ = ExecutionResult.objects.get_or_create(
-                execution=execution,
-                script=script,
-                defaults={'statut': statut_resultat}
+                self.journaliser(f"\n❌ Échec création ticket Redmine : {str(e)}")
+
+    def echouer(self, erreur_trace=None):
+        """
+        Exception hors d'un script (préparation, moteur) : l'exécution est en
+        erreur. Sans `erreur_trace`, la trace de l'exception en cours.
+        """
+        erreur_trace = erreur_trace or traceback.format_exc()
+        self.journaliser("❌ Exception globale:\n" + erreur_trace)
+        noter_erreur(self.resume, erreur_trace)
+        self.erreur_detectee = True
+
+    def terminer(self):
+        """Ferme le log global, écrit les derniers résultats, le résumé et l'état final, puis notifie."""
+        execution = self.execution
+        # ✅ Mise à jour finale
+        execution.statut = "error" if self.erreur_detectee else "done"
+        execution.ended_at = now()
+        self.journaliser()  # crée le log global s'il n'a encore rien reçu
+        self._journal.close()
+        execution.log_fichier.name = self.log_global
+
+        # Derniers résultats et état final de l'exécution dans une même transaction
+        with transaction.atomic():
+            try:
+                self.ecritures.vider()
+            except Exception:
+                execution.statut = "error"
+                noter_erreur(self.resume, "Enregistrement des résultats impossible:\n" + traceback.format_exc())
+            execution.resume = self.resume
+            execution.rapport = texte_rapport(self.resume)
+            execution.save(
+                update_fields=["statut", "rapport", "resume", "ended_at", "log_fichier", "ticket_redmine_id"]
             )
-            execution_result.statut = statut_resultat
-            execution_result.log_fichier.name = f"logs/execution_{execution.id}.txt"
-            execution_result.save()
-
-            # ✅ Si erreur, créer un ticket Redmine
-            if statut_resultat == "error":
-                erreur_detectee = True
-                description = (
-                    f"Le script '{script.nom}' a échoué avec le code {result.returncode if 'result' in locals() else 'N/A'}.\n\n"
-                    f"Rapport d'exécution :\n\n{stdout[:2000]}"
+            if execution.parent_id:
+                # Statut de l'exécution d'origine, fusionné avec cette relance
+                origine = ExecutionTest.objects.get(pk=execution.parent_id)
+                ExecutionTest.objects.filter(pk=origine.pk).update(
+                    statut_effectif=origine.calculer_statut_effectif()
                 )
 
-                try:
-                    ticket_id = creer_ticket_redmine(
-                        projet_id=id_redmine,
-                        sujet=f"Erreur test automatique - {script.nom}",
-                        description=description
-                        + "\n\nLogs complets:\n"
-                        + "\n".join(logs),
-                        priority_id=script.priorite
-                    )
-                    logs.append(f"\n✅ Ticket Redmine créé avec ID: {ticket_id}")
-                    execution.ticket_redmine_id = ticket_id
-                except Exception as e:
-                    logs.append(f"\n❌ Échec création ticket Redmine : {str(e)}")
+        if self.notifier:
+            notifier_utilisateurs(execution)
 
-        # ✅ Mise à jour finale
-        execution.statut = "error" if erreur_detectee else "done"
-        execution.rapport = infos_projet + "\n".join(logs)
 
-    except Exception:
-        erreur_trace = traceback.format_exc()
-        logs.append("❌ Exception globale:\n" + erreur_trace)
-        execution.statut = "error"
-        execution.rapport = infos_projet + "\n".join(logs)
-
-    # ✅ Sauvegarde du log global
-    execution.ended_at = now()
-    log_path = f"logs/execution_{execution.id}.txt"
-    full_log_path = os.path.join(settings.MEDIA_ROOT, log_path)
-    os.makedirs(os.path.dirname(full_log_path), exist_ok=True)
-
-    with open(full_log_path, "w", encoding="utf-8") as f:
-        f.write(execution.rapport)
-
-    execution.log_fichier.name = log_path
-    execution.save()
+def lancer_scripts_pour_execution(execution_id, notifier=True, chemin_script=chemin_script_local):
+    """
+    Exécute les scripts d'une exécution et enregistre les résultats
+    (moteur 'threads' : un thread par script en cours).
+    `chemin_script(script)` donne le fichier local à lancer (un agent
+    distant y substitue son cache de scripts). Avec notifier=False, ni
+    ticket Redmine ni e-mail.
+    """
+    deroulement = DeroulementExecution(execution_id, chemin_script, notifier)
+    try:
+        parametres = deroulement.preparer()
+
+        # Les résultats sont traités dans ce thread, au fur et à mesure que
+        # les scripts se terminent (les accès base restent séquentiels)
+        pool_hotes = get_pool_hotes(
+            getattr(settings, "SNAPFLOW_SCRIPT_HOSTS", 0),
+            getattr(settings, "SNAPFLOW_SCRIPT_HOST_MODULES", ()),
+        )
+
+        pool_navigateurs = get_pool_navigateurs(getattr(settings, "SNAPFLOW_WEBDRIVER_POOL", None))
+
+        for index, resultat in executer_scripts(
+            parametres["chemins"],
+            parametres["concurrence"],
+            chemins_log=parametres["chemins_log"],
+            pool_hotes=pool_hotes,
+            env=parametres["env"],
+            pool_navigateurs=pool_navigateurs,
+            timeouts=parametres["timeouts"],
+            limites=parametres["limites"],
+        ):
+            deroulement.enregistrer(index, resultat)
 
-    notifier_utilisateurs(execution)
+    except Exception:
+        deroulement.echouer()
 
+    deroulement.terminer()
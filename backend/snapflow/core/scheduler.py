@@ -2,54 +2,74 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection
+from django.db.models import Q
+from django.utils import timezone
+from datetime import timedelta
 import logging
 import atexit
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
-# Instance globale du scheduler
-scheduler = BackgroundScheduler({
-    'apscheduler.timezone': 'UTC',  # ou votre timezone
-    'apscheduler.job_defaults.coalesce': True,
-    'apscheduler.job_defaults.max_instances': 1,  # Une seule instance à la fois
-})
+
+def creer_scheduler():
+    return BackgroundScheduler({
+        'apscheduler.timezone': 'UTC',  # ou votre timezone
+        'apscheduler.job_defaults.coalesce': True,
+        'apscheduler.job_defaults.max_instances': 1,  # Une seule instance à la fois
+    })
+
+
+# Instance globale du scheduler, remplacée à chaque démarrage
+scheduler = creer_scheduler()
 
 def start_scheduler():
     """
     Démarre le scheduler APScheduler pour l'exécution périodique des tests.
+    Appelé par la candidature (voir plus bas) quand ce processus devient
+    titulaire du bail du planificateur.
     """
+    global scheduler
     if scheduler.running:
         logger.warning("⚠️ Scheduler déjà en cours d'exécution")
         print("⚠️ Scheduler déjà en cours d'exécution")
         return
     
     try:
-        from core.jobs import execute_pending_tests
-        
-        # Ajouter le job avec un ID unique
+        # Un BackgroundScheduler arrêté ne redémarre pas (son pool de threads
+        # refuse les nouvelles tâches) : nouvelle instance après un bail perdu
+        # puis repris
+        scheduler = creer_scheduler()
+
+        from core.jobs import balayer_executions_orphelines
+        from core.planificateur import planificateur
+
+        # Les exécutions périodiques sont créées par le planificateur (tas
+        # des échéances, réveillé à la prochaine échéance) ; APScheduler ne
+        # garde que les tâches d'entretien
         scheduler.add_job(
-            func=execute_pending_tests,
+            func=balayer_executions_orphelines,
             trigger=IntervalTrigger(minutes=1),
-            id='execute_pending_tests',
-            name='Vérification des tests en attente',
-            replace_existing=True,  # Remplace si existe déjà
-            max_instances=1  # Une seule instance à la fois
+            id='balayer_executions_orphelines',
+            name='Reprise des exécutions orphelines',
+            replace_existing=True,
+            max_instances=1
         )
         
         # Démarrer le scheduler
         scheduler.start()
+        planificateur.demarrer()
         
         logger.info("✅ Scheduler démarré avec succès")
-        print("✅ Scheduler démarré avec succès - Vérification toutes les minutes")
+        print("✅ Scheduler démarré avec succès - Exécutions déclenchées à leur échéance")
         print(f"📊 Jobs planifiés: {len(scheduler.get_jobs())}")
         
         # Afficher les jobs pour débugger
         for job in scheduler.get_jobs():
             print(f"  - Job: {job.name} | Prochaine exécution: {job.next_run_time}")
         
-        # Arrêter proprement le scheduler à la fermeture de Django
-        atexit.register(lambda: shutdown_scheduler())
-        
     except Exception as e:
         logger.error(f"❌ Erreur démarrage scheduler: {e}", exc_info=True)
         print(f"❌ Erreur démarrage scheduler: {e}")
@@ -60,6 +80,9 @@ def shutdown_scheduler():
     """
     Arrête proprement le scheduler.
     """
+    from core.planificateur import planificateur
+
+    planificateur.arreter()
     if scheduler.running:
         logger.info("🛑 Arrêt du scheduler...")
         print("🛑 Arrêt du scheduler...")
@@ -71,8 +94,17 @@ def get_scheduler_status():
     """
     Retourne le statut du scheduler (utile pour le débogage).
     """
+    from core.planificateur import planificateur
+
+    bail = get_bail()
     return {
         'running': scheduler.running,
+        'planificateur': planificateur.statut(),
+        'bail': {
+            'titulaire': bail.titulaire if bail else None,
+            'actif': bail.actif if bail else False,
+            'expire_le': str(bail.expire_le) if bail and bail.expire_le else None,
+        },
         'jobs_count': len(scheduler.get_jobs()),
         'jobs': [
             {
@@ -82,4 +114,132 @@ def get_scheduler_status():
             }
             for job in scheduler.get_jobs()
         ]
-    }
\ No newline at end of file
+    }
+
+
+# Élection du processus qui mène le scheduler
+#
+# Chaque processus web (wsgi.py, asgi.py, y compris celui de runserver)
+# lance une candidature : un thread qui tente toutes les
+# SNAPFLOW_PLANIFICATEUR_BAIL / 3 secondes de prendre ou de prolonger le
+# bail du planificateur (une ligne BailPlanificateur, mise à jour
+# conditionnelle). Seul le titulaire démarre le scheduler ; s'il s'arrête
+# sans rendre le bail, un autre processus le reprend à son expiration. Les
+# commandes de gestion et le shell ne chargent pas wsgi.py : ils ne
+# démarrent jamais le scheduler.
+
+NOM_BAIL = "planificateur"
+
+_candidature = None
+_arret_candidature = threading.Event()
+
+
+def get_duree_bail_planificateur():
+    return timedelta(seconds=getattr(settings, "SNAPFLOW_PLANIFICATEUR_BAIL", 15))
+
+
+def prendre_bail(titulaire):
+    """Prend le bail s'il est libre ou expiré, ou le prolonge ; True si `titulaire` le détient."""
+    from core.models import BailPlanificateur
+
+    maintenant = timezone.now()
+    expire_le = maintenant + get_duree_bail_planificateur()
+    baux = BailPlanificateur.objects.filter(nom=NOM_BAIL)
+    if baux.filter(titulaire=titulaire, expire_le__gt=maintenant).update(expire_le=expire_le):
+        return True
+    # Mise à jour conditionnelle : un seul candidat peut reprendre un bail expiré
+    if baux.filter(Q(expire_le__isnull=True) | Q(expire_le__lte=maintenant)).update(
+        titulaire=titulaire, acquis_le=maintenant, expire_le=expire_le
+    ):
+        return True
+    if not baux.exists():
+        try:
+            BailPlanificateur.objects.create(nom=NOM_BAIL)
+        except IntegrityError:
+            pass  # créé en même temps par un autre candidat
+        return prendre_bail(titulaire)
+    return False
+
+
+def rendre_bail(titulaire):
+    """Libère le bail pour qu'un autre processus le reprenne sans attendre son expiration."""
+    from core.models import BailPlanificateur
+
+    BailPlanificateur.objects.filter(nom=NOM_BAIL, titulaire=titulaire).update(
+        titulaire="", expire_le=None
+    )
+
+
+def get_bail():
+    from core.models import BailPlanificateur
+
+    return BailPlanificateur.objects.filter(nom=NOM_BAIL).first()
+
+
+def candidater(titulaire):
+    """Boucle de la candidature : démarre ou arrête le scheduler selon le bail."""
+    duree = get_duree_bail_planificateur().total_seconds()
+    derniere_prise = None  # time.monotonic() de la dernière prise ou prolongation réussie
+    try:
+        while True:
+            close_old_connections()
+            try:
+                titulaire_du_bail = prendre_bail(titulaire)
+            except Exception as e:
+                logger.error(f"❌ Bail du planificateur indisponible: {e}", exc_info=True)
+                # Base inaccessible : le bail est encore à nous tant qu'il n'a pas expiré
+                titulaire_du_bail = derniere_prise is not None and time.monotonic() - derniere_prise < duree
+
+            if titulaire_du_bail:
+                derniere_prise = time.monotonic()
+                if not scheduler.running:
+                    logger.info(f"👑 {titulaire} devient titulaire du bail du planificateur")
+                    print(f"👑 {titulaire} devient titulaire du bail du planificateur")
+                    start_scheduler()
+            else:
+                derniere_prise = None
+                if scheduler.running:
+                    logger.warning(f"⚠️ {titulaire} a perdu le bail du planificateur")
+                    print(f"⚠️ {titulaire} a perdu le bail du planificateur")
+                    shutdown_scheduler()
+
+            if _arret_candidature.wait(duree / 3):
+                break
+    finally:
+        if scheduler.running:
+            shutdown_scheduler()
+        try:
+            rendre_bail(titulaire)
+        except Exception as e:
+            logger.error(f"❌ Bail du planificateur non rendu: {e}")
+        connection.close()
+
+
+def demarrer_candidature():
+    """
+    Point d'entrée des processus web : lance la candidature au bail du
+    planificateur (une seule par processus). Sans effet si
+    SNAPFLOW_PLANIFICATEUR_ACTIF est faux.
+    """
+    global _candidature
+    if not getattr(settings, "SNAPFLOW_PLANIFICATEUR_ACTIF", True):
+        return
+    if _candidature is not None and _candidature.is_alive():
+        return
+
+    from core.execution_queue import identifiant_worker
+
+    _arret_candidature.clear()
+    _candidature = threading.Thread(
+        target=candidater, args=(identifiant_worker("planificateur"),),
+        name="candidature-planificateur", daemon=True,
+    )
+    _candidature.start()
+    # Rendre le bail à la fermeture du processus
+    atexit.register(arreter_candidature)
+
+
+def arreter_candidature(timeout=10):
+    _arret_candidature.set()
+    if _candidature is not None:
+        _candidature.join(timeout)
@@ -285,8 +285,10 @@ class SocieteDetailSerializer(serializers.ModelSerializer):
         # --- MODIFIÉ : Suppression de 'num_siret' et 'url' ---
         fields = [
             'id', 'nom', 'secteur_activite', 'admin', 'projets', 'employes',
-            'nombre_projets', 'nombre_employes', 'date_creation', 'date_modification'
+            'nombre_projets', 'nombre_employes', 'date_creation', 'date_modification',
+            'poids_execution', 'executions_max'
         ]
+        read_only_fields = ['poids_execution', 'executions_max']
         # --- FIN DE LA MODIFICATION ---
     
     def get_admin(self, obj):
@@ -403,8 +405,9 @@ class ScriptSerializer(serializers.ModelSerializer):
             'id', 'nom', 'fichier', 
             'axe', 'axe_nom', 
             'sous_axe', 'sous_axe_nom',
-            'projet', 'priorite', 'priorite_nom'
+            'projet', 'priorite', 'priorite_nom', 'empreinte'
         ]
+        read_only_fields = ['empreinte']
 
 
 
@@ -503,12 +506,12 @@ class ConfigurationTestSerializer(serializers.ModelSerializer):
             'projet', 'projet_id',
             'scripts', 'scripts_details', 
             'emails_notification', 'emails_notification_details',
-            'periodicite', 'last_execution', 'is_active', 
+            'periodicite', 'scripts_paralleles', 'politique_chevauchement', 'politique_reprise', 'last_execution', 'is_active', 
             'date_activation', 'date_desactivation', 
-            'date_creation', 'date_modification',
+            'date_creation', 'date_modification', 'next_run_at', 'expected_at',
             'scripts_count', 'emails_count', 'next_execution'
         ]
-        read_only_fields = ['date_creation', 'date_modification', 'societe', 'projet']
+        read_only_fields = ['date_creation', 'date_modification', 'next_run_at', 'expected_at', 'societe', 'projet']
 
     def get_scripts_count(self, obj):
         if isinstance(obj, dict):
@@ -662,8 +665,27 @@ class ExecutionTestSerializer(serializers.ModelSerializer):
             'ended_at',
             'log_fichier',
             'rapport',
-            'ticket_redmine_id'
+            'resume',
+            'ticket_redmine_id',
+            'priorite',
+            'echeance',
+            'date_mise_en_file',
+            'dernier_battement',
+            'reprises',
+            'parent',
+            'statut_effectif',
+            'immediate',
         ]
+        read_only_fields = [
+            'resume', 'priorite', 'echeance', 'date_mise_en_file', 'dernier_battement', 'reprises',
+            'parent', 'statut_effectif', 'immediate',
+        ]
+
+    def to_representation(self, instance):
+        representation = super().to_representation(instance)
+        # Sans relance terminée, le statut effectif est le statut
+        representation['statut_effectif'] = instance.statut_effectif or instance.statut
+        return representation
 
     def get_configuration_details(self, obj):
         # Retourner des détails supplémentaires si besoin
@@ -766,7 +788,7 @@ class ExecutionResultSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'execution_id', 'script', 'script_nom', 'statut', 
             'log_fichier', 'commentaire', 'configuration_nom', 
-            'projet_nom', 'started_at'
+            'projet_nom', 'started_at', 'cpu_utilisateur', 'cpu_systeme', 'rss_max_ko'
         ]
         
 #
@@ -1120,7 +1142,8 @@ class ExecutionTestDetailSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'configuration', 'configuration_nom', 'societe_nom',
             'statut', 'started_at', 'ended_at', 'duree',
-            'log_fichier', 'rapport', 'ticket_redmine_id', 'scripts_executes'
+            'log_fichier', 'rapport', 'resume', 'ticket_redmine_id', 'scripts_executes',
+            'parent', 'statut_effectif'
         ]
     
     def get_duree(self, obj):
@@ -1135,7 +1158,12 @@ class ExecutionTestDetailSerializer(serializers.ModelSerializer):
                 'script_id': res.script.id,
                 'script_nom': res.script.nom,
                 'statut': res.statut,
-                'commentaire': res.commentaire
+                'commentaire': res.commentaire,
+                'started_at': res.started_at,
+                'ended_at': res.ended_at,
+                'cpu_utilisateur': res.cpu_utilisateur,
+                'cpu_systeme': res.cpu_systeme,
+                'rss_max_ko': res.rss_max_ko,
             }
             for res in resultats
         ]
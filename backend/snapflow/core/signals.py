@@ -1,10 +1,12 @@
 # core/signals.py
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 # from snapflow.core.runner import lancer_scripts_pour_execution
-from .runner import lancer_scripts_pour_execution
-from .models import ExecutionTest, ExecutionResult
+from .execution_queue import mettre_en_file
+from .models import ConfigurationTest, ExecutionTest, ExecutionResult
+from .planificateur import signaler_configurations
 from .jobs import detecter_scripts_problemes, nettoyer_anciens_problemes_resolus
 import threading
 from datetime import timedelta
@@ -14,25 +16,36 @@ from django.utils import timezone
 def lancer_execution_apres_creation(sender, instance, created, **kwargs):
     if created:
         # Créer automatiquement un ExecutionResult par script de la config
-        configuration = instance.configuration
-        for script in configuration.scripts.all():
-            ExecutionResult.objects.create(
-                execution=instance,
-                script=script,
-                statut='pending'  # initialement en attente
-            )
+        # (en une requête ; initialement en attente). Une relance ne porte
+        # que sur certains scripts : ExecutionTest.relancer_echecs() crée
+        # ses résultats
+        if instance.parent_id is None:
+            configuration = instance.configuration
+            ExecutionResult.objects.bulk_create([
+                ExecutionResult(execution=instance, script=script, statut='pending')
+                for script in configuration.scripts.all()
+            ])
 
-        # Lancer l'exécution dans un thread si statut pending
+        # Mettre l'exécution en file (les workers la lanceront) si statut pending
         if instance.statut == 'pending':
-            threading.Thread(target=lancer_scripts_pour_execution, args=(instance.id,)).start()
+            mettre_en_file(instance)
+
+@receiver(post_save, sender=ConfigurationTest)
+@receiver(post_delete, sender=ConfigurationTest)
+def replanifier_configuration(sender, instance, **kwargs):
+    """Recalcule l'échéance de la configuration dans le planificateur de ce processus."""
+    signaler_configurations([instance.pk])
 
 @receiver(post_save, sender=ExecutionTest)
 def detecter_problemes_apres_execution(sender, instance, **kwargs):
     """
-    Détecte les problèmes après chaque exécution
+    Détecte les problèmes après chaque exécution terminée
     """
-    # Exécuter la détection dans un thread pour ne pas bloquer
-    threading.Thread(target=detecter_scripts_problemes).start()
+    if instance.statut not in ('done', 'error'):
+        return
+    # Exécuter la détection dans un thread pour ne pas bloquer, une fois
+    # l'état final enregistré
+    transaction.on_commit(lambda: threading.Thread(target=detecter_scripts_problemes).start())
 
 @receiver(post_save, sender=ExecutionResult)
 def detecter_problemes_apres_resultat(sender, instance, **kwargs):
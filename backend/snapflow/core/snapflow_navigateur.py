@@ -0,0 +1,42 @@
+# core/snapflow_navigateur.py
+"""
+Aide pour les scripts de test : obtenir un navigateur.
+
+    from core.snapflow_navigateur import obtenir_driver
+
+    driver = obtenir_driver()
+    driver.get("https://exemple.com")
+    ...
+    driver.quit()
+
+Quand le runner fournit une session du pool (variables SNAPFLOW_WEBDRIVER_*),
+le driver s'y rattache au lieu de lancer un navigateur, et quit() laisse la
+session ouverte pour le script suivant. Sinon un Chrome local est démarré,
+comme le font les scripts aujourd'hui.
+"""
+import os
+
+from core.pool_navigateurs import VARIABLE_SESSION, VARIABLE_URL
+
+
+def obtenir_driver(options=None):
+    from selenium import webdriver
+
+    url = os.environ.get(VARIABLE_URL)
+    session_id = os.environ.get(VARIABLE_SESSION)
+    if not url or not session_id:
+        return webdriver.Chrome(options=options)
+
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+    class DriverPartage(WebDriver):
+        """Driver rattaché à une session existante, qu'il ne ferme pas."""
+
+        def start_session(self, capabilities):
+            self.session_id = session_id
+            self.caps = {}
+
+        def quit(self):
+            pass
+
+    return DriverPartage(command_executor=url, options=options or webdriver.ChromeOptions())
@@ -0,0 +1,77 @@
+# core/snapflow_resultats.py
+"""
+Aide pour les scripts de test : rapporter étapes, vérifications et statut.
+
+    from core.snapflow_resultats import etape, verifier, terminer
+
+    with etape("Connexion"):
+        driver.get("https://exemple.com/login")
+        ...
+    verifier("Tableau de bord affiché", "Accueil" in driver.title)
+    terminer()
+
+Chaque appel écrit une ligne JSON sur le canal de résultats ouvert par le
+runner (descripteur donné par SNAPFLOW_RESULT_FD) :
+
+    {"type": "etape", "nom": "Connexion", "statut": "done", "duree": 1.42}
+    {"type": "assertion", "nom": "...", "statut": "error", "message": "..."}
+    {"type": "fin", "statut": "done"}
+
+Le runner enregistre étapes et vérifications (EtapeResultat) et, quand le
+script envoie un statut final, s'en sert au lieu de chercher les marqueurs
+d'erreur ("❌", ERREURS_FORMULAIRES) dans la sortie. Lancé hors du runner,
+le script fonctionne comme avant : les messages sont ignorés.
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+
+from core.hote_scripts import VARIABLE_RESULTATS
+
+_canal = None
+
+
+def _envoyer(message):
+    global _canal
+    if _canal is None:
+        fd = os.environ.get(VARIABLE_RESULTATS)
+        if not fd:
+            return
+        _canal = os.fdopen(int(fd), "w", encoding="utf-8", buffering=1, closefd=False)
+    _canal.write(json.dumps(message, ensure_ascii=False, default=str) + "\n")
+    _canal.flush()
+
+
+@contextmanager
+def etape(nom):
+    """Mesure un bloc du script ; une exception le marque en échec (et se propage)."""
+    debut = time.monotonic()
+    try:
+        yield
+    except Exception as e:
+        _envoyer({
+            "type": "etape",
+            "nom": nom,
+            "statut": "error",
+            "duree": time.monotonic() - debut,
+            "message": f"{type(e).__name__}: {e}",
+        })
+        raise
+    _envoyer({"type": "etape", "nom": nom, "statut": "done", "duree": time.monotonic() - debut})
+
+
+def verifier(nom, condition, message=""):
+    """Enregistre une vérification ; retourne la condition pour pouvoir l'enchaîner."""
+    _envoyer({
+        "type": "assertion",
+        "nom": nom,
+        "statut": "done" if condition else "error",
+        "message": message,
+    })
+    return bool(condition)
+
+
+def terminer(statut="done", message=""):
+    """Statut final du script : 'done' (concluant) ou 'error' (non concluant)."""
+    _envoyer({"type": "fin", "statut": statut, "message": message})
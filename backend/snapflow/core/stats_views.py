@@ -3,9 +3,10 @@ from django.http import JsonResponse
 from django.shortcuts import render
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from django.db.models import Count, Q
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Max, Min, Q, Sum
 from django.db.models.functions import TruncDate
 from .models import *
+from .resume_execution import STATUTS_ECHEC
 from core.models import ExecutionTest  # adapte le nom selon ton app
 # from .serializers import ExecutionResultSerializer
 
@@ -16,8 +17,8 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-def apply_period_filter(qs, periode, date_debut=None, date_fin=None):
-    """Applique le filtre de période au queryset"""
+def apply_period_filter(qs, periode, date_debut=None, date_fin=None, champ="started_at"):
+    """Applique le filtre de période au queryset (sur le champ date `champ`)"""
     if not periode:
         return qs
         
@@ -28,7 +29,7 @@ def apply_period_filter(qs, periode, date_debut=None, date_fin=None):
         try:
             start_date = timezone.make_aware(datetime.strptime(date_debut, "%Y-%m-%d"))
             end_date = timezone.make_aware(datetime.strptime(date_fin + " 23:59:59", "%Y-%m-%d %H:%M:%S"))
-            return qs.filter(started_at__gte=start_date, started_at__lte=end_date)
+            return qs.filter(**{f"{champ}__gte": start_date, f"{champ}__lte": end_date})
         except ValueError:
             return qs
     elif periode == "jour":
@@ -42,7 +43,7 @@ def apply_period_filter(qs, periode, date_debut=None, date_fin=None):
     else:
         return qs  # Période non reconnue
     
-    return qs.filter(started_at__gte=date_debut)
+    return qs.filter(**{f"{champ}__gte": date_debut})
 
 def filter_by_user_permissions(qs, user):
     """Filtre le queryset selon les permissions de l'utilisateur"""
@@ -201,7 +202,8 @@ def taux_erreur_par_script(request):
         qs.values("configuration__scripts__nom")
         .annotate(
             total=Count("id"),
-            erreurs=Count("id", filter=Q(statut="error"))
+            # Délai dépassé ('timeout') compte comme une erreur
+            erreurs=Count("id", filter=Q(statut__in=STATUTS_ECHEC))
         )
         .order_by("-erreurs")
     )
@@ -221,6 +223,343 @@ def taux_erreur_par_script(request):
     return Response(result)
 
 
+@api_view(["GET"])
+def echecs_par_etape(request):
+    """Étapes rapportées par les scripts (EtapeResultat), classées par nombre d'échecs."""
+    projet_id = request.GET.get("projet_id")
+    periode = request.GET.get("periode", "mois")
+    date_debut = request.GET.get("date_debut")
+    date_fin = request.GET.get("date_fin")
+
+    qs = ExecutionTest.objects.all()
+    qs = filter_by_user_permissions(qs, request.user)
+    qs = apply_period_filter(qs, periode, date_debut, date_fin)
+    if projet_id:
+        qs = qs.filter(configuration__projet__id=projet_id)
+
+    data = (
+        EtapeResultat.objects.filter(resultat__execution__in=qs)
+        .values("resultat__script__nom", "nom", "type")
+        .annotate(
+            total=Count("id"),
+            echecs=Count("id", filter=Q(statut__in=STATUTS_ECHEC)),
+        )
+        .filter(echecs__gt=0)
+        .order_by("-echecs")[:100]
+    )
+
+    result = [
+        {
+            "script": row["resultat__script__nom"],
+            "etape": row["nom"],
+            "type": row["type"],
+            "total": row["total"],
+            "echecs": row["echecs"],
+            "taux_echec": round((row["echecs"] / row["total"]) * 100, 2),
+        }
+        for row in data
+    ]
+
+    return Response(result)
+
+
+@api_view(["GET"])
+def declenchements_coalesces(request):
+    """Déclenchements planifiés absorbés ou remplacés, par configuration et par action."""
+    projet_id = request.GET.get("projet_id")
+    periode = request.GET.get("periode", "mois")
+    date_debut = request.GET.get("date_debut")
+    date_fin = request.GET.get("date_fin")
+
+    qs = DeclenchementCoalesce.objects.all()
+    if not request.user.is_superuser:
+        projets_ids = Projet.objects.filter(charge_de_compte=request.user).values_list("id", flat=True)
+        qs = qs.filter(configuration__projet__id__in=projets_ids)
+    qs = apply_period_filter(qs, periode, date_debut, date_fin, champ="date_prevue")
+    if projet_id:
+        qs = qs.filter(configuration__projet__id=projet_id)
+
+    data = (
+        qs.values("configuration__id", "configuration__nom", "configuration__politique_chevauchement")
+        .annotate(
+            total=Count("id"),
+            ignores=Count("id", filter=Q(action="ignore")),
+            fusionnes=Count("id", filter=Q(action="fusionne")),
+            remplaces=Count("id", filter=Q(action="remplace")),
+        )
+        .order_by("-total")
+    )
+
+    result = [
+        {
+            "configuration_id": row["configuration__id"],
+            "configuration": row["configuration__nom"],
+            "politique": row["configuration__politique_chevauchement"],
+            "total": row["total"],
+            "ignores": row["ignores"],
+            "fusionnes": row["fusionnes"],
+            "remplaces": row["remplaces"],
+        }
+        for row in data
+    ]
+
+    return Response(result)
+
+
+def _percentile(valeurs_triees, p):
+    """Percentile (rang le plus proche) d'une liste déjà triée."""
+    if not valeurs_triees:
+        return None
+    rang = max(0, -(-len(valeurs_triees) * p // 100) - 1)
+    return valeurs_triees[int(rang)]
+
+
+@api_view(["GET"])
+def attente_file_par_priorite(request):
+    """
+    Temps d'attente dans la file d'exécution (mise en file → démarrage), en
+    secondes, par classe de priorité ; avec l'état actuel de la file.
+    """
+    projet_id = request.GET.get("projet_id")
+    periode = request.GET.get("periode", "semaine")
+    date_debut = request.GET.get("date_debut")
+    date_fin = request.GET.get("date_fin")
+
+    qs = ExecutionTest.objects.filter(date_mise_en_file__isnull=False)
+    qs = filter_by_user_permissions(qs, request.user)
+    if projet_id:
+        qs = qs.filter(configuration__projet__id=projet_id)
+
+    demarrees = apply_period_filter(qs.filter(started_at__isnull=False), periode, date_debut, date_fin)
+    attentes = defaultdict(list)
+    for priorite, debut, mise_en_file in demarrees.values_list(
+        "priorite", "started_at", "date_mise_en_file"
+    ).iterator():
+        attentes[priorite].append(max(0.0, (debut - mise_en_file).total_seconds()))
+
+    file_actuelle = {
+        row["priorite"]: row
+        for row in qs.filter(statut="pending")
+        .values("priorite")
+        .annotate(en_attente=Count("id"), plus_ancienne=Min("date_mise_en_file"))
+    }
+
+    maintenant = timezone.now()
+    result = []
+    for priorite, libelle in reversed(Script.PRIORITY_CHOICES):
+        valeurs = sorted(attentes.get(priorite, []))
+        actuelle = file_actuelle.get(priorite)
+        result.append({
+            "priorite": priorite,
+            "libelle": libelle,
+            "executions": len(valeurs),
+            "attente_moyenne": round(sum(valeurs) / len(valeurs), 1) if valeurs else None,
+            "attente_p50": _percentile(valeurs, 50),
+            "attente_p95": _percentile(valeurs, 95),
+            "attente_max": valeurs[-1] if valeurs else None,
+            "en_attente": actuelle["en_attente"] if actuelle else 0,
+            "attente_actuelle_max": (
+                round((maintenant - actuelle["plus_ancienne"]).total_seconds(), 1)
+                if actuelle and actuelle["plus_ancienne"] else None
+            ),
+        })
+
+    return Response(result)
+
+
+@api_view(["GET"])
+def partage_execution(request):
+    """
+    Part de la capacité d'exécution reçue par chaque société sur la période
+    (temps d'exécution cumulé), comparée à la part attendue d'après les poids
+    des sociétés actives ; avec l'état actuel : exécutions en cours, en
+    attente et plafond. La part attendue n'est atteinte que lorsque toutes
+    les sociétés ont des exécutions en attente.
+    """
+    from .execution_queue import temps_execution_par_locataire
+
+    periode = request.GET.get("periode", "jour")
+    date_debut = request.GET.get("date_debut")
+    date_fin = request.GET.get("date_fin")
+
+    qs = filter_by_user_permissions(ExecutionTest.objects.all(), request.user)
+    sur_periode = apply_period_filter(qs, periode, date_debut, date_fin)
+    temps = temps_execution_par_locataire(sur_periode, timezone.now())
+    executions = {
+        row["configuration__societe_id"]: row["nombre"]
+        for row in sur_periode.filter(started_at__isnull=False)
+        .values("configuration__societe_id")
+        .annotate(nombre=Count("id"))
+    }
+    etat = defaultdict(lambda: {"pending": 0, "running": 0})
+    for row in (
+        qs.filter(statut__in=["pending", "running"])
+        .values("configuration__societe_id", "statut")
+        .annotate(nombre=Count("id"))
+    ):
+        etat[row["configuration__societe_id"]][row["statut"]] = row["nombre"]
+
+    societes = {
+        societe_id: (nom, max(1, poids), plafond)
+        for societe_id, nom, poids, plafond in Societe.objects.filter(
+            pk__in=set(temps) | set(etat)
+        ).values_list("id", "nom", "poids_execution", "executions_max")
+    }
+    temps_total = sum(temps.values())
+    poids_total = sum(poids for _, poids, _ in societes.values())
+
+    result = []
+    for societe_id, (nom, poids, plafond) in societes.items():
+        temps_societe = temps.get(societe_id, 0.0)
+        result.append({
+            "societe_id": societe_id,
+            "societe_nom": nom,
+            "poids": poids,
+            "executions_max": plafond,
+            "executions": executions.get(societe_id, 0),
+            "temps_execution": round(temps_societe, 1),
+            "part_effective": round(100 * temps_societe / temps_total, 1) if temps_total else None,
+            "part_attendue": round(100 * poids / poids_total, 1) if poids_total else None,
+            "en_cours": etat[societe_id]["running"],
+            "en_attente": etat[societe_id]["pending"],
+        })
+    result.sort(key=lambda r: r["temps_execution"], reverse=True)
+
+    return Response(result)
+
+
+@api_view(["GET"])
+def gantt_execution(request, pk):
+    """
+    Chronologie des scripts d'une exécution (diagramme de Gantt) : début et
+    fin en secondes depuis le début de l'exécution, temps CPU et pic de
+    mémoire ; les scripts simultanés sont placés sur des couloirs distincts.
+    Le résumé donne le parallélisme effectif (somme des durées / durée de
+    l'exécution) et le temps passé avec un seul script en cours.
+    """
+    execution = (
+        filter_by_user_permissions(ExecutionTest.objects.filter(pk=pk), request.user)
+        .values("id", "statut", "started_at", "ended_at")
+        .first()
+    )
+    if execution is None:
+        return Response({"detail": "Exécution introuvable"}, status=404)
+
+    lignes = (
+        ExecutionResult.objects.filter(execution_id=pk, started_at__isnull=False, ended_at__isnull=False)
+        .order_by("started_at", "id")
+        .values_list(
+            "script_id", "script__nom", "statut", "started_at", "ended_at",
+            "cpu_utilisateur", "cpu_systeme", "rss_max_ko",
+        )
+    )
+    origine = execution["started_at"]
+    couloirs = []  # fin du dernier script de chaque couloir
+    scripts = []
+    evenements = []
+    for script_id, nom, statut, debut, fin, cpu_utilisateur, cpu_systeme, rss_max_ko in lignes:
+        origine = origine or debut
+        debut_s = (debut - origine).total_seconds()
+        fin_s = (fin - origine).total_seconds()
+        couloir = next((i for i, libre in enumerate(couloirs) if libre <= debut_s), len(couloirs))
+        if couloir == len(couloirs):
+            couloirs.append(fin_s)
+        else:
+            couloirs[couloir] = fin_s
+        cpu = (cpu_utilisateur or 0) + (cpu_systeme or 0) if cpu_utilisateur is not None else None
+        duree = fin_s - debut_s
+        scripts.append({
+            "script_id": script_id,
+            "script_nom": nom,
+            "statut": statut,
+            "debut": round(debut_s, 3),
+            "fin": round(fin_s, 3),
+            "duree": round(duree, 3),
+            "couloir": couloir,
+            "cpu_utilisateur": cpu_utilisateur,
+            "cpu_systeme": cpu_systeme,
+            # Part du temps passé sur le CPU : faible pour un script qui attend (navigateur, réseau)
+            "utilisation_cpu": round(cpu / duree, 2) if cpu is not None and duree > 0 else None,
+            "rss_max_ko": rss_max_ko,
+        })
+        evenements += [(debut_s, 1), (fin_s, -1)]
+
+    # Balayage des débuts et fins : temps avec exactement un script en cours
+    temps_seul = 0.0
+    en_cours = 0
+    precedent = None
+    for instant, delta in sorted(evenements):
+        if en_cours == 1:
+            temps_seul += instant - precedent
+        en_cours += delta
+        precedent = instant
+
+    fin_execution = execution["ended_at"] or timezone.now()
+    duree_execution = (fin_execution - origine).total_seconds() if origine else 0.0
+    somme_durees = sum(s["duree"] for s in scripts)
+    return Response({
+        "execution_id": execution["id"],
+        "statut": execution["statut"],
+        "started_at": execution["started_at"],
+        "ended_at": execution["ended_at"],
+        "duree": round(duree_execution, 3),
+        "somme_durees_scripts": round(somme_durees, 3),
+        "parallelisme_effectif": round(somme_durees / duree_execution, 2) if duree_execution > 0 else None,
+        "temps_un_seul_script": round(temps_seul, 3),
+        "couloirs": len(couloirs),
+        "scripts": scripts,
+    })
+
+
+@api_view(["GET"])
+def consommation_par_script(request):
+    """
+    Scripts classés par temps CPU cumulé sur la période : nombre
+    d'exécutions, durée et CPU moyens, pic de mémoire résidente.
+    """
+    projet_id = request.GET.get("projet_id")
+    periode = request.GET.get("periode", "semaine")
+    date_debut = request.GET.get("date_debut")
+    date_fin = request.GET.get("date_fin")
+
+    qs = ExecutionTest.objects.all()
+    qs = filter_by_user_permissions(qs, request.user)
+    qs = apply_period_filter(qs, periode, date_debut, date_fin)
+    if projet_id:
+        qs = qs.filter(configuration__projet__id=projet_id)
+
+    cpu = F("cpu_utilisateur") + F("cpu_systeme")
+    data = (
+        ExecutionResult.objects.filter(execution__in=qs, cpu_utilisateur__isnull=False, ended_at__isnull=False)
+        .values("script_id", "script__nom")
+        .annotate(
+            executions=Count("id"),
+            cpu_total=Sum(cpu),
+            cpu_moyen=Avg(cpu),
+            duree_moyenne=Avg(ExpressionWrapper(F("ended_at") - F("started_at"), output_field=DurationField())),
+            rss_max_ko=Max("rss_max_ko"),
+            rss_moyen_ko=Avg("rss_max_ko"),
+        )
+        .order_by("-cpu_total")[:100]
+    )
+
+    result = [
+        {
+            "script_id": row["script_id"],
+            "script": row["script__nom"],
+            "executions": row["executions"],
+            "cpu_total": round(row["cpu_total"], 1),
+            "cpu_moyen": round(row["cpu_moyen"], 2),
+            "duree_moyenne": round(row["duree_moyenne"].total_seconds(), 2) if row["duree_moyenne"] else None,
+            "rss_max_ko": row["rss_max_ko"],
+            "rss_moyen_ko": round(row["rss_moyen_ko"]) if row["rss_moyen_ko"] is not None else None,
+        }
+        for row in data
+    ]
+
+    return Response(result)
+
+
 @api_view(["GET"])
 def taux_reussite(request):
     projet_id = request.GET.get("projet_id")
@@ -787,9 +1126,11 @@ def configurations_actives(request):
         
         # Préparer les données de réponse
         configurations_data = []
-        for config in qs.select_related('projet', 'societe').prefetch_related('scripts', 'emails_notification'):
+        configurations = list(qs.select_related('projet', 'societe').prefetch_related('scripts', 'emails_notification'))
+        prochaines = ConfigurationTest.prochaines_executions(configurations)
+        for config in configurations:
             # Calculer la prochaine exécution
-            next_execution = config.get_next_execution_time()
+            next_execution = prochaines[config.id]
             time_until_execution = None
             if next_execution:
                 time_until_execution = int((next_execution - timezone.now()).total_seconds())
@@ -797,11 +1138,9 @@ def configurations_actives(request):
             # Vérifier si en retard
             is_overdue = False
             delay_seconds = 0
-            if config.last_execution:
-                expected_next = config.last_execution + config.get_periodicite_timedelta()
-                if timezone.now() > expected_next:
-                    is_overdue = True
-                    delay_seconds = int((timezone.now() - expected_next).total_seconds())
+            if config.expected_at and timezone.now() > config.expected_at:
+                is_overdue = True
+                delay_seconds = int((timezone.now() - config.expected_at).total_seconds())
             
             # Récupérer les emails actifs
             emails_count = config.emails_notification.filter(est_actif=True).count()
@@ -892,25 +1231,26 @@ def configurations_statistiques(request):
                 })
         
         # Configurations en retard
+        # (requête d'intervalle sur expected_at, index core_config_attendue_idx)
         configurations_en_retard = []
-        for config in qs:
-            if config.last_execution:
-                expected_next = config.last_execution + config.get_periodicite_timedelta()
-                if timezone.now() > expected_next:
-                    configurations_en_retard.append({
-                        "id": config.id,
-                        "nom": config.nom,
-                        "projet": config.projet.nom,
-                        "periodicite": config.periodicite,
-                        "last_execution": config.last_execution,
-                        "expected_next": expected_next,
-                        "delay_hours": int((timezone.now() - expected_next).total_seconds() / 3600)
-                    })
+        maintenant = timezone.now()
+        for config in qs.filter(expected_at__lt=maintenant).select_related('projet').order_by('expected_at'):
+            configurations_en_retard.append({
+                "id": config.id,
+                "nom": config.nom,
+                "projet": config.projet.nom,
+                "periodicite": config.periodicite,
+                "last_execution": config.last_execution,
+                "expected_next": config.expected_at,
+                "delay_hours": int((maintenant - config.expected_at).total_seconds() / 3600)
+            })
         
         # Prochaines exécutions dans les 24h
         prochaines_24h = []
-        for config in qs:
-            next_execution = config.get_next_execution_time()
+        configurations = list(qs.select_related('projet'))
+        prochaines = ConfigurationTest.prochaines_executions(configurations)
+        for config in configurations:
+            next_execution = prochaines[config.id]
             if next_execution:
                 time_until = (next_execution - timezone.now()).total_seconds()
                 if 0 <= time_until <= 86400:  # Dans les 24h
@@ -1,3 +1,462 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import threading
 
-# Create your tests here.
+from datetime import timedelta
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+
+from .models import (
+    ConfigurationTest,
+    CustomUser,
+    ExecutionResult,
+    ExecutionTest,
+    Projet,
+    Script,
+    Societe,
+)
+from .execution_queue import reclamer_baux_expires
+from .pool_navigateurs import FabriqueFactice, PoolNavigateurs
+from .runner import lancer_scripts_pour_execution, timeouts_scripts
+from .views import get_next_scripts_for_project
+
+
+def creer_resultat(nom, log_fichier):
+    """Société, projet et configuration `nom`, avec une exécution et son résultat de script."""
+    societe = Societe.objects.create(nom=f"Société {nom}")
+    projet = Projet.objects.create(nom=f"Projet {nom}", url="https://exemple.com", contrat="-")
+    societe.projets.add(projet)
+    configuration = ConfigurationTest.objects.create(
+        societe=societe, nom=f"Configuration {nom}", projet=projet, periodicite="1j", is_active=False
+    )
+    script = Script.objects.create(nom=f"Script {nom}", projet=projet)
+    execution = ExecutionTest.objects.create(configuration=configuration, statut="done")
+    resultat = ExecutionResult.objects.create(
+        execution=execution, script=script, statut="done", log_fichier=log_fichier
+    )
+    return societe, resultat
+
+
+class ExecutionResultLogViewTests(TestCase):
+    """Les logs d'un script ne sont lisibles que par les utilisateurs qui voient son exécution."""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp(prefix="snapflow_tests_")
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        os.makedirs(os.path.join(self.media, "logs"))
+        with open(os.path.join(self.media, "logs", "script.txt"), "w", encoding="utf-8") as f:
+            f.write("ligne 1\nligne 2\n")
+
+        societe, self.resultat = creer_resultat("A", "logs/script.txt")
+        _, self.resultat_autre_societe = creer_resultat("B", "logs/script.txt")
+        self.client = APIClient()
+        self.client.force_authenticate(
+            CustomUser.objects.create_user("utilisateur@exemple.com", "secret", societe=societe)
+        )
+
+    def lire(self, resultat):
+        with override_settings(MEDIA_ROOT=self.media):
+            return self.client.get(f"/api/execution-resultats/{resultat.id}/log")
+
+    def test_log_de_sa_societe(self):
+        reponse = self.lire(self.resultat)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse.data["lignes"], ["ligne 1", "ligne 2"])
+
+    def test_log_d_une_autre_societe(self):
+        self.assertEqual(self.lire(self.resultat_autre_societe).status_code, 404)
+
+
+# Un lot plus grand que le nombre de scripts : les résultats sont écrits
+# en une fois, sans écriture intermédiaire déclenchée par la durée
+@override_settings(
+    SNAPFLOW_EXECUTION_BACKEND='queue',
+    SNAPFLOW_RESULTATS_LOT=10000,
+    SNAPFLOW_WEBDRIVER_POOL=None,
+    SNAPFLOW_SCRIPT_HOSTS=0,
+)
+class RequetesRunnerTests(TestCase):
+    """Le nombre de requêtes d'une exécution (création + runner) ne dépend pas du nombre de scripts."""
+
+    def setUp(self):
+        self.dossier = tempfile.mkdtemp(prefix="snapflow_tests_")
+        self.addCleanup(shutil.rmtree, self.dossier, ignore_errors=True)
+        # Logs des exécutions dans le dossier temporaire
+        reglage = override_settings(MEDIA_ROOT=self.dossier)
+        reglage.enable()
+        self.addCleanup(reglage.disable)
+
+        self.societe = Societe.objects.create(nom="Société test requêtes")
+        self.projet = Projet.objects.create(nom="Projet test requêtes", url="https://exemple.com", contrat="-")
+        self.societe.projets.add(self.projet)
+
+    def configuration(self, nb_scripts):
+        configuration = ConfigurationTest.objects.create(
+            societe=self.societe, nom=f"Test requêtes ({nb_scripts} scripts)", projet=self.projet,
+            periodicite="1j", scripts_paralleles=4, is_active=False,
+        )
+        scripts = []
+        for i in range(nb_scripts):
+            chemin = os.path.join(self.dossier, f"script_{nb_scripts}_{i}.py")
+            with open(chemin, "w", encoding="utf-8") as f:
+                f.write("print('ok')\n")
+            script = Script(nom=f"script {nb_scripts} {i}", projet=self.projet)
+            script.fichier.name = chemin  # chemin absolu : MEDIA_ROOT est ignoré
+            script.save()
+            scripts.append(script)
+        configuration.scripts.set(scripts)
+        return configuration
+
+    def executer(self, configuration):
+        execution = ExecutionTest.objects.create(configuration=configuration)
+        lancer_scripts_pour_execution(execution.id, notifier=False)
+        return execution
+
+    def test_requetes_independantes_du_nombre_de_scripts(self):
+        configuration = self.configuration(2)
+        with CaptureQueriesContext(connection) as reference:
+            execution = self.executer(configuration)
+        self.assertEqual(ExecutionTest.objects.get(pk=execution.pk).statut, "done")
+        for nb_scripts in (20, 60):
+            configuration = self.configuration(nb_scripts)
+            with self.subTest(scripts=nb_scripts), self.assertNumQueries(len(reference)):
+                execution = self.executer(configuration)
+            self.assertEqual(execution.resultats.filter(statut="done").count(), nb_scripts)
+
+
+class TimeoutsScriptsTests(TestCase):
+    """Historique des durées limité par script : un script fréquent n'évince pas les autres."""
+
+    @override_settings(SNAPFLOW_TIMEOUTS={
+        "facteur": 2.0, "plancher": 1, "plafond": 300, "echantillons_min": 5, "historique": 5,
+    })
+    def test_historique_par_script(self):
+        societe = Societe.objects.create(nom="Société délais")
+        projet = Projet.objects.create(nom="Projet délais", url="https://exemple.com", contrat="-")
+        societe.projets.add(projet)
+        configuration = ConfigurationTest.objects.create(
+            societe=societe, nom="Délais", projet=projet, periodicite="1j", is_active=False
+        )
+        rare = Script.objects.create(nom="Script rare", projet=projet)
+        frequent = Script.objects.create(nom="Script fréquent", projet=projet)
+        execution = ExecutionTest.objects.create(configuration=configuration, statut="done")
+        debut = now()
+
+        def resultats(script, nombre, duree):
+            ExecutionResult.objects.bulk_create([
+                ExecutionResult(
+                    execution=execution, script=script, statut="done",
+                    started_at=debut, ended_at=debut + timedelta(seconds=duree),
+                )
+                for _ in range(nombre)
+            ])
+
+        # Les exécutions du script rare sont plus anciennes (ids plus petits)
+        resultats(rare, 5, 40)
+        resultats(frequent, 30, 10)
+
+        self.assertEqual(timeouts_scripts([rare, frequent]), [80.0, 20.0])
+
+
+class Course:
+    """
+    Prolonge le bail des exécutions `ids` juste avant la première écriture
+    du balayage : leur worker a repris la main entre la sélection des
+    orphelines et l'UPDATE.
+    """
+
+    def __init__(self, ids):
+        self.ids = ids
+        self.fait = False
+        self.sql = None
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self.fait and sql.startswith("UPDATE"):
+            self.fait = True
+            with CaptureQueriesContext(connection) as prolongation:
+                ExecutionTest.objects.filter(pk__in=self.ids).update(lease_expires_at=now() + timedelta(minutes=5))
+            self.sql = prolongation.captured_queries[-1]["sql"]
+        return execute(sql, params, many, context)
+
+
+# Mode 'queue' : pas de thread relancé pour les exécutions remises en file
+@override_settings(SNAPFLOW_EXECUTION_BACKEND="queue", SNAPFLOW_REPRISES_MAX=3)
+class BalayageExecutionsTests(TestCase):
+    """
+    Les exécutions orphelines (restées 'running', bail expiré) sont remises
+    en file ou terminées selon la politique de leur configuration, en un
+    nombre de requêtes indépendant de leur nombre.
+    """
+
+    ORPHELINES = 50  # par politique
+
+    def setUp(self):
+        societe = Societe.objects.create(nom="Société balayage")
+        projet = Projet.objects.create(nom="Projet balayage", url="https://exemple.com", contrat="-")
+        societe.projets.add(projet)
+        script = Script.objects.create(nom="Script balayage", projet=projet)
+
+        # Les exécutions 'vivantes' ont un bail valide, celles de 'course'
+        # des résultats déjà obtenus
+        instant = now()
+        self.groupes = {}
+        parametres = {
+            "requeue": ("requeue", instant - timedelta(minutes=1), 0),
+            "finalize": ("finalize", instant - timedelta(minutes=1), 0),
+            "epuisee": ("requeue", instant - timedelta(minutes=1), 3),
+            "vivante": ("requeue", instant + timedelta(minutes=5), 0),
+            "course": ("requeue", instant - timedelta(minutes=1), 0),
+        }
+        for groupe, (politique, fin_bail, reprises) in parametres.items():
+            configuration = ConfigurationTest.objects.create(
+                societe=societe, nom=f"Balayage {groupe}", projet=projet, periodicite="1j",
+                is_active=False, politique_reprise=politique,
+            )
+            ExecutionTest.objects.bulk_create([
+                ExecutionTest(
+                    configuration=configuration, statut="running", claimed_by="worker-disparu",
+                    started_at=instant - timedelta(hours=1), lease_expires_at=fin_bail,
+                    reprises=reprises, date_mise_en_file=instant,
+                )
+                for _ in range(self.ORPHELINES)
+            ])
+            # Relecture : MySQL ne renvoie pas les clés créées par bulk_create
+            self.groupes[groupe] = list(
+                ExecutionTest.objects.filter(configuration=configuration).values_list("id", flat=True)
+            )
+            ExecutionResult.objects.bulk_create([
+                ExecutionResult(
+                    execution_id=execution_id, script=script, statut="done" if groupe == "course" else "pending"
+                )
+                for execution_id in self.groupes[groupe]
+            ])
+
+    def test_balayage(self):
+        course = Course(self.groupes["course"])
+        with CaptureQueriesContext(connection) as requetes, connection.execute_wrapper(course):
+            remises, terminees = reclamer_baux_expires()
+
+        self.assertEqual((remises, terminees), (self.ORPHELINES, self.ORPHELINES * 2))
+        attendu = {
+            "requeue": ("pending", "pending", 1),
+            "finalize": ("error", "non_executed", 0),
+            "epuisee": ("error", "non_executed", 3),
+            "vivante": ("running", "pending", 0),
+            # Bail prolongé entre la sélection et l'UPDATE : ni remise en file ni résultats touchés
+            "course": ("running", "done", 0),
+        }
+        for groupe, (statut, statut_resultats, reprises) in attendu.items():
+            with self.subTest(groupe=groupe):
+                executions = ExecutionTest.objects.filter(pk__in=self.groupes[groupe])
+                self.assertFalse(executions.exclude(statut=statut).exists())
+                self.assertFalse(executions.exclude(reprises=reprises).exists())
+                self.assertFalse(
+                    ExecutionResult.objects.filter(execution__in=executions).exclude(
+                        statut=statut_resultats
+                    ).exists()
+                )
+
+        # Les points de sauvegarde des blocs atomic imbriqués et la
+        # prolongation simulée ne comptent pas
+        requetes_balayage = [
+            q for q in requetes.captured_queries
+            if not q["sql"].startswith(("SAVEPOINT", "RELEASE")) and q["sql"] != course.sql
+        ]
+        self.assertLessEqual(len(requetes_balayage), 7)
+
+
+class ConfigurationsAVenirTests(TestCase):
+    """
+    Configurations à venir : une échéance dépassée mais pas encore
+    déclenchée est reportée à l'occurrence suivante, pas écartée.
+    """
+
+    def setUp(self):
+        instant = now()
+        societe = Societe.objects.create(nom="Société à venir")
+        self.projet = Projet.objects.create(nom="Projet à venir", url="https://exemple.com", contrat="-")
+        societe.projets.add(self.projet)
+        self.script = Script.objects.create(nom="Script à venir", projet=self.projet)
+
+        def creer(nom, last_execution):
+            configuration = ConfigurationTest.objects.create(
+                societe=societe, nom=nom, projet=self.projet, periodicite="1j",
+                is_active=True, last_execution=last_execution,
+            )
+            configuration.scripts.add(self.script)
+            return configuration
+
+        # Due depuis une heure, jamais déclenchée : prochaine occurrence dans 23 h
+        self.en_retard = creer("En retard", instant - timedelta(hours=25))
+        self.prochaine = creer("Prochaine", instant - timedelta(hours=20))
+        creer("Au-delà", instant + timedelta(hours=1))
+
+    def test_echeance_depassee_reportee(self):
+        a_venir = ConfigurationTest.get_next_scheduled_configurations(24)
+        self.assertEqual(
+            [(e["configuration"].id, e["next_execution"]) for e in a_venir],
+            [
+                (self.prochaine.id, self.prochaine.last_execution + timedelta(days=1)),
+                (self.en_retard.id, self.en_retard.last_execution + timedelta(days=2)),
+            ],
+        )
+        self.assertTrue(all(e["time_until_execution"] >= timedelta(0) for e in a_venir))
+
+        scripts = get_next_scripts_for_project(self.projet.id, 24)
+        self.assertEqual(
+            [(e["configuration"].id, e["script"].id) for e in scripts],
+            [(self.prochaine.id, self.script.id), (self.en_retard.id, self.script.id)],
+        )
+
+
+# Mode 'queue' : aucune exécution lancée dans ce processus
+@override_settings(SNAPFLOW_EXECUTION_BACKEND="queue")
+class RelanceEchecsTests(TestCase):
+    """
+    Relance des seuls scripts en échec : contenu de la relance, relance de
+    relance, refus sans échec ou pendant une relance en cours, et statut
+    effectif de l'exécution d'origine.
+    """
+
+    def setUp(self):
+        statuts = {"a": "done", "b": "error", "c": "timeout", "d": "done"}
+        societe = Societe.objects.create(nom="Société relance")
+        projet = Projet.objects.create(nom="Projet relance", url="https://exemple.com", contrat="-")
+        societe.projets.add(projet)
+        configuration = ConfigurationTest.objects.create(
+            societe=societe, nom="Relance", projet=projet, periodicite="1j", is_active=False
+        )
+        self.scripts = {nom: Script.objects.create(nom=f"Script {nom}", projet=projet).id for nom in statuts}
+        configuration.scripts.set(list(self.scripts.values()))
+
+        # Créée terminée : le signal crée un résultat par script de la configuration
+        self.origine = ExecutionTest.objects.create(configuration=configuration, statut="error")
+        for nom, statut in statuts.items():
+            ExecutionResult.objects.filter(execution=self.origine, script_id=self.scripts[nom]).update(statut=statut)
+
+    def terminer(self, relance, statuts):
+        """Simule la fin d'une relance, comme DeroulementExecution.terminer()."""
+        for script_id, statut in statuts.items():
+            ExecutionResult.objects.filter(execution=relance, script_id=script_id).update(statut=statut)
+        statut = "done" if all(s == "done" for s in statuts.values()) else "error"
+        ExecutionTest.objects.filter(pk=relance.pk).update(statut=statut)
+        origine = relance.parent
+        ExecutionTest.objects.filter(pk=origine.pk).update(statut_effectif=origine.calculer_statut_effectif())
+
+    def assertScriptsRelances(self, relance, attendus):
+        scripts = ExecutionResult.objects.filter(execution=relance).values_list("script_id", flat=True)
+        self.assertEqual(sorted(scripts), sorted(attendus))
+        self.assertEqual(relance.statut, "pending")
+
+    def test_relances_successives(self):
+        origine, scripts = self.origine, self.scripts
+
+        relance = origine.relancer_echecs()
+        self.assertScriptsRelances(relance, [scripts["b"], scripts["c"]])
+        with self.assertRaises(ValueError, msg="relance déjà en cours"):
+            origine.relancer_echecs()
+
+        # Première relance : 'b' passe, 'c' échoue encore
+        self.terminer(relance, {scripts["b"]: "done", scripts["c"]: "error"})
+        origine.refresh_from_db()
+        self.assertEqual(origine.statut_effectif, "error")
+
+        # Relance demandée depuis la relance : repart de l'origine, avec 'c' seul
+        seconde = relance.relancer_echecs()
+        self.assertEqual(seconde.parent_id, origine.id)
+        self.assertScriptsRelances(seconde, [scripts["c"]])
+        self.terminer(seconde, {scripts["c"]: "done"})
+        origine.refresh_from_db()
+        self.assertEqual(origine.statut_effectif, "done")
+        self.assertEqual(origine.statut, "error")
+
+        with self.assertRaises(ValueError, msg="aucun script en échec"):
+            origine.relancer_echecs()
+
+
+class PoolNavigateursTests(SimpleTestCase):
+    """Logique du pool de navigateurs, avec un driver factice (aucun navigateur requis)."""
+
+    def test_reutilisation(self):
+        """Une session libérée est réutilisée et réinitialisée"""
+        fabrique = FabriqueFactice()
+        pool = PoolNavigateurs(fabrique, taille_max=1, utilisations_max=5)
+        session = pool.acquerir()
+        session.driver.cookies["panier"] = "1"
+        session.driver.get("https://exemple.com")
+        pool.liberer(session)
+        reprise = pool.acquerir()
+        self.assertIs(reprise, session)
+        self.assertFalse(reprise.driver.cookies)
+        self.assertEqual(reprise.driver.url_courante, "about:blank")
+        self.assertEqual(fabrique.creees, 1)
+
+    def test_recyclage_apres_utilisations(self):
+        """Une session est recyclée après N utilisations"""
+        fabrique = FabriqueFactice()
+        pool = PoolNavigateurs(fabrique, taille_max=1, utilisations_max=3)
+        for _ in range(7):
+            pool.liberer(pool.acquerir())
+        self.assertEqual(fabrique.creees, 3)
+        self.assertEqual(fabrique.detruites, 2)
+
+    def test_recyclage_apres_echec(self):
+        """Une session est fermée après l'échec d'un script"""
+        fabrique = FabriqueFactice()
+        pool = PoolNavigateurs(fabrique, taille_max=1, utilisations_max=10)
+        session = pool.acquerir()
+        pool.liberer(session, echec=True)
+        self.assertTrue(session.driver.ferme)
+        self.assertEqual(pool.ouvertes, 0)
+        self.assertIsNot(pool.acquerir(), session)
+
+    def test_plafond_concurrent(self):
+        """Le nombre de sessions ouvertes ne dépasse jamais la taille du pool"""
+        fabrique = FabriqueFactice()
+        pool = PoolNavigateurs(fabrique, taille_max=3, utilisations_max=4)
+        maximum = []
+        verrou = threading.Lock()
+
+        def script():
+            for _ in range(20):
+                session = pool.acquerir(timeout=5)
+                with verrou:
+                    maximum.append(pool.ouvertes)
+                pool.liberer(session)
+
+        threads = [threading.Thread(target=script) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(max(maximum), 3)
+        pool.fermer()
+        self.assertEqual(pool.ouvertes, 0)
+        self.assertEqual(fabrique.creees, fabrique.detruites)
+
+    def test_attente_puis_fermeture(self):
+        """Un script en attente obtient une session quand une autre est fermée"""
+        fabrique = FabriqueFactice()
+        pool = PoolNavigateurs(fabrique, taille_max=1, utilisations_max=10)
+        session = pool.acquerir()
+        obtenue = []
+        attente = threading.Thread(target=lambda: obtenue.append(pool.acquerir(timeout=5)))
+        attente.start()
+        pool.liberer(session, echec=True)
+        attente.join()
+        self.assertTrue(obtenue)
+        self.assertIsNot(obtenue[0], session)
+
+    def test_echec_reinitialisation(self):
+        """Une session impossible à réinitialiser est écartée"""
+        fabrique = FabriqueFactice(echec_reinitialisation=True)
+        pool = PoolNavigateurs(fabrique, taille_max=1, utilisations_max=10)
+        session = pool.acquerir()
+        pool.liberer(session)
+        self.assertEqual(pool.ouvertes, 0)
+        self.assertEqual(fabrique.detruites, 1)
@@ -30,6 +30,16 @@ urlpatterns = [
         views.ExecutionResultatList.as_view(),
         name="execution-resultats-list",
     ),
+    path(
+        "execution-resultats/<int:pk>/log",
+        views.ExecutionResultLogView.as_view(),
+        name="execution-resultat-log",
+    ),
+    path(
+        "agents/scripts/<str:empreinte>/",
+        views.ScriptAgentView.as_view(),
+        name="agent-script",
+    ),
     path("users/", UserListCreateView.as_view(), name="user-list"),
     path("users/<int:pk>/", UserDetailView.as_view(), name="user-detail"),
     path(
@@ -50,6 +60,9 @@ urlpatterns = [
     path(
         "executions/<int:pk>/rapport-pdf/", RapportPDFView.as_view(), name="rapport_pdf"
     ),
+    path(
+        "executions/<int:pk>/gantt/", stats_views.gantt_execution, name="gantt_execution"
+    ),
     path("stats/tests-par-jour/", stats_views.tests_par_jour, name="tests_par_jour"),
     path(
         "stats/success-vs-failed-par-jour/",
@@ -65,6 +78,31 @@ urlpatterns = [
         stats_views.taux_erreur_par_script,
         name="taux_erreur_par_script",
     ),
+    path(
+        "stats/echecs-par-etape/",
+        stats_views.echecs_par_etape,
+        name="echecs_par_etape",
+    ),
+    path(
+        "stats/attente-file/",
+        stats_views.attente_file_par_priorite,
+        name="attente_file_par_priorite",
+    ),
+    path(
+        "stats/consommation-scripts/",
+        stats_views.consommation_par_script,
+        name="consommation_par_script",
+    ),
+    path(
+        "stats/partage-execution/",
+        stats_views.partage_execution,
+        name="partage_execution",
+    ),
+    path(
+        "stats/declenchements-coalesces/",
+        stats_views.declenchements_coalesces,
+        name="declenchements_coalesces",
+    ),
     path(
         "stats/repartition-projet/",
         stats_views.repartition_par_projet,
@@ -36,8 +36,11 @@ from io import BytesIO
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 import os
+from django.conf import settings
 
-from core.permissions import IsSuperAdmin
+from core.permissions import IsAgentExecution, IsSuperAdmin
+from core.execution_queue import executer_maintenant
+from core.journaux import lire_lignes
 
 # Import des modèles
 from .models import (
@@ -350,17 +353,38 @@ class ConfigurationTestViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=["post"], url_path="execute-now")
     def execute_now(self, request, pk=None):
-        """Exécuter la configuration immédiatement"""
+        """Exécuter la configuration immédiatement (voie prioritaire de la file)"""
         config = self.get_object()
         self.check_object_permissions(request, config)
-        
-        config.last_execution = timezone.now()
-        config.save()
-        
+
+        execution = executer_maintenant(config)
+
         return Response({
-            "status": "executed", 
-            "last_execution": config.last_execution
-        }, status=status.HTTP_200_OK)
+            "status": "queued",
+            "execution_id": execution.id,
+            "date_mise_en_file": execution.date_mise_en_file,
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+def executions_visibles(queryset, user, prefixe=""):
+    """
+    Restreint `queryset` aux exécutions que `user` peut consulter ;
+    `prefixe` ("execution__") pour un queryset d'ExecutionResult.
+    """
+    # Superadmin voit tout
+    if user.is_superuser:
+        return queryset.all()
+
+    # Administrateur de société voit les exécutions de sa société
+    if hasattr(user, 'societe') and user.societe:
+        return queryset.filter(**{f"{prefixe}configuration__societe": user.societe})
+
+    # Chargé de projet voit les exécutions de ses projets
+    if hasattr(user, 'projets_charges'):
+        return queryset.filter(**{f"{prefixe}configuration__projet__in": user.projets_charges.all()})
+
+    # Par défaut: utilisateur normal voit les exécutions où il est charge_de_compte
+    return queryset.filter(**{f"{prefixe}configuration__projet__charge_de_compte": user})
 
 
 class ExecutionTestViewSet(viewsets.ModelViewSet):
@@ -369,29 +393,23 @@ class ExecutionTestViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        
         # CORRECTION: Logique de filtrage améliorée
         queryset = ExecutionTest.objects.select_related(
             'configuration', 
             'configuration__projet',
             'configuration__societe'
         )
-        
-        # Superadmin voit tout
-        if user.is_superuser:
-            return queryset.all()
-        
-        # Administrateur de société voit les exécutions de sa société
-        if hasattr(user, 'societe') and user.societe:
-            return queryset.filter(configuration__societe=user.societe)
-        
-        # Chargé de projet voit les exécutions de ses projets
-        if hasattr(user, 'projets_charges'):
-            return queryset.filter(configuration__projet__in=user.projets_charges.all())
-        
-        # Par défaut: utilisateur normal voit les exécutions où il est charge_de_compte
-        return queryset.filter(configuration__projet__charge_de_compte=user)
+        return executions_visibles(queryset, self.request.user)
+
+    @action(detail=True, methods=["post"], url_path="relancer-echecs")
+    def relancer_echecs(self, request, pk=None):
+        """Relancer les seuls scripts en échec ou en délai dépassé de l'exécution"""
+        execution = self.get_object()
+        try:
+            relance = execution.relancer_echecs()
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(relance).data, status=status.HTTP_201_CREATED)
 
 
 class RapportPDFView(APIView):
@@ -654,6 +672,64 @@ class ExecutionResultatList(generics.ListAPIView):
     serializer_class = ExecutionResultSerializer
 
 
+class ExecutionResultLogView(APIView):
+    """
+    Retourne une plage de lignes du log d'un script :
+    /api/execution-resultats/<id>/log?offset=0&limit=200
+    Les logs compressés ne sont décompressés que bloc par bloc.
+    """
+    permission_classes = [IsAuthenticated]
+    LIMITE_MAX = 2000
+
+    def get(self, request, pk):
+        # Mêmes règles de visibilité que les exécutions (ExecutionTestViewSet)
+        resultats = executions_visibles(ExecutionResult.objects.all(), request.user, "execution__")
+        resultat = get_object_or_404(resultats, pk=pk)
+        if not resultat.log_fichier:
+            raise Http404("Aucun log pour ce résultat")
+
+        try:
+            offset = max(0, int(request.GET.get('offset', 0)))
+            limit = min(max(1, int(request.GET.get('limit', 200))), self.LIMITE_MAX)
+        except ValueError:
+            return Response({'error': 'offset et limit doivent être des entiers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        chemin = os.path.join(settings.MEDIA_ROOT, resultat.log_fichier.name)
+        try:
+            lignes, total = lire_lignes(chemin, offset, limit)
+        except FileNotFoundError:
+            raise Http404("Fichier de log introuvable")
+
+        return Response({
+            'id': resultat.id,
+            'log': resultat.log_fichier.name,
+            'offset': offset,
+            'limit': limit,
+            'total_lignes': total,
+            'lignes': lignes,
+        })
+
+
+class ScriptAgentView(APIView):
+    """
+    Fichier d'un script désigné par son empreinte SHA-256, pour les agents
+    d'exécution distants (manage.py snapflow_agent --serveur ...) :
+    /api/agents/scripts/<empreinte>/
+    """
+    authentication_classes = []
+    permission_classes = [IsAgentExecution]
+
+    def get(self, request, empreinte):
+        script = Script.objects.filter(empreinte=empreinte).exclude(fichier='').first()
+        if script is None:
+            raise Http404("Aucun script avec cette empreinte")
+        try:
+            fichier = script.fichier.open('rb')
+        except FileNotFoundError:
+            raise Http404("Fichier du script introuvable")
+        return FileResponse(fichier, content_type='text/x-python')
+
+
 
 
 # API Scripts
@@ -774,12 +850,12 @@ class ScheduledScriptsListView(ListView):
         context['projects'] = Projet.objects.all()
         context['selected_project'] = self.request.GET.get('project', '')
         
-        for config in context['configurations']:
-            config.next_execution = config.get_next_execution_time()
-            config.is_overdue = False
-            if config.last_execution:
-                expected_next = config.last_execution + config.get_periodicite_timedelta()
-                config.is_overdue = timezone.now() > expected_next
+        # list() : les instances du gabarit sont celles qui reçoivent next_execution
+        configurations = list(context['configurations'])
+        prochaines = ConfigurationTest.prochaines_executions(configurations)
+        for config in configurations:
+            config.next_execution = prochaines[config.id]
+            config.is_overdue = config.expected_at is not None and timezone.now() > config.expected_at
         
         return context
 
@@ -796,11 +872,9 @@ def configuration_detail_scheduled(request, config_id):
         'periodicite_display': configuration.get_periodicite_display(),
     }
     
-    if configuration.last_execution:
-        expected_next = configuration.last_execution + configuration.get_periodicite_timedelta()
-        if timezone.now() > expected_next:
-            context['is_overdue'] = True
-            context['delay'] = timezone.now() - expected_next
+    if configuration.expected_at and timezone.now() > configuration.expected_at:
+        context['is_overdue'] = True
+        context['delay'] = timezone.now() - configuration.expected_at
     
     return render(request, 'configurations/detail_scheduled.html', context)
 
@@ -815,27 +889,20 @@ def get_dashboard_data():
 
 
 def get_next_scripts_for_project(project_id, hours_ahead=24):
-    configurations = ConfigurationTest.objects.filter(
-        projet_id=project_id, 
-        is_active=True
-    ).prefetch_related('scripts')
-    
-    next_scripts = []
     now = timezone.now()
     limit_time = now + timedelta(hours=hours_ahead)
+    configurations = ConfigurationTest.objects.filter(projet_id=project_id).prefetch_related('scripts')
     
-    for config in configurations:
-        next_time = config.get_next_execution_time()
-        if next_time and now <= next_time <= limit_time:
-            for script in config.scripts.all():
-                next_scripts.append({
-                    'script': script,
-                    'configuration': config,
-                    'execution_time': next_time,
-                    'time_until': next_time - now
-                })
+    next_scripts = []
+    for config, next_time in ConfigurationTest.configurations_a_venir(configurations, now, limit_time):
+        for script in config.scripts.all():
+            next_scripts.append({
+                'script': script,
+                'configuration': config,
+                'execution_time': next_time,
+                'time_until': next_time - now
+            })
     
-    next_scripts.sort(key=lambda x: x['execution_time'])
     return next_scripts
 
 
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'snapflow.snapflow.settings')
 
 application = get_asgi_application()
+
+# Un seul processus web mène le scheduler (bail en base, voir core/scheduler.py)
+from core.scheduler import demarrer_candidature  # noqa: E402
+
+demarrer_candidature()
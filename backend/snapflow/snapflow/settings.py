@@ -222,3 +222,90 @@ EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 #         },
 #     },
 # }
+
+
+# Exécution des scripts de test (core/runner.py)
+# Plafond global du nombre de scripts lancés en parallèle pour une exécution,
+# quelle que soit la valeur de ConfigurationTest.scripts_paralleles
+SNAPFLOW_MAX_SCRIPTS_PARALLELES = config('SNAPFLOW_MAX_SCRIPTS_PARALLELES', default=8, cast=int)
+
+# 'queue' : les exécutions sont lancées par manage.py run_execution_workers
+# 'thread' : un thread par exécution dans le processus qui l'a créée (ancien mode)
+SNAPFLOW_EXECUTION_BACKEND = config('SNAPFLOW_EXECUTION_BACKEND', default='queue')
+# Durée (secondes) du bail d'un worker sur une exécution, prolongé tant qu'elle tourne
+SNAPFLOW_EXECUTION_LEASE = config('SNAPFLOW_EXECUTION_LEASE', default=600, cast=int)
+# Logs de scripts compressés en blocs gzip indexés (lecture par plage via l'API)
+SNAPFLOW_LOGS_COMPRESSES = config('SNAPFLOW_LOGS_COMPRESSES', default=True, cast=bool)
+# Hôtes de scripts pré-chauffés (core/hote_scripts.py) : nombre d'hôtes par
+# processus (0 = désactivé, chaque script démarre un nouvel interpréteur)
+# et modules importés une fois pour toutes par chaque hôte
+SNAPFLOW_SCRIPT_HOSTS = config('SNAPFLOW_SCRIPT_HOSTS', default=0, cast=int)
+SNAPFLOW_SCRIPT_HOST_MODULES = config(
+    'SNAPFLOW_SCRIPT_HOST_MODULES',
+    default='selenium.webdriver,requests,bs4',
+    cast=Csv(),
+)
+# Pool de sessions navigateur partagées entre les scripts (core/pool_navigateurs.py).
+# Les scripts s'y rattachent via core.snapflow_navigateur.obtenir_driver()
+SNAPFLOW_WEBDRIVER_POOL = {
+    'active': config('SNAPFLOW_WEBDRIVER_POOL', default=False, cast=bool),
+    'taille_max': config('SNAPFLOW_WEBDRIVER_POOL_TAILLE', default=2, cast=int),  # sessions par processus
+    'utilisations_max': config('SNAPFLOW_WEBDRIVER_POOL_UTILISATIONS', default=20, cast=int),
+    'headless': True,
+    'factice': False,
+}
+# Délai de chaque script : p99 de ses durées réussies récentes × facteur,
+# borné par [plancher, plafond] (secondes). Sans assez d'historique
+# (echantillons_min), le plafond s'applique
+SNAPFLOW_TIMEOUTS = {
+    'facteur': config('SNAPFLOW_TIMEOUT_FACTEUR', default=3.0, cast=float),
+    'plancher': config('SNAPFLOW_TIMEOUT_PLANCHER', default=30, cast=int),
+    'plafond': config('SNAPFLOW_TIMEOUT_PLAFOND', default=300, cast=int),
+    'echantillons_min': 5,
+    'historique': 50,  # durées prises en compte par script
+}
+# Limites appliquées aux processus des scripts (et aux navigateurs qu'ils lancent).
+# 0 = pas de limite ; nice > 0 abaisse leur priorité face au serveur web
+SNAPFLOW_SCRIPT_LIMITES = {
+    'cpu_secondes': config('SNAPFLOW_SCRIPT_CPU', default=0, cast=int),
+    'memoire_mo': config('SNAPFLOW_SCRIPT_MEMOIRE_MO', default=0, cast=int),
+    'nice': config('SNAPFLOW_SCRIPT_NICE', default=10, cast=int),
+}
+# Nombre de résultats de scripts écrits par requête (bulk_update) pendant une exécution
+SNAPFLOW_RESULTATS_LOT = config('SNAPFLOW_RESULTATS_LOT', default=50, cast=int)
+# Agents d'exécution distants (manage.py snapflow_agent) : jeton partagé pour
+# télécharger les scripts par empreinte (vide = téléchargement refusé) et
+# intervalle maximal (secondes) entre deux battements de cœur
+SNAPFLOW_AGENT_TOKEN = config('SNAPFLOW_AGENT_TOKEN', default='')
+SNAPFLOW_AGENT_BATTEMENT = config('SNAPFLOW_AGENT_BATTEMENT', default=30, cast=int)
+# Reprises d'une exécution orpheline (processus arrêté en cours d'exécution) avant
+# qu'elle soit terminée en erreur, quelle que soit la politique de sa configuration
+SNAPFLOW_REPRISES_MAX = config('SNAPFLOW_REPRISES_MAX', default=3, cast=int)
+# Moteur des workers : 'threads' (un thread par exécution et par script) ou
+# 'asyncio' (une boucle d'événements pour toutes les exécutions du worker,
+# une seule connexion à la base). SNAPFLOW_RUNNER_SCRIPTS_MAX borne les
+# scripts simultanés d'un worker asyncio, toutes exécutions confondues
+SNAPFLOW_RUNNER_ENGINE = config('SNAPFLOW_RUNNER_ENGINE', default='threads')
+SNAPFLOW_RUNNER_SCRIPTS_MAX = config('SNAPFLOW_RUNNER_SCRIPTS_MAX', default=200, cast=int)
+# Partage équitable de la capacité d'exécution entre sociétés (poids et plafond
+# réglés sur chaque société) ; par_projet : partage aussi entre les projets d'une
+# société. fenetre : historique de temps d'exécution pris en compte (secondes)
+SNAPFLOW_PARTAGE_EXECUTION = {
+    'actif': config('SNAPFLOW_PARTAGE_EXECUTION', default=True, cast=bool),
+    'par_projet': config('SNAPFLOW_PARTAGE_PAR_PROJET', default=False, cast=bool),
+    'fenetre': config('SNAPFLOW_PARTAGE_FENETRE', default=3600, cast=int),
+    'rafraichissement': 15,  # secondes entre deux calculs du temps consommé
+}
+# Places de chaque worker réservées, en plus de --concurrency, aux exécutions
+# demandées à la main (« exécuter maintenant ») : elles démarrent sans attendre
+# la fin d'une exécution planifiée
+SNAPFLOW_PLACES_IMMEDIATES = config('SNAPFLOW_PLACES_IMMEDIATES', default=1, cast=int)
+# Planificateur des exécutions périodiques : délai maximal (secondes) entre deux
+# réveils sans échéance, pour relire les configurations modifiées par un autre processus
+SNAPFLOW_PLANIFICATEUR_VEILLE_MAX = config('SNAPFLOW_PLANIFICATEUR_VEILLE_MAX', default=15, cast=int)
+# Un seul processus web mène le scheduler : il détient un bail en base de
+# SNAPFLOW_PLANIFICATEUR_BAIL secondes, prolongé au tiers de sa durée et repris
+# par un autre processus web à son expiration. SNAPFLOW_PLANIFICATEUR_ACTIF=False
+# empêche les processus web de cet hôte de se porter candidats
+SNAPFLOW_PLANIFICATEUR_BAIL = config('SNAPFLOW_PLANIFICATEUR_BAIL', default=15, cast=int)
+SNAPFLOW_PLANIFICATEUR_ACTIF = config('SNAPFLOW_PLANIFICATEUR_ACTIF', default=True, cast=bool)
@@ -50,6 +50,10 @@ try:
     from django.core.wsgi import get_wsgi_application
     application = get_wsgi_application()
     logger.info("Django WSGI application initialized successfully")
+
+    # Un seul processus web mène le scheduler (bail en base, voir core/scheduler.py)
+    from core.scheduler import demarrer_candidature
+    demarrer_candidature()
 except Exception as e:
     logger.error(f"Failed to initialize Django WSGI application: {e}")
     raise
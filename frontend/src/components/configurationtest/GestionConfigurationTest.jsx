@@ -183,21 +183,13 @@ const GestionConfigurationTest = ({ user, logout }) => {
 
         if (result.isConfirmed) {
             try {
-                await api.post(`configuration-tests/${configurationId}/execute_now/`);
-
-                // Mettre à jour l'état local avec la nouvelle date d'exécution
-                const updatedConfigurations = configurations.map(config =>
-                    config.id === configurationId
-                        ? { ...config, last_execution: new Date().toISOString() }
-                        : config
-                );
-
-                setConfigurations(updatedConfigurations);
-                setFilteredConfigurations(updatedConfigurations);
+                // L'exécution passe par la file prioritaire des workers :
+                // la planification (last_execution) n'est pas modifiée
+                const response = await api.post(`configuration-tests/${configurationId}/execute-now/`);
 
                 MySwal.fire({
-                    title: 'Exécutée !',
-                    text: 'La configuration a été exécutée avec succès.',
+                    title: 'Exécution lancée !',
+                    text: `L'exécution #${response.data.execution_id} a été mise en file prioritaire.`,
                     icon: 'success',
                     confirmButtonColor: '#3085d6',
                     confirmButtonText: 'OK'